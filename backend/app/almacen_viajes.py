@@ -0,0 +1,312 @@
+# app/almacen_viajes.py
+"""
+Almacén analítico en memoria: historial de viajes por hotel en columnas tipadas.
+
+Opcional (ALMACEN_ANALITICO=true en .env). Cada hotel se carga la primera vez
+que se consulta, con un cursor en streaming (sin objetos ORM), y luego se
+mantiene al día desde las rutas de escritura con `registrar(viaje, asignacion)`.
+Los datos de otros workers se incorporan al recargar (ALMACEN_ANALITICO_TTL_SEGUNDOS).
+
+Columnas (array del módulo estándar, ~21 bytes por viaje):
+    ids          'i'  id_viaje (ordenado, búsqueda binaria)
+    minutos      'i'  agendada_para en minutos desde epoch (UTC)
+    horas        'b'  hora local del hotel de agendada_para (0-23)
+    dias         'b'  día de la semana local (0 = lunes)
+    rutas        'i'  id_ruta
+    estados      'b'  id_estado_viaje
+    conductores  'i'  id_conductor (0 = sin asignar)
+    duraciones   'h'  minutos reales inicio→fin (-1 = sin dato)
+
+Las consultas (`consultar`) filtran y agrupan recorriendo las columnas, sin
+tocar MySQL. Hora y día se guardan ya en la zona del hotel al cargar o
+escribir; si la zona cambia (versión "hotel"), `obtener` recarga el almacén.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone, tzinfo
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from . import models, archivo, zona_horaria
+from .config import settings
+
+_EPOCH = datetime(1970, 1, 1)
+_SIN_CONDUCTOR = 0
+_SIN_DURACION = -1
+
+AGRUPACIONES = ("ruta", "hora", "dia_semana", "conductor", "estado")
+
+
+def minutos_epoch(fecha: datetime) -> int:
+    return int((fecha - _EPOCH).total_seconds() // 60)
+
+
+def hora_y_dia(fecha_utc: datetime, tz: tzinfo) -> Tuple[int, int]:
+    """(hora, día de la semana) locales de una fecha UTC naive."""
+    local = zona_horaria.a_local(fecha_utc, tz)
+    return local.hour, local.weekday()
+
+
+class AlmacenViajes:
+    """Columnas del historial de viajes de un hotel."""
+
+    def __init__(self, id_hotel: int):
+        self.id_hotel = id_hotel
+        self.ids = array("i")
+        self.minutos = array("i")
+        self.horas = array("b")
+        self.dias = array("b")
+        self.rutas = array("i")
+        self.estados = array("b")
+        self.conductores = array("i")
+        self.duraciones = array("h")
+        self.zona: tzinfo = timezone.utc
+        self.cargado_en = 0.0
+        self._lock = threading.Lock()
+
+    # ---------- carga / escritura ----------
+
+    def cargar(self, db: Session) -> None:
+        """Lee todo el historial del hotel (archivo incluido) con un cursor del lado del servidor."""
+        tz = zona_horaria.zona_de_hotel(db, self.id_hotel)
+        v = archivo.viajes(True)
+        a = archivo.asignaciones(True)
+        filas = db.execute(
+            select(
+                v.id_viaje,
+                v.agendada_para,
+                v.id_ruta,
+                v.id_estado_viaje,
+                a.id_conductor,
+                func.timestampdiff(text("MINUTE"), a.inicio_viaje, a.fin_viaje),
+            )
+            .outerjoin(a, a.id_viaje == v.id_viaje)
+            .where(v.id_hotel == self.id_hotel)
+            .order_by(v.id_viaje)
+            .execution_options(yield_per=5000)
+        )
+        cols = tuple(array(c.typecode) for c in self._columnas())
+        ids, minutos, horas, dias, rutas, estados, conductores, duraciones = cols
+        for id_viaje, agendada, id_ruta, estado, id_conductor, duracion in filas:
+            hora, dia = hora_y_dia(agendada, tz)
+            ids.append(id_viaje)
+            minutos.append(minutos_epoch(agendada))
+            horas.append(hora)
+            dias.append(dia)
+            rutas.append(id_ruta)
+            estados.append(estado)
+            conductores.append(id_conductor or _SIN_CONDUCTOR)
+            duraciones.append(_SIN_DURACION if duracion is None else min(int(duracion), 32767))
+
+        with self._lock:
+            (self.ids, self.minutos, self.horas, self.dias, self.rutas,
+             self.estados, self.conductores, self.duraciones) = cols
+            self.zona = tz
+            self.cargado_en = time.monotonic()
+
+    def _columnas(self):
+        return (
+            self.ids, self.minutos, self.horas, self.dias,
+            self.rutas, self.estados, self.conductores, self.duraciones,
+        )
+
+    def upsert(
+        self,
+        id_viaje: int,
+        agendada_para: datetime,
+        id_ruta: int,
+        estado: int,
+        id_conductor: Optional[int],
+        duracion: Optional[int],
+    ) -> None:
+        valores = (
+            id_viaje,
+            minutos_epoch(agendada_para),
+            *hora_y_dia(agendada_para, self.zona),
+            id_ruta,
+            estado,
+            id_conductor or _SIN_CONDUCTOR,
+            _SIN_DURACION if duracion is None else min(duracion, 32767),
+        )
+        with self._lock:
+            pos = bisect_left(self.ids, id_viaje)
+            if pos < len(self.ids) and self.ids[pos] == id_viaje:
+                for col, valor in zip(self._columnas(), valores):
+                    col[pos] = valor
+            elif pos == len(self.ids):
+                for col, valor in zip(self._columnas(), valores):
+                    col.append(valor)
+            else:
+                # Commits fuera de orden de id: inserción en medio (poco frecuente)
+                for col, valor in zip(self._columnas(), valores):
+                    col.insert(pos, valor)
+
+    # ---------- consultas ----------
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def bytes_usados(self) -> int:
+        return sum(c.itemsize * len(c) for c in self._columnas())
+
+    def consultar(
+        self,
+        agrupar: Optional[str] = None,
+        id_ruta: Optional[int] = None,
+        id_conductor: Optional[int] = None,
+        estado: Optional[int] = None,
+        hora: Optional[int] = None,
+        dia_semana: Optional[int] = None,
+        desde: Optional[datetime] = None,
+        hasta: Optional[datetime] = None,
+    ) -> Dict:
+        """
+        Cuenta viajes (y duración promedio real) que cumplen los filtros,
+        opcionalmente agrupados por una de AGRUPACIONES.
+        hora (0-23) y dia_semana (0=lunes) son los de agendada_para en la hora
+        local del hotel; desde/hasta se comparan en UTC, como se guardan.
+        """
+        m_desde = minutos_epoch(desde) if desde else None
+        m_hasta = minutos_epoch(hasta) if hasta else None
+
+        with self._lock:
+            # Vistas sin copia; se liberan antes de soltar el lock porque un
+            # array con vistas exportadas no admite append/insert.
+            vistas = [memoryview(c) for c in self._columnas()[1:]]
+            try:
+                grupos = _agrupar(
+                    *vistas, agrupar, id_ruta, id_conductor, estado,
+                    hora, dia_semana, m_desde, m_hasta
+                )
+            finally:
+                for vista in vistas:
+                    vista.release()
+
+        return {
+            clave: {
+                "viajes": viajes,
+                "duracion_promedio_minutos": round(total / con_dur, 2) if con_dur else None,
+            }
+            for clave, (viajes, total, con_dur) in sorted(grupos.items(), key=lambda kv: kv[0])
+        }
+
+
+def _agrupar(
+    minutos, horas, dias, rutas, estados, conductores, duraciones,
+    agrupar, id_ruta, id_conductor, estado, hora, dia_semana, m_desde, m_hasta,
+) -> Dict:
+    """Filtro + group-by en una pasada sobre las columnas."""
+    grupos: Dict = {}
+    for i in range(len(minutos)):
+        m = minutos[i]
+        if m_desde is not None and m < m_desde:
+            continue
+        if m_hasta is not None and m > m_hasta:
+            continue
+        if id_ruta is not None and rutas[i] != id_ruta:
+            continue
+        if id_conductor is not None and conductores[i] != id_conductor:
+            continue
+        if estado is not None and estados[i] != estado:
+            continue
+        h = horas[i]
+        if hora is not None and h != hora:
+            continue
+        d = dias[i]
+        if dia_semana is not None and d != dia_semana:
+            continue
+
+        if agrupar is None:
+            clave = "total"
+        elif agrupar == "hora":
+            clave = h
+        elif agrupar == "dia_semana":
+            clave = d
+        elif agrupar == "ruta":
+            clave = rutas[i]
+        elif agrupar == "conductor":
+            clave = conductores[i]
+        else:
+            clave = estados[i]
+
+        g = grupos.get(clave)
+        if g is None:
+            g = grupos[clave] = [0, 0, 0]  # viajes, minutos, con duración
+        g[0] += 1
+        dur = duraciones[i]
+        if dur != _SIN_DURACION:
+            g[1] += dur
+            g[2] += 1
+    return grupos
+
+
+# =========================
+#   Registro por hotel
+# =========================
+
+_almacenes: Dict[int, AlmacenViajes] = {}
+_registro_lock = threading.Lock()
+
+
+def habilitado() -> bool:
+    return settings.ALMACEN_ANALITICO
+
+
+def obtener(db: Session, id_hotel: int) -> AlmacenViajes:
+    """
+    Devuelve el almacén del hotel, cargándolo (o recargándolo si venció el TTL
+    o cambió la zona horaria del hotel).
+    """
+    with _registro_lock:
+        almacen = _almacenes.get(id_hotel)
+        if almacen is None:
+            almacen = _almacenes[id_hotel] = AlmacenViajes(id_hotel)
+
+    vencido = time.monotonic() - almacen.cargado_en > settings.ALMACEN_ANALITICO_TTL_SEGUNDOS
+    otra_zona = zona_horaria.zona_de_hotel(db, id_hotel) != almacen.zona
+    if not almacen.cargado_en or vencido or otra_zona:
+        almacen.cargar(db)
+    return almacen
+
+
+def invalidar(id_hotel: int) -> None:
+    """Fuerza la recarga del almacén del hotel en la próxima consulta (tras cargas masivas)."""
+    almacen = _almacenes.get(id_hotel)
+    if almacen is not None:
+        almacen.cargado_en = 0.0
+
+
+def registrar(viaje: models.Viaje, asignacion: Optional[models.AsignacionViajes] = None) -> None:
+    """
+    Refleja un viaje recién escrito en el almacén de su hotel, si está cargado.
+    Llamar después del commit; sin almacén habilitado no hace nada (ni consulta).
+    Si no se pasa la asignación se toma de `viaje.asignacion`.
+    """
+    if not settings.ALMACEN_ANALITICO:
+        return
+    almacen = _almacenes.get(viaje.id_hotel)
+    if almacen is None or not almacen.cargado_en:
+        return
+
+    if asignacion is None:
+        asignacion = viaje.asignacion
+
+    duracion = None
+    id_conductor = None
+    if asignacion is not None:
+        id_conductor = asignacion.id_conductor
+        if asignacion.inicio_viaje and asignacion.fin_viaje:
+            duracion = int((asignacion.fin_viaje - asignacion.inicio_viaje).total_seconds() // 60)
+
+    almacen.upsert(
+        viaje.id_viaje,
+        viaje.agendada_para,
+        viaje.id_ruta,
+        viaje.id_estado_viaje,
+        id_conductor,
+        duracion,
+    )
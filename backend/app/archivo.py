@@ -0,0 +1,186 @@
+# app/archivo.py
+"""
+Archivo del historial: viajes terminados (con su asignación) y notificaciones
+leídas más viejos que ARCHIVO_HORIZONTE_DIAS pasan a viajes_archivo,
+asignacion_viajes_archivo y notificaciones_archivo. Así las tablas calientes,
+y sus índices, quedan acotadas a lo reciente.
+
+Se mueve por lotes de ARCHIVO_LOTE filas, cada uno en su transacción:
+INSERT IGNORE ... SELECT a la tabla de archivo y DELETE de la original. Se
+puede cortar y volver a correr cuando sea: cada lote es atómico y lo ya
+movido no vuelve a seleccionarse.
+
+    python -m app.archivo                 # todo lo pendiente
+    python -m app.archivo --max-lotes 50  # un tramo acotado (p. ej. desde cron)
+
+Las consultas históricas (KPIs, exportaciones, reconstrucción de agregados)
+ven también lo archivado con:
+
+    v = archivo.viajes(incluir_archivados)        # models.Viaje o la unión
+    a = archivo.asignaciones(incluir_archivados)
+    select(v.id_hotel, ...).where(v.agendada_para >= ...)
+
+La unión (UNION ALL de la tabla caliente y la de archivo) tiene las mismas
+columnas que el modelo, así que el resto de la consulta no cambia.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, insert, literal, select, union_all
+from sqlalchemy.orm import Session, aliased
+
+from . import models, versiones
+from .config import settings
+
+ESTADOS_TERMINADOS = (5, 6)  # FINALIZADO, CANCELADO
+_LEIDA = 2
+
+
+# =========================
+#   Consultas con archivo
+# =========================
+
+def _columnas(modelo) -> list:
+    return [c.name for c in modelo.__table__.columns]
+
+
+def _con_archivo(modelo, modelo_archivo, nombre: str):
+    """Alias del modelo sobre tabla caliente UNION ALL tabla de archivo."""
+    nombres = _columnas(modelo)
+    caliente, frio = modelo.__table__, modelo_archivo.__table__
+    union = union_all(
+        select(*[caliente.c[n] for n in nombres]),
+        select(*[frio.c[n] for n in nombres]),
+    ).subquery(nombre)
+    return aliased(modelo, union, adapt_on_names=True)
+
+
+_VIAJES = _con_archivo(models.Viaje, models.ViajeArchivo, "viajes_todos")
+_ASIGNACIONES = _con_archivo(models.AsignacionViajes, models.AsignacionViajeArchivo, "asignaciones_todas")
+
+
+def viajes(incluir_archivados: bool = False):
+    return _VIAJES if incluir_archivados else models.Viaje
+
+
+def asignaciones(incluir_archivados: bool = False):
+    return _ASIGNACIONES if incluir_archivados else models.AsignacionViajes
+
+
+# =========================
+#   Movimiento por lotes
+# =========================
+
+def _copiar(db: Session, modelo, modelo_archivo, condicion, ahora: datetime) -> None:
+    nombres = _columnas(modelo)
+    tabla = modelo.__table__
+    db.execute(
+        insert(modelo_archivo)
+        .prefix_with("IGNORE", dialect="mysql")
+        .from_select(
+            nombres + ["archivado_en"],
+            select(*[tabla.c[n] for n in nombres], literal(ahora)).where(condicion),
+        )
+    )
+
+
+def archivar_viajes(db: Session, antes_de: datetime, lote: int) -> int:
+    """Mueve un lote de viajes terminados (y sus asignaciones). Hace commit. Devuelve cuántos."""
+    v, a = models.Viaje, models.AsignacionViajes
+    # idx_via_estado_fecha: rango por estado y fecha, sin recorrer lo reciente
+    filas = db.execute(
+        select(v.id_viaje, v.id_hotel)
+        .where(v.id_estado_viaje.in_(ESTADOS_TERMINADOS), v.agendada_para < antes_de)
+        .limit(lote)
+    ).all()
+    if not filas:
+        return 0
+    ids = [id_viaje for id_viaje, _ in filas]
+
+    ahora = datetime.utcnow()
+    _copiar(db, v, models.ViajeArchivo, v.id_viaje.in_(ids), ahora)
+    _copiar(db, a, models.AsignacionViajeArchivo, a.id_viaje.in_(ids), ahora)
+    db.execute(delete(a).where(a.id_viaje.in_(ids)))
+    db.execute(delete(v).where(v.id_viaje.in_(ids)))
+    # Los listados de esos hoteles cambian (ETag de /viajes, /asignaciones)
+    for id_hotel in {id_hotel for _, id_hotel in filas}:
+        versiones.incrementar(db, id_hotel, "viajes")
+    db.commit()
+    return len(ids)
+
+
+def archivar_notificaciones(db: Session, antes_de: datetime, lote: int) -> int:
+    """Mueve un lote de notificaciones leídas. Hace commit. Devuelve cuántas."""
+    n = models.Notificacion
+    # idx_not_estado_fecha: rango por estado y fecha, sin recorrer lo reciente ni lo no leído
+    ids = db.scalars(
+        select(n.id_notificacion)
+        .where(n.id_estado_mensaje == _LEIDA, n.fecha_envio < antes_de.date())
+        .limit(lote)
+    ).all()
+    if not ids:
+        return 0
+    _copiar(db, n, models.NotificacionArchivo, n.id_notificacion.in_(ids), datetime.utcnow())
+    db.execute(delete(n).where(n.id_notificacion.in_(ids)))
+    db.commit()
+    return len(ids)
+
+
+def archivar(
+    db: Session,
+    horizonte_dias: Optional[int] = None,
+    lote: Optional[int] = None,
+    max_lotes: Optional[int] = None,
+) -> dict:
+    """
+    Archiva lo más viejo que el horizonte, lote a lote (pausa de
+    ARCHIVO_PAUSA_MS entre lotes para no acaparar la BD). Con `max_lotes`
+    se detiene antes; la próxima corrida sigue donde quedó.
+    """
+    horizonte = horizonte_dias or settings.ARCHIVO_HORIZONTE_DIAS
+    tamano = lote or settings.ARCHIVO_LOTE
+    antes_de = datetime.utcnow() - timedelta(days=horizonte)
+    pausa = settings.ARCHIVO_PAUSA_MS / 1000
+    resultado = {"viajes": 0, "notificaciones": 0, "lotes": 0}
+
+    def _queda_cupo() -> bool:
+        return max_lotes is None or resultado["lotes"] < max_lotes
+
+    while _queda_cupo():
+        movidos = archivar_viajes(db, antes_de, tamano)
+        if not movidos:
+            break
+        resultado["viajes"] += movidos
+        resultado["lotes"] += 1
+        time.sleep(pausa)
+
+    while _queda_cupo():
+        movidas = archivar_notificaciones(db, antes_de, tamano)
+        if not movidas:
+            break
+        resultado["notificaciones"] += movidas
+        resultado["lotes"] += 1
+        time.sleep(pausa)
+
+    return resultado
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Archiva viajes terminados y notificaciones leídas antiguos.")
+    parser.add_argument("--horizonte-dias", type=int, default=None,
+                        help="Antigüedad mínima (por defecto ARCHIVO_HORIZONTE_DIAS)")
+    parser.add_argument("--lote", type=int, default=None, help="Filas por lote (por defecto ARCHIVO_LOTE)")
+    parser.add_argument("--max-lotes", type=int, default=None, help="Detenerse tras esta cantidad de lotes")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        r = archivar(db, args.horizonte_dias, args.lote, args.max_lotes)
+        print(f"✅ Archivados {r['viajes']} viajes y {r['notificaciones']} notificaciones en {r['lotes']} lotes")
+    finally:
+        db.close()
@@ -0,0 +1,226 @@
+# app/calendario.py
+"""
+Calendarios de disponibilidad de conductores como mapas de bits.
+
+Un día son 96 franjas de 15 minutos en hora local del hotel (bit i = franja
+que empieza en i*15 min); se guarda en 12 bytes little-endian. La semana son
+7 días seguidos (84 bytes, lunes primero). Una excepción reemplaza el día
+completo para una fecha.
+
+En memoria cada día es un int de Python, así que "¿está disponible entre
+X e Y?" es un AND con una máscara. Para contar conductores por franja se
+traspone: `CalendarioHotel.columnas(fecha)` da, por franja, un int donde el
+bit j es el conductor j, y el conteo es un popcount (`int.bit_count`).
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+MINUTOS_FRANJA = 15
+FRANJAS_DIA = 96
+BYTES_DIA = FRANJAS_DIA // 8
+BYTES_SEMANA = BYTES_DIA * 7
+
+
+# =========================
+#   Codificación
+# =========================
+
+def dia_de_bytes(datos: bytes) -> int:
+    return int.from_bytes(datos[:BYTES_DIA], "little")
+
+
+def dia_a_bytes(bits: int) -> bytes:
+    return bits.to_bytes(BYTES_DIA, "little")
+
+
+def semana_de_bytes(datos: bytes) -> List[int]:
+    datos = bytes(datos).ljust(BYTES_SEMANA, b"\0")
+    return [dia_de_bytes(datos[i * BYTES_DIA:(i + 1) * BYTES_DIA]) for i in range(7)]
+
+
+def semana_a_bytes(dias: Sequence[int]) -> bytes:
+    return b"".join(dia_a_bytes(d) for d in dias)
+
+
+def _rango(desde: int, hasta: int) -> int:
+    """Bits de las franjas [desde, hasta)."""
+    return ((1 << (hasta - desde)) - 1) << desde if hasta > desde else 0
+
+
+def _franja(desde: time, hasta: time) -> Tuple[int, int]:
+    """
+    (bits del día, bits del día siguiente) de una franja. hasta 00:00 = fin
+    del día; otro hasta <= desde cruza la medianoche (22:00-06:00 sigue el
+    día siguiente de 00:00 a 06:00).
+    """
+    ini = (desde.hour * 60 + desde.minute) // MINUTOS_FRANJA
+    fin = -(-(hasta.hour * 60 + hasta.minute) // MINUTOS_FRANJA)  # redondeo hacia arriba
+    if fin == 0:
+        return _rango(ini, FRANJAS_DIA), 0
+    if hasta <= desde:
+        return _rango(ini, FRANJAS_DIA), _rango(0, fin)
+    return _rango(ini, fin), 0
+
+
+def franjas_a_bits(franjas: Iterable[Tuple[time, time]]) -> int:
+    """
+    [(desde, hasta)] -> bits de un día suelto (excepciones). hasta 00:00 = fin
+    del día; una franja que cruza la medianoche es ValueError, porque la parte
+    del día siguiente no tiene dónde ir.
+    """
+    bits = 0
+    for desde, hasta in franjas:
+        dia, siguiente = _franja(desde, hasta)
+        if siguiente:
+            raise ValueError(
+                f"La franja {desde:%H:%M}-{hasta:%H:%M} cruza la medianoche; "
+                "defina la fecha siguiente por separado"
+            )
+        bits |= dia
+    return bits
+
+
+def semana_de_franjas(dias: Sequence[Iterable[Tuple[time, time]]]) -> List[int]:
+    """
+    7 listas de (desde, hasta), lunes primero -> bits de cada día. Lo que
+    cruza la medianoche pasa al día siguiente (el domingo sigue en el lunes).
+    """
+    semana = [0] * 7
+    for i, franjas in enumerate(dias):
+        for desde, hasta in franjas:
+            dia, siguiente = _franja(desde, hasta)
+            semana[i] |= dia
+            semana[(i + 1) % 7] |= siguiente
+    return semana
+
+
+def bits_a_franjas(bits: int) -> List[Dict[str, str]]:
+    """Bits del día -> [{"desde": "HH:MM", "hasta": "HH:MM"}] (tramos contiguos)."""
+    tramos = []
+    i = 0
+    while i < FRANJAS_DIA:
+        if bits >> i & 1:
+            j = i
+            while j < FRANJAS_DIA and bits >> j & 1:
+                j += 1
+            tramos.append({"desde": _hhmm(i), "hasta": _hhmm(j % FRANJAS_DIA)})
+            i = j
+        else:
+            i += 1
+    return tramos
+
+
+def _hhmm(franja: int) -> str:
+    minutos = franja * MINUTOS_FRANJA
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def dias_con_disponibilidad(semana: Sequence[int]) -> int:
+    return sum(1 for d in semana if d)
+
+
+def _tramos(inicio: datetime, fin: datetime) -> Iterator[Tuple[date, int, int]]:
+    """(fecha, franja_desde, franja_hasta) que cubren [inicio, fin) en hora local."""
+    if fin <= inicio:
+        fin = inicio + timedelta(minutes=MINUTOS_FRANJA)
+    dia = inicio.date()
+    while datetime.combine(dia, time()) < fin:
+        medianoche = datetime.combine(dia, time())
+        desde = max(inicio, medianoche) - medianoche
+        hasta = min(fin, medianoche + timedelta(days=1)) - medianoche
+        f_desde = int(desde.total_seconds() // 60) // MINUTOS_FRANJA
+        f_hasta = -(-int(hasta.total_seconds() // 60) // MINUTOS_FRANJA)
+        if f_hasta > f_desde:
+            yield dia, f_desde, f_hasta
+        dia += timedelta(days=1)
+
+
+# =========================
+#   Calendarios de un hotel
+# =========================
+
+class CalendarioHotel:
+    """Calendarios (semana + excepciones) de un grupo de conductores."""
+
+    def __init__(self, semanas: Dict[int, List[int]], excepciones: Dict[int, Dict[date, int]]):
+        self.semanas = semanas
+        self.excepciones = excepciones
+        self.ids = sorted(semanas)  # bit j de cada columna <-> ids[j]
+        self._columnas: Dict[date, List[int]] = {}
+
+    def __contains__(self, id_conductor: int) -> bool:
+        return id_conductor in self.semanas
+
+    def bits_dia(self, id_conductor: int, fecha: date) -> int:
+        exc = self.excepciones.get(id_conductor)
+        if exc and fecha in exc:
+            return exc[fecha]
+        return self.semanas[id_conductor][fecha.weekday()]
+
+    def disponible(self, id_conductor: int, inicio: datetime, fin: datetime) -> bool:
+        """¿Cubre el calendario todas las franjas de [inicio, fin) (hora local)?"""
+        for fecha, desde, hasta in _tramos(inicio, fin):
+            mascara = _rango(desde, hasta)
+            if self.bits_dia(id_conductor, fecha) & mascara != mascara:
+                return False
+        return True
+
+    def columnas(self, fecha: date) -> List[int]:
+        """Por franja del día, bitset de conductores disponibles (bit j = ids[j])."""
+        cols = self._columnas.get(fecha)
+        if cols is None:
+            cols = [0] * FRANJAS_DIA
+            for j, id_conductor in enumerate(self.ids):
+                bits = self.bits_dia(id_conductor, fecha)
+                while bits:
+                    bajo = bits & -bits
+                    cols[bajo.bit_length() - 1] |= 1 << j
+                    bits ^= bajo
+            self._columnas[fecha] = cols
+        return cols
+
+    def conteo_por_franja(self, fecha: date) -> List[int]:
+        return [c.bit_count() for c in self.columnas(fecha)]
+
+    def disponibles(self, inicio: datetime, fin: datetime) -> int:
+        """Cuántos conductores están disponibles durante todo [inicio, fin)."""
+        todos = (1 << len(self.ids)) - 1
+        for fecha, desde, hasta in _tramos(inicio, fin):
+            cols = self.columnas(fecha)
+            for f in range(desde, hasta):
+                todos &= cols[f]
+        return todos.bit_count()
+
+
+def cargar(
+    db: Session, ids_conductor: Iterable[int], desde: date, hasta: date
+) -> CalendarioHotel:
+    """Calendarios de los conductores dados (los que tengan) y sus excepciones en [desde, hasta]."""
+    ids = list(ids_conductor)
+    semanas: Dict[int, List[int]] = {}
+    excepciones: Dict[int, Dict[date, int]] = {}
+    if ids:
+        c = models.CalendarioConductor
+        for id_conductor, franjas in db.execute(
+            select(c.id_conductor, c.franjas).where(c.id_conductor.in_(ids))
+        ):
+            semanas[id_conductor] = semana_de_bytes(franjas)
+
+        e = models.ExcepcionCalendario
+        for id_conductor, fecha, franjas in db.execute(
+            select(e.id_conductor, e.fecha, e.franjas)
+            .where(e.id_conductor.in_(ids), e.fecha >= desde, e.fecha <= hasta)
+        ):
+            if id_conductor in semanas:
+                excepciones.setdefault(id_conductor, {})[fecha] = dia_de_bytes(franjas)
+    return CalendarioHotel(semanas, excepciones)
+
+
+def leer(db: Session, id_conductor: int) -> Optional[List[int]]:
+    fila = db.get(models.CalendarioConductor, id_conductor)
+    return semana_de_bytes(fila.franjas) if fila else None
@@ -0,0 +1,156 @@
+# app/catalogos.py
+"""
+Catálogos (estados, tipos de usuario, ciudades y marcas) en memoria.
+
+Son tablas chicas que casi no cambian y se leían en cada request (joins con
+MarcaVehiculo/EstadoVehiculo/TipoUsuario, relecturas tras un commit). Se
+cargan al iniciar en una foto inmutable (`Catalogos`, diccionarios de solo
+lectura id -> nombre) y los nombres se resuelven en memoria.
+
+La foto no se modifica: al cambiar una marca se construye otra completa y se
+reemplaza la referencia, así un request nunca ve una foto a medio armar.
+
+    catalogos.registrar_cambio(db)   # antes del commit (sube la versión)
+    db.commit()
+    catalogos.recargar(db)           # después del commit
+
+Con varios workers, cada lectura compara la versión de la foto con la copia
+local de versiones_hotel.catalogos (fila id_hotel = 0, ver versiones.py).
+
+Cada catálogo lleva su JSON ya serializado y un ETag del contenido; los
+endpoints responden con `respuesta(...)` (304 si el cliente ya lo tiene).
+"""
+import hashlib
+import json
+import threading
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models, versiones, http_cache
+from .config import settings
+
+
+class Catalogos:
+    """Foto de todos los catálogos en una versión dada (solo lectura)."""
+
+    def __init__(self, version: int, tablas: Dict[str, Dict[int, str]], campos: Dict[str, Tuple[str, str]]):
+        self.version = version
+        self.estados_actividad: Mapping[int, str] = MappingProxyType(tablas["estados_actividad"])
+        self.estados_vehiculo: Mapping[int, str] = MappingProxyType(tablas["estados_vehiculo"])
+        self.estados_viaje: Mapping[int, str] = MappingProxyType(tablas["estados_viaje"])
+        self.estados_mensaje: Mapping[int, str] = MappingProxyType(tablas["estados_mensaje"])
+        self.tipos_usuario: Mapping[int, str] = MappingProxyType(tablas["tipos_usuario"])
+        self.ciudades: Mapping[int, str] = MappingProxyType(tablas["ciudades"])
+        self.marcas: Mapping[int, str] = MappingProxyType(tablas["marcas"])
+
+        # JSON y ETag por catálogo, con la misma forma que los *Out de schemas.
+        # Las marcas van por nombre (como listaba /vehiculos/marcas); el resto por id.
+        self._cuerpos: Dict[str, Tuple[bytes, str]] = {}
+        todos = {}
+        for nombre, (campo_id, campo_nombre) in campos.items():
+            orden = (lambda kv: (kv[1].casefold(), kv[0])) if nombre == "marcas" else None
+            filas = [
+                {campo_id: k, campo_nombre: v}
+                for k, v in sorted(tablas[nombre].items(), key=orden)
+            ]
+            todos[nombre] = filas
+            self._cuerpos[nombre] = _cuerpo(filas)
+        self._cuerpos["todos"] = _cuerpo(todos)
+
+    def cuerpo(self, nombre: str) -> Tuple[bytes, str]:
+        """(JSON, ETag) del catálogo `nombre` ("todos" para el conjunto)."""
+        return self._cuerpos[nombre]
+
+
+def _cuerpo(contenido) -> Tuple[bytes, str]:
+    datos = json.dumps(contenido, ensure_ascii=False, separators=(",", ":")).encode()
+    return datos, '"' + hashlib.blake2b(datos, digest_size=12).hexdigest() + '"'
+
+
+# nombre -> (modelo, columna id, columna nombre)
+_TABLAS = {
+    "estados_actividad": (models.EstadoActividad, "id_estado_actividad", "nombre_estado"),
+    "estados_vehiculo": (models.EstadoVehiculo, "id_estado_vehiculo", "nombre_estado_vehiculo"),
+    "estados_viaje": (models.EstadoViaje, "id_estado_viaje", "nombre_estado_viaje"),
+    "estados_mensaje": (models.EstadosMensajes, "id_estado_mensaje", "nombre_estado_mensaje"),
+    "tipos_usuario": (models.TipoUsuario, "id_tipo_usuario", "nombre_tipo_usuario"),
+    "ciudades": (models.Ciudad, "id_ciudad", "nombre_ciudad"),
+    "marcas": (models.MarcaVehiculo, "id_marca_vehiculo", "nombre_marca_vehiculo"),
+}
+NOMBRES = frozenset(_TABLAS)
+
+
+def _construir(db: Session) -> Catalogos:
+    # La versión se lee antes que los datos (ver flota._construir)
+    version = versiones.leer(db, versiones.ID_GLOBAL, "catalogos")
+    tablas = {
+        nombre: dict(db.execute(select(getattr(m, campo_id), getattr(m, campo_nombre))).all())
+        for nombre, (m, campo_id, campo_nombre) in _TABLAS.items()
+    }
+    campos = {nombre: (campo_id, campo_nombre) for nombre, (_, campo_id, campo_nombre) in _TABLAS.items()}
+    return Catalogos(version, tablas, campos)
+
+
+# =========================
+#   Registro
+# =========================
+
+_actual: Optional[Catalogos] = None
+_carga_lock = threading.Lock()
+
+
+def recargar(db: Session) -> Catalogos:
+    """Construye una foto nueva y la publica (reemplazo atómico de la referencia)."""
+    global _actual
+    with _carga_lock:
+        _actual = _construir(db)
+    return _actual
+
+
+def obtener(db: Session, verificar: bool = False) -> Catalogos:
+    """
+    Foto vigente; recarga si no hay o si hay una versión más nueva.
+    Con `verificar=True` consulta la versión en la BD (p. ej. ante un id desconocido).
+    """
+    cat = _actual
+    if cat is None:
+        return recargar(db)
+    if verificar:
+        version = versiones.leer(db, versiones.ID_GLOBAL, "catalogos")
+    else:
+        version = versiones.actual(db, versiones.ID_GLOBAL, "catalogos")
+    if version > cat.version:
+        return recargar(db)
+    return cat
+
+
+def contiene(db: Session, catalogo: str, clave: Optional[int]) -> bool:
+    """Valida un id contra el catálogo; si no está, verifica la versión antes de rechazarlo."""
+    if clave in getattr(obtener(db), catalogo):
+        return True
+    return clave in getattr(obtener(db, verificar=True), catalogo)
+
+
+def registrar_cambio(db: Session) -> None:
+    """Sube la versión de catálogos en la transacción actual (sin commit)."""
+    versiones.incrementar(db, versiones.ID_GLOBAL, "catalogos")
+
+
+# =========================
+#   HTTP
+# =========================
+
+def respuesta(request: Request, db: Session, nombre: str) -> Response:
+    """JSON del catálogo con ETag y Cache-Control; 304 si If-None-Match coincide."""
+    datos, etag = obtener(db).cuerpo(nombre)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.CATALOGOS_MAX_AGE_SEGUNDOS}",
+    }
+    if http_cache.coincide(request, etag):
+        return http_cache.no_modificado(headers)
+    return Response(content=datos, media_type="application/json", headers=headers)
@@ -25,6 +25,60 @@ class Settings(BaseSettings):
     # CORS (tu .env usa ORS_ORIGINS)
     CORS_ORIGINS: str = Field(default="", validation_alias=AliasChoices("CORS_ORIGINS", "ORS_ORIGINS"))
 
+    # Zona horaria por defecto de los hoteles sin `zona_horaria` (nombre IANA)
+    ZONA_HORARIA_DEFAULT: str = Field(default="UTC", validation_alias="ZONA_HORARIA_DEFAULT")
+
+    # Almacén analítico en memoria (columnas por hotel) para KPIs ad-hoc
+    ALMACEN_ANALITICO: bool = Field(default=False, validation_alias="ALMACEN_ANALITICO")
+    ALMACEN_ANALITICO_TTL_SEGUNDOS: int = Field(default=300, validation_alias="ALMACEN_ANALITICO_TTL_SEGUNDOS")
+
+    # Versiones por hotel: cada cuánto cada worker relee su copia (flota, catálogos, ETags)
+    VERSIONES_REFRESCO_MS: int = Field(
+        default=300, validation_alias=AliasChoices("VERSIONES_REFRESCO_MS", "FLOTA_VERSION_TTL_MS")
+    )
+
+    # Catálogos en memoria: cuánto puede el cliente reusar su copia sin preguntar
+    CATALOGOS_MAX_AGE_SEGUNDOS: int = Field(default=300, validation_alias="CATALOGOS_MAX_AGE_SEGUNDOS")
+
+    # Posiciones GPS: puntos en memoria por vehículo, muestreo y cada cuánto se guardan
+    POSICIONES_BUFFER: int = Field(default=720, validation_alias="POSICIONES_BUFFER")
+    POSICIONES_MUESTREO_SEGUNDOS: int = Field(default=30, validation_alias="POSICIONES_MUESTREO_SEGUNDOS")
+    POSICIONES_FLUSH_SEGUNDOS: int = Field(default=10, validation_alias="POSICIONES_FLUSH_SEGUNDOS")
+    POSICIONES_TOLERANCIA_FUTURO_SEGUNDOS: int = Field(default=5, validation_alias="POSICIONES_TOLERANCIA_FUTURO_SEGUNDOS")
+
+    # ETA de viajes: vigencia de la foto de colas por hotel y del resultado por viaje
+    ETA_CACHE_SEGUNDOS: int = Field(default=10, validation_alias="ETA_CACHE_SEGUNDOS")
+
+    # Viajes compartidos: misma ruta y horarios a lo más a esta distancia (0 = desactivado)
+    POOLING_VENTANA_MINUTOS: int = Field(default=10, validation_alias="POOLING_VENTANA_MINUTOS")
+
+    # Duraciones aprendidas por ruta y hora: suavizado, guardado y si se usan al programar
+    DURACION_EWMA_ALFA: float = Field(default=0.2, validation_alias="DURACION_EWMA_ALFA")
+    DURACIONES_GUARDADO_SEGUNDOS: int = Field(default=60, validation_alias="DURACIONES_GUARDADO_SEGUNDOS")
+    USAR_DURACION_APRENDIDA: bool = Field(default=False, validation_alias="USAR_DURACION_APRENDIDA")
+
+    # Plantillas de viajes recurrentes: horizonte de expansión y cada cuánto se expanden
+    PLANTILLAS_HORIZONTE_HORAS: int = Field(default=48, validation_alias="PLANTILLAS_HORIZONTE_HORAS")
+    PLANTILLAS_INTERVALO_SEGUNDOS: int = Field(default=600, validation_alias="PLANTILLAS_INTERVALO_SEGUNDOS")
+
+    # Exportaciones: filas por lote leídas del cursor del servidor (y por trozo enviado)
+    EXPORTACION_LOTE: int = Field(default=2000, validation_alias="EXPORTACION_LOTE")
+
+    # Importación de historial: filas por lote (un executemany y un commit por lote)
+    IMPORTACION_LOTE: int = Field(default=5000, validation_alias="IMPORTACION_LOTE")
+
+    # Archivo de historial: antigüedad a archivar, filas por lote y pausa entre lotes
+    ARCHIVO_HORIZONTE_DIAS: int = Field(default=365, validation_alias="ARCHIVO_HORIZONTE_DIAS")
+    ARCHIVO_LOTE: int = Field(default=1000, validation_alias="ARCHIVO_LOTE")
+    ARCHIVO_PAUSA_MS: int = Field(default=50, validation_alias="ARCHIVO_PAUSA_MS")
+
+    # Migraciones: espera máxima (s) por el bloqueo de metadatos antes de abortar un ALTER
+    MIGRACION_LOCK_TIMEOUT: int = Field(default=5, validation_alias="MIGRACION_LOCK_TIMEOUT")
+
+    # Instrumentación SQL por request (Server-Timing, log, aviso de N+1 sobre este umbral)
+    SQL_INSTRUMENTACION: bool = Field(default=True, validation_alias="SQL_INSTRUMENTACION")
+    SQL_N1_UMBRAL: int = Field(default=10, validation_alias="SQL_N1_UMBRAL")
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
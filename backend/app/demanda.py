@@ -0,0 +1,224 @@
+# app/demanda.py
+"""
+Demanda de viajes para dotación de conductores.
+
+Dos tablas pequeñas, actualizadas en la misma transacción que crea cada viaje:
+- demanda_hora_semana: matriz 7×24 (día de la semana × hora) por ruta.
+- demanda_diaria: viajes por ruta y fecha, base del pronóstico.
+
+Día de la semana, hora y fecha son los de la hora local del hotel
+(zona_horaria), no UTC: la demanda de las 8:00 locales cae siempre en la
+misma celda aunque el hotel cambie de horario de verano.
+
+El pronóstico es un suavizado exponencial estacional por día de la semana
+(cada lunes se suaviza con los lunes anteriores, etc.) sobre las últimas
+SEMANAS_HISTORIA semanas, repartido por hora según la matriz 7×24. Leer la
+matriz y la historia es de tamaño acotado, no crece con el historial.
+
+Si las tablas se desalinean (cargas manuales), `reconstruir_demanda` las
+recalcula desde viajes:
+
+    python -m app.demanda --hotel 3
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from . import models, archivo, zona_horaria
+
+SEMANAS_HISTORIA = 8
+ALFA = 0.3
+
+
+def _claves(fecha_utc: datetime, tz):
+    """(día de la semana, hora, fecha) locales con que se cuenta un viaje."""
+    fecha = zona_horaria.a_local(fecha_utc, tz)
+    return fecha.weekday(), fecha.hour, fecha.date()
+
+
+def registrar_viaje(db: Session, viaje: models.Viaje) -> None:
+    """Suma el viaje a la matriz semanal y a la serie diaria (sin commit)."""
+    tz = zona_horaria.zona_de_hotel(db, viaje.id_hotel)
+    dia_semana, hora, fecha = _claves(viaje.agendada_para, tz)
+
+    hs = models.DemandaHoraSemana
+    stmt = mysql_insert(hs).values(
+        id_hotel=viaje.id_hotel, id_ruta=viaje.id_ruta,
+        dia_semana=dia_semana, hora=hora, total=1,
+    )
+    db.execute(stmt.on_duplicate_key_update(total=hs.total + 1))
+
+    dd = models.DemandaDiaria
+    stmt = mysql_insert(dd).values(
+        id_hotel=viaje.id_hotel, id_ruta=viaje.id_ruta, fecha=fecha, total=1,
+    )
+    db.execute(stmt.on_duplicate_key_update(total=dd.total + 1))
+
+
+def registrar_viajes(db: Session, viajes: List[models.Viaje]) -> None:
+    """Como `registrar_viaje` para un lote: suma por clave y un upsert (executemany) por tabla."""
+    if not viajes:
+        return
+    semanal: Dict[tuple, int] = {}
+    diaria: Dict[tuple, int] = {}
+    zonas = {}
+    for viaje in viajes:
+        tz = zonas.get(viaje.id_hotel)
+        if tz is None:
+            tz = zonas[viaje.id_hotel] = zona_horaria.zona_de_hotel(db, viaje.id_hotel)
+        _contar(semanal, diaria, viaje.id_hotel, viaje.id_ruta, _claves(viaje.agendada_para, tz))
+
+    hs = models.DemandaHoraSemana
+    stmt = mysql_insert(hs)
+    db.execute(stmt.on_duplicate_key_update(total=hs.total + stmt.inserted.total), [
+        {"id_hotel": h, "id_ruta": r, "dia_semana": d, "hora": hr, "total": n}
+        for (h, r, d, hr), n in semanal.items()
+    ])
+
+    dd = models.DemandaDiaria
+    stmt = mysql_insert(dd)
+    db.execute(stmt.on_duplicate_key_update(total=dd.total + stmt.inserted.total), [
+        {"id_hotel": h, "id_ruta": r, "fecha": f, "total": n}
+        for (h, r, f), n in diaria.items()
+    ])
+
+
+def _contar(semanal: Dict[tuple, int], diaria: Dict[tuple, int], id_hotel: int, id_ruta: int, claves) -> None:
+    dia_semana, hora, fecha = claves
+    k = (id_hotel, id_ruta, dia_semana, hora)
+    semanal[k] = semanal.get(k, 0) + 1
+    k = (id_hotel, id_ruta, fecha)
+    diaria[k] = diaria.get(k, 0) + 1
+
+
+def matriz(db: Session, id_hotel: int, id_ruta: Optional[int] = None) -> List[List[int]]:
+    """Matriz 7×24 (fila 0 = lunes) de viajes históricos del hotel o de una ruta."""
+    hs = models.DemandaHoraSemana
+    q = (
+        select(hs.dia_semana, hs.hora, func.sum(hs.total))
+        .where(hs.id_hotel == id_hotel)
+        .group_by(hs.dia_semana, hs.hora)
+    )
+    if id_ruta is not None:
+        q = q.where(hs.id_ruta == id_ruta)
+
+    celdas = [[0] * 24 for _ in range(7)]
+    for dia_semana, hora, total in db.execute(q):
+        celdas[dia_semana][hora] = int(total or 0)
+    return celdas
+
+
+def pronostico(
+    db: Session,
+    id_hotel: int,
+    id_ruta: Optional[int] = None,
+    dias: int = 7,
+    hoy: Optional[date] = None,
+) -> List[dict]:
+    """
+    Viajes esperados para los próximos `dias` días (desde hoy), en total y por
+    hora local. Cada día de la semana tiene su propio nivel suavizado (alfa = ALFA).
+    `hoy` es la fecha local del hotel (por defecto, la de ahora).
+    """
+    if hoy is None:
+        hoy = zona_horaria.a_local(datetime.utcnow(), zona_horaria.zona_de_hotel(db, id_hotel)).date()
+    desde = hoy - timedelta(weeks=SEMANAS_HISTORIA)
+
+    dd = models.DemandaDiaria
+    q = (
+        select(dd.fecha, func.sum(dd.total))
+        .where(dd.id_hotel == id_hotel, dd.fecha >= desde, dd.fecha < hoy)
+        .group_by(dd.fecha)
+    )
+    if id_ruta is not None:
+        q = q.where(dd.id_ruta == id_ruta)
+    serie = {fecha: int(total or 0) for fecha, total in db.execute(q)}
+
+    # Suavizado por día de la semana; los días sin viajes cuentan como 0
+    niveles: List[Optional[float]] = [None] * 7
+    dia = desde
+    while dia < hoy:
+        x = serie.get(dia, 0)
+        w = dia.weekday()
+        niveles[w] = x if niveles[w] is None else ALFA * x + (1 - ALFA) * niveles[w]
+        dia += timedelta(days=1)
+
+    celdas = matriz(db, id_hotel, id_ruta)
+    resultado = []
+    for i in range(dias):
+        fecha = hoy + timedelta(days=i)
+        w = fecha.weekday()
+        nivel = niveles[w] or 0.0
+        fila = celdas[w]
+        total_fila = sum(fila)
+        por_hora = [nivel * c / total_fila for c in fila] if total_fila else [0.0] * 24
+        resultado.append({
+            "fecha": fecha.isoformat(),
+            "dia_semana": w,
+            "viajes_esperados": round(nivel, 2),
+            "por_hora": [round(x, 2) for x in por_hora],
+        })
+    return resultado
+
+
+def reconstruir_demanda(db: Session, id_hotel: Optional[int] = None) -> None:
+    """
+    Recalcula ambas tablas desde viajes, archivo incluido (todo o un hotel).
+    Se agrupa en Python porque las claves son de hora local y cada hotel
+    tiene su zona (CONVERT_TZ depende de que MySQL tenga cargadas las tablas
+    de zonas). No hace commit.
+    """
+    v = archivo.viajes(True)
+    hs = models.DemandaHoraSemana
+    dd = models.DemandaDiaria
+
+    for tabla in (hs, dd):
+        borrar = delete(tabla)
+        if id_hotel is not None:
+            borrar = borrar.where(tabla.id_hotel == id_hotel)
+        db.execute(borrar)
+
+    q = select(v.id_hotel, v.id_ruta, v.agendada_para).where(v.agendada_para.is_not(None))
+    if id_hotel is not None:
+        q = q.where(v.id_hotel == id_hotel)
+
+    semanal: Dict[tuple, int] = {}
+    diaria: Dict[tuple, int] = {}
+    zonas = {}
+    for hotel, ruta, agendada_para in db.execute(q.execution_options(yield_per=10_000)):
+        tz = zonas.get(hotel)
+        if tz is None:
+            tz = zonas[hotel] = zona_horaria.zona_de_hotel(db, hotel)
+        _contar(semanal, diaria, hotel, ruta, _claves(agendada_para, tz))
+
+    if semanal:
+        db.execute(insert(hs), [
+            {"id_hotel": h, "id_ruta": r, "dia_semana": d, "hora": hr, "total": n}
+            for (h, r, d, hr), n in semanal.items()
+        ])
+    if diaria:
+        db.execute(insert(dd), [
+            {"id_hotel": h, "id_ruta": r, "fecha": f, "total": n}
+            for (h, r, f), n in diaria.items()
+        ])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Reconstruye las tablas de demanda.")
+    parser.add_argument("--hotel", type=int, default=None, help="Solo este hotel (por defecto todos)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        reconstruir_demanda(db, args.hotel)
+        db.commit()
+        print("✅ Demanda reconstruida")
+    finally:
+        db.close()
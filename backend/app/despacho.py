@@ -0,0 +1,370 @@
+# app/despacho.py
+"""
+Despacho de viajes: elige conductor y vehículo para uno o varios viajes de un
+hotel.
+
+Un `Despachador` se arma una vez por lote y precarga todo lo que necesita en
+pocas consultas (no una por candidato):
+- candidatos del registro de flota (choferes activos con vehículo activo);
+- duración de las rutas de los viajes (la aprendida si
+  USAR_DURACION_APRENDIDA está activo, ver duraciones.py);
+- calendarios y excepciones de los candidatos, o su turno abierto si no
+  tienen calendario;
+- viajes ya asignados a los candidatos en los mismos horarios;
+- grupos que aún admiten pasajeros (viajes compartidos, ver abajo).
+
+Después `elegir(viaje)` decide en memoria; cada elección marca al conductor
+como ocupado en ese horario, así un lote no asigna dos viajes simultáneos al
+mismo conductor. Nada hace commit.
+
+Viajes compartidos (POOLING_VENTANA_MINUTOS > 0): antes de buscar un
+conductor libre, `elegir` intenta sumar el viaje a un grupo de la misma ruta
+cuyos horarios queden dentro de la ventana y cuyo vehículo tenga capacidad
+para todos los pasajeros. Cada viaje conserva su AsignacionViajes; las del
+mismo grupo comparten id_recorrido (RecorridoCompartido). Tras crear o
+actualizar la asignación se llama `agrupar(viaje, asignacion)`. Quien saca
+viajes de un recorrido (reasignación, cancelación) llama después
+`depurar_recorridos` para no dejar recorridos de un solo viaje.
+
+viajes.pasajeros y asignacion_viajes.id_recorrido llegan a una base existente
+con la migración 2 (`python -m app.migraciones`).
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from . import models, flota, turnos, calendario, zona_horaria, metricas_conductor, duraciones
+from .config import settings
+
+VEHICULO_ACTIVO = 1
+ESTADOS_OCUPADO = (2, 3, 4)  # ASIGNADO, ACEPTADO, EN_CURSO
+ESTADOS_AGRUPABLES = (2, 3)  # ASIGNADO, ACEPTADO (aún no sale)
+ESTADO_CANCELADO = 6
+
+
+class Grupo:
+    """Viajes de una ruta que comparten conductor y vehículo."""
+    __slots__ = (
+        "id_ruta", "conductor", "desde", "hasta", "pasajeros", "horarios", "asignaciones", "id_recorrido",
+    )
+
+    def __init__(self, id_ruta: int, conductor: flota.ConductorEnFlota, agendada_para: datetime):
+        self.id_ruta = id_ruta
+        self.conductor = conductor
+        self.desde = agendada_para
+        self.hasta = agendada_para
+        self.pasajeros = 0
+        self.horarios: Counter = Counter()  # agendada_para -> viajes del grupo a esa hora
+        self.asignaciones: List[models.AsignacionViajes] = []
+        self.id_recorrido: Optional[int] = None
+
+    def sumar(self, agendada_para: datetime, pasajeros: int) -> None:
+        self.desde = min(self.desde, agendada_para)
+        self.hasta = max(self.hasta, agendada_para)
+        self.pasajeros += pasajeros
+        self.horarios[agendada_para] += 1
+
+    def admite(self, viaje: models.Viaje, ventana: timedelta) -> bool:
+        capacidad = self.conductor.vehiculo.capacidad if self.conductor.vehiculo else None
+        return (
+            capacidad is not None
+            and self.pasajeros + (viaje.pasajeros or 1) <= capacidad
+            and max(self.hasta, viaje.agendada_para) - min(self.desde, viaje.agendada_para) <= ventana
+        )
+
+
+class Despachador:
+
+    def __init__(
+        self,
+        db: Session,
+        id_hotel: int,
+        viajes: List[models.Viaje],
+        excluir_conductores: Iterable[int] = (),
+        excluir_vehiculos: Iterable[int] = (),
+    ):
+        self.db = db
+        self.id_hotel = id_hotel
+        excluir_conductores = set(excluir_conductores)
+        excluir_vehiculos = set(excluir_vehiculos)
+
+        # Las exclusiones cubren cambios aún sin commit que el registro no ve
+        # (conductor suspendido, vehículo dado de baja, fin de turno...).
+        self.candidatos = [
+            c for c in flota.obtener(db, id_hotel).despachables()
+            if c.id_conductor not in excluir_conductores
+            and c.id_vehiculo not in excluir_vehiculos
+            and c.vehiculo is not None
+            and c.vehiculo.id_estado_vehiculo == VEHICULO_ACTIVO
+        ]
+        ids = [c.id_conductor for c in self.candidatos]
+
+        r = models.Ruta
+        ids_ruta = {v.id_ruta for v in viajes}
+        self.rutas: Dict[int, Tuple[str, Optional[int]]] = {
+            id_ruta: (nombre, duracion)
+            for id_ruta, nombre, duracion in db.execute(
+                select(r.id_ruta, r.nombre_ruta, r.duracion_aproximada).where(r.id_ruta.in_(ids_ruta))
+            )
+        } if ids_ruta else {}
+
+        self.tz = zona_horaria.zona_de_hotel(db, id_hotel)
+        if viajes and ids:
+            primero = min(v.agendada_para for v in viajes)
+            ultimo = max(v.agendada_para for v in viajes)
+            self.calendarios = calendario.cargar(
+                db, ids,
+                zona_horaria.a_local(primero, self.tz).date(),
+                zona_horaria.a_local(ultimo, self.tz).date() + timedelta(days=1),
+            )
+        else:
+            self.calendarios = calendario.CalendarioHotel({}, {})
+        self.en_turno: Set[int] = turnos.en_turno(db, [i for i in ids if i not in self.calendarios])
+
+        # (conductor, agendada_para) -> viajes que ya tiene a esa hora
+        self.ocupados: Counter = Counter()
+        horarios = {v.agendada_para for v in viajes}
+        if ids and horarios:
+            a, v = models.AsignacionViajes, models.Viaje
+            ids_lote = [x.id_viaje for x in viajes if x.id_viaje is not None]
+            q = (
+                select(a.id_conductor, v.agendada_para)
+                .join(v, a.id_viaje == v.id_viaje)
+                .where(
+                    a.id_conductor.in_(ids),
+                    v.agendada_para.in_(horarios),
+                    v.id_estado_viaje.in_(ESTADOS_OCUPADO),
+                )
+            )
+            if ids_lote:
+                q = q.where(v.id_viaje.not_in(ids_lote))
+            self.ocupados = Counter(tuple(f) for f in db.execute(q))
+
+        self.ventana = timedelta(minutes=settings.POOLING_VENTANA_MINUTOS)
+        self.grupos: Dict[int, List[Grupo]] = {}   # id_ruta -> grupos abiertos
+        self._grupo_de: Dict[int, Grupo] = {}      # id_viaje -> grupo elegido
+        if settings.POOLING_VENTANA_MINUTOS > 0 and ids and viajes:
+            self._cargar_grupos(viajes, ids_ruta)
+
+    def _cargar_grupos(self, viajes: List[models.Viaje], ids_ruta: Set[int]) -> None:
+        """Asignaciones vigentes de los candidatos que podrían recibir más pasajeros."""
+        a, v = models.AsignacionViajes, models.Viaje
+        q = (
+            self.db.query(a, v.id_ruta, v.agendada_para, v.pasajeros)
+            .join(v, a.id_viaje == v.id_viaje)
+            .filter(
+                v.id_hotel == self.id_hotel,
+                v.id_ruta.in_(ids_ruta),
+                v.id_estado_viaje.in_(ESTADOS_AGRUPABLES),
+                v.agendada_para >= min(x.agendada_para for x in viajes) - self.ventana,
+                v.agendada_para <= max(x.agendada_para for x in viajes) + self.ventana,
+                a.id_conductor.in_([c.id_conductor for c in self.candidatos]),
+            )
+        )
+        ids_lote = [x.id_viaje for x in viajes if x.id_viaje is not None]
+        if ids_lote:
+            q = q.filter(v.id_viaje.not_in(ids_lote))
+
+        por_id = {c.id_conductor: c for c in self.candidatos}
+        grupos: Dict[tuple, Grupo] = {}
+        for asig, id_ruta, agendada, pasajeros in q:
+            c = por_id[asig.id_conductor]
+            if asig.id_vehiculo != c.id_vehiculo:
+                continue
+            clave = ("r", asig.id_recorrido) if asig.id_recorrido else ("a", asig.id_asignacion)
+            g = grupos.get(clave)
+            if g is None:
+                g = grupos[clave] = Grupo(id_ruta, c, agendada)
+                g.id_recorrido = asig.id_recorrido
+                self.grupos.setdefault(id_ruta, []).append(g)
+            g.sumar(agendada, pasajeros or 1)
+            g.asignaciones.append(asig)
+
+    def nombre_ruta(self, viaje: models.Viaje) -> str:
+        return self.rutas.get(viaje.id_ruta, ("ruta", None))[0]
+
+    def _disponible(self, c: flota.ConductorEnFlota, inicio: datetime, fin: datetime) -> bool:
+        """Con calendario: debe cubrir el viaje; sin calendario: turno abierto."""
+        if c.id_conductor in self.calendarios:
+            return self.calendarios.disponible(c.id_conductor, inicio, fin)
+        return c.id_conductor in self.en_turno
+
+    def _libre_para_grupo(self, grupo: Grupo, agendada_para: datetime) -> bool:
+        """El conductor no tiene a esa hora otro viaje que no sea del mismo grupo."""
+        clave = (grupo.conductor.id_conductor, agendada_para)
+        return self.ocupados[clave] <= grupo.horarios[agendada_para]
+
+    def _horario(self, viaje: models.Viaje) -> Tuple[datetime, datetime]:
+        """[inicio, fin) del viaje en hora local del hotel."""
+        inicio = zona_horaria.a_local(viaje.agendada_para, self.tz)
+        duracion = duraciones.duracion(viaje.id_ruta, self.rutas.get(viaje.id_ruta, (None, None))[1], inicio)
+        return inicio, inicio + timedelta(minutes=duracion or calendario.MINUTOS_FRANJA)
+
+    def _grupo_para(
+        self, viaje: models.Viaje, inicio: datetime, fin: datetime, id_conductor: Optional[int] = None
+    ) -> Optional[Grupo]:
+        """
+        Grupo compatible con horario más cercano al del viaje (de ese conductor,
+        si se indica), cuyo conductor esté disponible y libre a esa hora.
+        """
+        compatibles = [
+            g for g in self.grupos.get(viaje.id_ruta, ())
+            if (id_conductor is None or g.conductor.id_conductor == id_conductor)
+            and g.admite(viaje, self.ventana)
+            and self._libre_para_grupo(g, viaje.agendada_para)
+            and self._disponible(g.conductor, inicio, fin)
+        ]
+        if not compatibles:
+            return None
+        return min(compatibles, key=lambda g: abs(g.desde - viaje.agendada_para))
+
+    def elegir(self, viaje: models.Viaje) -> Optional[flota.ConductorEnFlota]:
+        """
+        Conductor para el viaje: el de un grupo compatible de la misma ruta o,
+        si no hay, el primer candidato libre y disponible (lo marca ocupado).
+        """
+        inicio, fin = self._horario(viaje)
+        if self.ventana:
+            grupo = self._grupo_para(viaje, inicio, fin)
+            if grupo is not None:
+                self._grupo_de[viaje.id_viaje] = grupo
+                self.ocupados[(grupo.conductor.id_conductor, viaje.agendada_para)] += 1
+                return grupo.conductor
+
+        for c in self.candidatos:
+            if self.ocupados[(c.id_conductor, viaje.agendada_para)]:
+                continue
+            if not self._disponible(c, inicio, fin):
+                continue
+            self.ocupados[(c.id_conductor, viaje.agendada_para)] += 1
+            if self.ventana:
+                grupo = Grupo(viaje.id_ruta, c, viaje.agendada_para)
+                self.grupos.setdefault(viaje.id_ruta, []).append(grupo)
+                self._grupo_de[viaje.id_viaje] = grupo
+            return c
+        return None
+
+    def unir(self, viaje: models.Viaje, id_conductor: int, id_vehiculo: int) -> Optional[Grupo]:
+        """
+        Para una asignación manual: grupo compatible del conductor elegido (con
+        el mismo vehículo) al que se suma el viaje, o None. Si lo hay, después
+        de crear la asignación se llama `agrupar` como con `elegir`.
+        """
+        if not self.ventana:
+            return None
+        inicio, fin = self._horario(viaje)
+        grupo = self._grupo_para(viaje, inicio, fin, id_conductor)
+        if grupo is None or grupo.conductor.id_vehiculo != id_vehiculo:
+            return None
+        self._grupo_de[viaje.id_viaje] = grupo
+        self.ocupados[(id_conductor, viaje.agendada_para)] += 1
+        return grupo
+
+    def agrupar(self, viaje: models.Viaje, asignacion: models.AsignacionViajes) -> None:
+        """
+        Suma la asignación (ya con el conductor de `elegir`) a su grupo. Al
+        llegar el segundo viaje se crea el RecorridoCompartido. Sin commit.
+        """
+        grupo = self._grupo_de.pop(viaje.id_viaje, None)
+        if grupo is None:
+            asignacion.id_recorrido = None
+            return
+        grupo.sumar(viaje.agendada_para, viaje.pasajeros or 1)
+        grupo.asignaciones.append(asignacion)
+        if len(grupo.asignaciones) < 2:
+            asignacion.id_recorrido = None
+            return
+
+        if grupo.id_recorrido is None:
+            recorrido = models.RecorridoCompartido(
+                id_hotel=self.id_hotel,
+                id_ruta=grupo.id_ruta,
+                id_conductor=grupo.conductor.id_conductor,
+                id_vehiculo=grupo.conductor.id_vehiculo,
+                sale_a=grupo.desde,
+                creado_en=datetime.utcnow(),
+            )
+            self.db.add(recorrido)
+            self.db.flush()
+            grupo.id_recorrido = recorrido.id_recorrido
+        else:
+            recorrido = self.db.get(models.RecorridoCompartido, grupo.id_recorrido)
+            recorrido.sale_a = grupo.desde
+        for a in grupo.asignaciones:
+            a.id_recorrido = grupo.id_recorrido
+
+    def asignar(self, viaje: models.Viaje, asignado_por: Optional[int] = None) -> Optional[dict]:
+        """Crea la asignación de un viaje PENDIENTE (sin commit). None si nadie está libre."""
+        c = self.elegir(viaje)
+        if c is None:
+            return None
+
+        asignacion = models.AsignacionViajes(
+            id_viaje=viaje.id_viaje,
+            id_conductor=c.id_conductor,
+            id_vehiculo=c.id_vehiculo,
+            asignado_a_id_usuario=asignado_por,
+            hora_asignacion=datetime.utcnow()
+        )
+        viaje.id_estado_viaje = 2  # ASIGNADO
+        self.db.add(asignacion)
+        self.agrupar(viaje, asignacion)
+        self.db.flush()
+        metricas_conductor.registrar_asignacion(self.db, viaje, c.id_conductor)
+
+        return {
+            'id_conductor': c.id_conductor,
+            'conductor_usuario_id': c.id_usuario,
+            'id_vehiculo': c.id_vehiculo,
+            'conductor_nombre': f"{c.nombre} {c.apellido}".strip(),
+            'vehiculo_patente': c.vehiculo.patente if c.vehiculo else None,
+            'id_recorrido': asignacion.id_recorrido
+        }
+
+
+def depurar_recorridos(db: Session, ids_recorrido: Iterable[int]) -> None:
+    """
+    Recorridos de los que salieron viajes: los que quedaron con menos de dos
+    asignaciones no canceladas se borran (la que quede vuelve a id_recorrido NULL); en los
+    demás se recalcula la hora de salida. Sin commit.
+    """
+    ids = {i for i in ids_recorrido if i is not None}
+    if not ids:
+        return
+    db.flush()
+    a, v, rc = models.AsignacionViajes, models.Viaje, models.RecorridoCompartido
+    vigentes = {
+        id_recorrido: (n, sale_a)
+        for id_recorrido, n, sale_a in db.execute(
+            select(a.id_recorrido, func.count(a.id_asignacion), func.min(v.agendada_para))
+            .join(v, a.id_viaje == v.id_viaje)
+            .where(a.id_recorrido.in_(ids), v.id_estado_viaje != ESTADO_CANCELADO)
+            .group_by(a.id_recorrido)
+        )
+    }
+    sueltos = [i for i in ids if vigentes.get(i, (0, None))[0] < 2]
+    if sueltos:
+        db.execute(
+            update(a).where(a.id_recorrido.in_(sueltos)).values(id_recorrido=None)
+            .execution_options(synchronize_session="fetch")
+        )
+        db.execute(delete(rc).where(rc.id_recorrido.in_(sueltos)))
+    for id_recorrido, (n, sale_a) in vigentes.items():
+        if n >= 2:
+            db.execute(update(rc).where(rc.id_recorrido == id_recorrido).values(sale_a=sale_a))
+
+
+def soltar_de_recorridos(db: Session, asignaciones: Iterable[models.AsignacionViajes]) -> None:
+    """
+    Saca las asignaciones de sus recorridos compartidos (al cancelar, rechazar,
+    desasignar o cambiar de conductor) y depura esos recorridos. Sin commit.
+    """
+    ids = set()
+    for asig in asignaciones:
+        if asig.id_recorrido is not None:
+            ids.add(asig.id_recorrido)
+            asig.id_recorrido = None
+    depurar_recorridos(db, ids)
@@ -0,0 +1,291 @@
+# app/duraciones.py
+"""
+Duración real aprendida por ruta y hora del día.
+
+Media móvil exponencial (EWMA) de los minutos reales (inicio_viaje →
+fin_viaje) de los viajes finalizados, por clave (id_ruta, hora local de
+inicio). Las primeras muestras se promedian (alfa = max(DURACION_EWMA_ALFA,
+1/n)) para que el valor inicial no dependa solo del primer viaje.
+
+La estimación compartida vive en duraciones_ruta_hora; cada worker tiene una
+copia en memoria para leerla en O(1). Lo que un worker finaliza se acumula
+como pendiente (suma y cantidad por clave) y cada DURACIONES_GUARDADO_SEGUNDOS
+se funde en la fila dentro del upsert:
+
+    minutos  = minutos + a * (media_pendiente - minutos)
+    a        = max(1 - (1 - DURACION_EWMA_ALFA)^n, n / (muestras + n))
+    muestras = muestras + n
+
+(aplicar la EWMA n veces con la media del lote; aproximado mientras hay
+pocas muestras), así las de todos los workers suman en la misma estimación. Tras guardar
+se relee todo; guardar también sube la versión "rutas" de los hoteles
+afectados (ver versiones.py): el ETag de /rutas cambia y `sincronizar`
+relee las filas de ese hotel en los demás workers sin esperar su ciclo.
+Para sembrar desde el historial: `python -m app.duraciones --reconstruir`.
+
+Con USAR_DURACION_APRENDIDA=true el despacho y la ETA usan la duración
+aprendida (si hay suficientes muestras) en lugar de Ruta.duracion_aproximada.
+"""
+import asyncio
+import math
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from . import models, archivo, versiones, zona_horaria
+from .config import settings
+
+MIN_MUESTRAS = 5
+# Duraciones fuera de este rango (minutos) se descartan: viajes no finalizados a tiempo, errores de reloj
+_MIN_MINUTOS, _MAX_MINUTOS = 1, 12 * 60
+
+_estimaciones: Dict[Tuple[int, int], List] = {}  # (id_ruta, hora) -> [minutos, muestras], según la BD
+_pendientes: Dict[Tuple[int, int], List] = {}    # (id_ruta, hora) -> [suma de minutos, n], sin guardar
+_version_cargada: Dict[int, int] = {}  # id_hotel -> versión "rutas" con la que se leyeron sus filas
+_lock = threading.Lock()
+
+
+def _ewma(estimaciones: dict, id_ruta: int, hora: int, minutos: float) -> None:
+    e = estimaciones.get((id_ruta, hora))
+    if e is None:
+        estimaciones[(id_ruta, hora)] = [minutos, 1]
+    else:
+        e[1] += 1
+        alfa = max(settings.DURACION_EWMA_ALFA, 1 / e[1])
+        e[0] += alfa * (minutos - e[0])
+
+
+def registrar(db: Session, viaje: models.Viaje, asignacion: models.AsignacionViajes) -> None:
+    """Anota la duración real de un viaje recién finalizado (se funde al guardar). Llamar después del commit."""
+    if not asignacion.inicio_viaje or not asignacion.fin_viaje:
+        return
+    minutos = (asignacion.fin_viaje - asignacion.inicio_viaje).total_seconds() / 60
+    if not _MIN_MINUTOS <= minutos <= _MAX_MINUTOS:
+        return
+    tz = zona_horaria.zona_de_hotel(db, viaje.id_hotel)
+    clave = (viaje.id_ruta, zona_horaria.a_local(asignacion.inicio_viaje, tz).hour)
+    with _lock:
+        p = _pendientes.setdefault(clave, [0.0, 0])
+        p[0] += minutos
+        p[1] += 1
+
+
+def aprendida(id_ruta: int, hora: Optional[int] = None) -> Optional[float]:
+    """
+    Minutos estimados para la ruta a esa hora local. Si la hora no tiene
+    suficientes muestras (o no se indica), promedio de las horas que sí,
+    ponderado por muestras. None si la ruta no tiene datos suficientes.
+    """
+    if hora is not None:
+        e = _estimaciones.get((id_ruta, hora))
+        if e is not None and e[1] >= MIN_MUESTRAS:
+            return e[0]
+    total = muestras = 0
+    for h in range(24):
+        e = _estimaciones.get((id_ruta, h))
+        if e is not None and e[1] >= MIN_MUESTRAS:
+            total += e[0] * e[1]
+            muestras += e[1]
+    return total / muestras if muestras else None
+
+
+def duracion(id_ruta: int, estatica: Optional[int], inicio_local: Optional[datetime] = None) -> Optional[int]:
+    """Duración a usar al programar: la aprendida si está habilitada y existe, si no la de la ruta."""
+    if settings.USAR_DURACION_APRENDIDA:
+        minutos = aprendida(id_ruta, inicio_local.hour if inicio_local else None)
+        if minutos is not None:
+            return math.ceil(minutos)
+    return estatica
+
+
+def por_hora(id_ruta: int) -> List[dict]:
+    resultado = []
+    for h in range(24):
+        e = _estimaciones.get((id_ruta, h))
+        if e is not None:
+            resultado.append({"hora": h, "minutos": round(e[0], 1), "muestras": e[1]})
+    return resultado
+
+
+# =========================
+#   Persistencia
+# =========================
+
+def cargar(db: Session, id_hotel: Optional[int] = None) -> int:
+    """
+    Lee las estimaciones guardadas: todas (reemplaza la copia) o las de las
+    rutas de un hotel. Devuelve cuántas.
+    """
+    global _estimaciones
+    t = models.DuracionRutaHora
+    q = select(t.id_ruta, t.hora, t.minutos, t.muestras)
+    if id_hotel is not None:
+        q = q.join(models.Ruta, models.Ruta.id_ruta == t.id_ruta).where(models.Ruta.id_hotel == id_hotel)
+    leidas = {(id_ruta, hora): [float(minutos), muestras] for id_ruta, hora, minutos, muestras in db.execute(q)}
+    with _lock:
+        if id_hotel is None:
+            _estimaciones = leidas
+        else:
+            _estimaciones.update(leidas)
+    return len(leidas)
+
+
+def sincronizar(db: Session, id_hotel: int) -> None:
+    """Relee las estimaciones del hotel si otro worker guardó desde la última lectura (versión "rutas")."""
+    version = versiones.actual(db, id_hotel, "rutas")
+    if _version_cargada.get(id_hotel) != version:
+        cargar(db, id_hotel)
+        _version_cargada[id_hotel] = version
+
+
+def _fundir(pendientes: dict, otros: dict) -> None:
+    for clave, (suma, n) in otros.items():
+        p = pendientes.setdefault(clave, [0.0, 0])
+        p[0] += suma
+        p[1] += n
+
+
+def guardar(db: Session) -> int:
+    """
+    Funde lo pendiente en duraciones_ruta_hora (upsert con la EWMA, un
+    executemany), sube la versión "rutas" de los hoteles afectados y relee
+    la copia. Devuelve cuántas claves se guardaron.
+    """
+    global _pendientes
+    with _lock:
+        pendientes, _pendientes = _pendientes, {}
+    if not pendientes:
+        return 0
+    ahora = datetime.utcnow()
+    filas = [
+        {"id_ruta": r, "hora": h, "minutos": suma / n, "muestras": n, "actualizado_en": ahora}
+        for (r, h), (suma, n) in pendientes.items()
+    ]
+    t, r = models.DuracionRutaHora, models.Ruta
+    stmt = mysql_insert(t)
+    nuevas = stmt.inserted.muestras
+    alfa = func.greatest(
+        1 - func.pow(1 - settings.DURACION_EWMA_ALFA, nuevas),
+        nuevas / (t.muestras + nuevas),
+    )
+    try:
+        # minutos antes que muestras: MySQL evalúa las asignaciones en orden
+        # y `muestras` a la derecha debe ser el valor anterior
+        db.execute(stmt.on_duplicate_key_update([
+            ("minutos", t.minutos + alfa * (stmt.inserted.minutos - t.minutos)),
+            ("muestras", t.muestras + nuevas),
+            ("actualizado_en", stmt.inserted.actualizado_en),
+        ]), filas)
+        # /rutas muestra la duración aprendida: su ETag cambia en todos los workers
+        hoteles = db.execute(
+            select(r.id_hotel).where(r.id_ruta.in_({id_ruta for id_ruta, _ in pendientes})).distinct()
+        ).scalars().all()
+        for id_hotel in hoteles:
+            versiones.incrementar(db, id_hotel, "rutas")
+        db.commit()
+    except Exception:
+        db.rollback()
+        with _lock:
+            _fundir(_pendientes, pendientes)
+        raise
+    cargar(db)
+    return len(filas)
+
+
+def _guardar_con_sesion(releer: bool = False) -> int:
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        n = guardar(db)
+        if releer and not n:
+            cargar(db)  # lo que guardaron otros workers
+        return n
+    finally:
+        db.close()
+
+
+async def tarea_guardado() -> None:
+    """Bucle de fondo: cada DURACIONES_GUARDADO_SEGUNDOS guarda lo pendiente y relee las estimaciones."""
+    while True:
+        await asyncio.sleep(settings.DURACIONES_GUARDADO_SEGUNDOS)
+        try:
+            await asyncio.to_thread(_guardar_con_sesion, True)
+        except Exception as e:
+            print(f"⚠️ No se pudieron guardar duraciones: {e}")
+
+
+async def guardado_final() -> None:
+    try:
+        await asyncio.to_thread(_guardar_con_sesion)
+    except Exception as e:
+        print(f"⚠️ No se pudieron guardar duraciones al cerrar: {e}")
+
+
+def reconstruir(db: Session) -> int:
+    """
+    Recalcula todo desde el historial de viajes finalizados, archivo incluido
+    (en orden de fin), y reemplaza duraciones_ruta_hora. Hace commit.
+    Devuelve cuántos viajes se usaron.
+    """
+    global _estimaciones
+    v, a, h = archivo.viajes(True), archivo.asignaciones(True), models.Hotel
+    # Zonas antes del cursor en streaming (no admite otras consultas mientras se lee)
+    zonas = {
+        id_hotel: zona_horaria.zona(nombre)
+        for id_hotel, nombre in db.execute(select(h.id_hotel, h.zona_horaria))
+    }
+    filas = db.execute(
+        select(v.id_hotel, v.id_ruta, a.inicio_viaje, a.fin_viaje)
+        .join(a, a.id_viaje == v.id_viaje)
+        .where(v.id_estado_viaje == 5, a.inicio_viaje.is_not(None), a.fin_viaje.is_not(None))
+        .order_by(a.fin_viaje)
+        .execution_options(yield_per=5000)
+    )
+    estimaciones: Dict[Tuple[int, int], List] = {}
+    n = 0
+    for id_hotel, id_ruta, inicio, fin in filas:
+        minutos = (fin - inicio).total_seconds() / 60
+        if _MIN_MINUTOS <= minutos <= _MAX_MINUTOS:
+            _ewma(estimaciones, id_ruta, zona_horaria.a_local(inicio, zonas[id_hotel]).hour, minutos)
+            n += 1
+
+    ahora = datetime.utcnow()
+    db.execute(delete(models.DuracionRutaHora))
+    if estimaciones:
+        db.execute(insert(models.DuracionRutaHora), [
+            {"id_ruta": r, "hora": hora, "minutos": m, "muestras": k, "actualizado_en": ahora}
+            for (r, hora), (m, k) in estimaciones.items()
+        ])
+    for id_hotel in zonas:
+        versiones.incrementar(db, id_hotel, "rutas")
+    db.commit()
+    with _lock:
+        _estimaciones = estimaciones
+        _pendientes.clear()  # ya están en el historial recién leído
+    return n
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Duraciones aprendidas por ruta y hora.")
+    parser.add_argument("--reconstruir", action="store_true",
+                        help="Recalcula las duraciones desde el historial y las guarda")
+    args = parser.parse_args()
+
+    if args.reconstruir:
+        db = SessionLocal()
+        try:
+            n = reconstruir(db)
+            print(f"✅ {n} viajes procesados, {len(_estimaciones)} duraciones guardadas")
+        finally:
+            db.close()
+    else:
+        parser.print_help()
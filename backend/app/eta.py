@@ -0,0 +1,254 @@
+# app/eta.py
+"""
+Hora estimada de recogida (ETA) y posición en la cola de un viaje.
+
+Por hotel se guarda en memoria una foto de los viajes activos (PENDIENTE a
+EN_CURSO, dos consultas) que se renueva como máximo cada ETA_CACHE_SEGUNDOS.
+Con esa foto, la ETA de un viaje asignado sale de la cola de su conductor:
+
+- si tiene un viaje EN_CURSO, queda libre en inicio_viaje + duración de la ruta
+  (la aprendida por hora si USAR_DURACION_APRENDIDA, ver duraciones.py);
+- cada viaje suyo anterior a éste empieza en max(agendada_para, libre) y lo
+  ocupa la duración de su ruta;
+- éste empieza en max(agendada_para, libre).
+
+Los viajes de un mismo recorrido compartido cuentan una sola vez en la cola.
+
+Un viaje sin conductor informa su lugar entre los pendientes del hotel.
+Además se adjunta la última posición GPS del vehículo (si este proceso la tiene).
+
+El resultado de cada viaje se guarda ETA_CACHE_SEGUNDOS: un huésped que
+consulta cada pocos segundos no genera consultas.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models, posiciones, duraciones, zona_horaria
+from .calendario import MINUTOS_FRANJA
+from .config import settings
+
+ESTADOS_ACTIVOS = (1, 2, 3, 4)  # PENDIENTE, ASIGNADO, ACEPTADO, EN_CURSO
+EN_CURSO = 4
+
+# Un viaje EN_CURSO puede haber empezado antes de lo agendado; se miran desde ayer.
+_VENTANA_PASADA = timedelta(days=1)
+
+
+class ViajeEnCola:
+    __slots__ = (
+        "id_viaje", "id_hotel", "pedida_por", "id_ruta", "agendada_para",
+        "id_estado_viaje", "id_conductor", "id_vehiculo", "inicio_viaje", "id_recorrido",
+    )
+
+    def __init__(self, id_viaje, id_hotel, pedida_por, id_ruta, agendada_para,
+                 id_estado_viaje, id_conductor, id_vehiculo, inicio_viaje, id_recorrido=None):
+        self.id_viaje = id_viaje
+        self.id_hotel = id_hotel
+        self.pedida_por = pedida_por
+        self.id_ruta = id_ruta
+        self.agendada_para = agendada_para
+        self.id_estado_viaje = id_estado_viaje
+        self.id_conductor = id_conductor
+        self.id_vehiculo = id_vehiculo
+        self.inicio_viaje = inicio_viaje
+        self.id_recorrido = id_recorrido
+
+
+class ColasHotel:
+    """Viajes activos de un hotel agrupados por conductor (ordenados por hora)."""
+
+    def __init__(self, id_hotel: int, viajes: List[ViajeEnCola], duraciones_ruta: Dict[int, Optional[int]], tz=None):
+        self.id_hotel = id_hotel
+        self.duraciones = duraciones_ruta
+        self.tz = tz
+        self.viajes: Dict[int, ViajeEnCola] = {}
+        self.por_conductor: Dict[int, List[ViajeEnCola]] = {}
+        self.pendientes: List[ViajeEnCola] = []
+        for v in sorted(viajes, key=lambda x: (x.agendada_para, x.id_viaje)):
+            self.viajes[v.id_viaje] = v
+            if v.id_conductor is None:
+                if v.id_estado_viaje == 1:
+                    self.pendientes.append(v)
+            else:
+                self.por_conductor.setdefault(v.id_conductor, []).append(v)
+        self.cargado_en = time.monotonic()
+
+    def duracion(self, id_ruta: int, inicio: datetime) -> timedelta:
+        local = zona_horaria.a_local(inicio, self.tz) if self.tz else None
+        minutos = duraciones.duracion(id_ruta, self.duraciones.get(id_ruta), local)
+        return timedelta(minutes=minutos or MINUTOS_FRANJA)
+
+    def estimar(self, viaje: ViajeEnCola, ahora: datetime) -> dict:
+        resultado = _sin_estimacion(viaje.id_viaje, viaje.id_estado_viaje, viaje.agendada_para, ahora)
+        resultado["id_conductor"] = viaje.id_conductor
+        resultado["id_vehiculo"] = viaje.id_vehiculo
+        resultado["id_recorrido"] = viaje.id_recorrido
+
+        if viaje.id_conductor is None:
+            # Sin conductor: lugar entre los pendientes del hotel
+            for i, p in enumerate(self.pendientes):
+                if p.id_viaje == viaje.id_viaje:
+                    resultado["posicion_en_cola"] = i + 1
+                    resultado["viajes_antes"] = i
+                    break
+            return resultado
+
+        if viaje.id_vehiculo is not None:
+            resultado["posicion_vehiculo"] = posiciones.ultima(viaje.id_vehiculo)
+
+        if viaje.id_estado_viaje == EN_CURSO:
+            inicio = viaje.inicio_viaje or viaje.agendada_para
+            duracion = self.duracion(viaje.id_ruta, inicio)
+            transcurrido = (ahora - inicio).total_seconds()
+            resultado["recogida_estimada"] = inicio
+            resultado["llegada_estimada"] = max(inicio + duracion, ahora)
+            resultado["progreso_pct"] = round(min(transcurrido / duracion.total_seconds(), 1) * 100, 1)
+            resultado["minutos_para_recogida"] = 0
+            return resultado
+
+        libre = ahora
+        antes = 0
+        recorridos = set()
+        for otro in self.por_conductor.get(viaje.id_conductor, ()):
+            if otro.id_viaje == viaje.id_viaje:
+                break
+            # Un viaje compartido ocupa al vehículo una sola vez
+            if otro.id_recorrido is not None:
+                if otro.id_recorrido == viaje.id_recorrido or otro.id_recorrido in recorridos:
+                    continue
+                recorridos.add(otro.id_recorrido)
+            if otro.id_estado_viaje == EN_CURSO:
+                inicio = otro.inicio_viaje or otro.agendada_para
+                libre = max(libre, inicio + self.duracion(otro.id_ruta, inicio))
+            else:
+                inicio = max(libre, otro.agendada_para)
+                libre = inicio + self.duracion(otro.id_ruta, inicio)
+            antes += 1
+
+        recogida = max(viaje.agendada_para, libre)
+        duracion = self.duracion(viaje.id_ruta, recogida)
+        resultado.update(
+            posicion_en_cola=antes + 1,
+            viajes_antes=antes,
+            recogida_estimada=recogida,
+            llegada_estimada=recogida + duracion,
+            minutos_para_recogida=max(0, round((recogida - ahora).total_seconds() / 60)),
+            retraso_minutos=round((recogida - viaje.agendada_para).total_seconds() / 60),
+        )
+        return resultado
+
+
+def _sin_estimacion(id_viaje: int, id_estado_viaje: int, agendada_para: datetime, ahora: datetime) -> dict:
+    return {
+        "id_viaje": id_viaje,
+        "id_estado_viaje": id_estado_viaje,
+        "agendada_para": agendada_para,
+        "id_conductor": None,
+        "id_vehiculo": None,
+        "id_recorrido": None,
+        "posicion_en_cola": None,
+        "viajes_antes": 0,
+        "recogida_estimada": None,
+        "llegada_estimada": None,
+        "minutos_para_recogida": None,
+        "retraso_minutos": None,
+        "progreso_pct": None,
+        "posicion_vehiculo": None,
+        "calculado_en": ahora,
+    }
+
+
+def _cargar(db: Session, id_hotel: int) -> ColasHotel:
+    v, a, r = models.Viaje, models.AsignacionViajes, models.Ruta
+    filas = db.execute(
+        select(
+            v.id_viaje, v.id_hotel, v.pedida_por_id_usuario, v.id_ruta, v.agendada_para,
+            v.id_estado_viaje, a.id_conductor, a.id_vehiculo, a.inicio_viaje, a.id_recorrido,
+        )
+        .outerjoin(a, a.id_viaje == v.id_viaje)
+        .where(
+            v.id_hotel == id_hotel,
+            v.id_estado_viaje.in_(ESTADOS_ACTIVOS),
+            v.agendada_para >= datetime.utcnow() - _VENTANA_PASADA,
+        )
+    )
+    viajes = [ViajeEnCola(*f) for f in filas]
+    duraciones_ruta = dict(db.execute(
+        select(r.id_ruta, r.duracion_aproximada).where(r.id_hotel == id_hotel)
+    ).all())
+    return ColasHotel(id_hotel, viajes, duraciones_ruta, zona_horaria.zona_de_hotel(db, id_hotel))
+
+
+# =========================
+#   Cachés
+# =========================
+
+_colas: Dict[int, ColasHotel] = {}
+_hotel_de_viaje: Dict[int, int] = {}
+_resultados: Dict[int, tuple] = {}  # id_viaje -> (expira, pedida_por, id_hotel, resultado)
+_locks: Dict[int, threading.Lock] = {}
+_registro_lock = threading.Lock()
+
+
+def _colas_hotel(db: Session, id_hotel: int) -> ColasHotel:
+    colas = _colas.get(id_hotel)
+    if colas is not None and time.monotonic() - colas.cargado_en < settings.ETA_CACHE_SEGUNDOS:
+        return colas
+    with _registro_lock:
+        lock = _locks.setdefault(id_hotel, threading.Lock())
+    with lock:
+        # Otro hilo pudo recargarla mientras se esperaba el lock
+        colas = _colas.get(id_hotel)
+        if colas is None or time.monotonic() - colas.cargado_en >= settings.ETA_CACHE_SEGUNDOS:
+            anterior = colas
+            colas = _colas[id_hotel] = _cargar(db, id_hotel)
+            for id_viaje in colas.viajes:
+                _hotel_de_viaje[id_viaje] = id_hotel
+            if anterior is not None:
+                for id_viaje in anterior.viajes.keys() - colas.viajes.keys():
+                    _hotel_de_viaje.pop(id_viaje, None)
+    return colas
+
+
+def estimar(db: Session, id_viaje: int) -> Optional[tuple]:
+    """
+    (pedida_por, id_hotel, resultado) del viaje, o None si no existe.
+    Consulta la BD solo al renovar la foto del hotel o para viajes que no
+    están en ella (recién creados, terminados, cancelados o muy antiguos).
+    """
+    ahora_mono = time.monotonic()
+    cache = _resultados.get(id_viaje)
+    if cache is not None and cache[0] > ahora_mono:
+        return cache[1:]
+
+    viaje = None
+    id_hotel = _hotel_de_viaje.get(id_viaje)
+    if id_hotel is not None:
+        viaje = _colas_hotel(db, id_hotel).viajes.get(id_viaje)
+    if viaje is None:
+        fila = db.get(models.Viaje, id_viaje)
+        if fila is None:
+            return None
+        if fila.id_estado_viaje in ESTADOS_ACTIVOS:
+            viaje = _colas_hotel(db, fila.id_hotel).viajes.get(id_viaje)
+        if viaje is None:
+            # Fuera de la cola: solo el estado, sin estimación
+            resultado = _sin_estimacion(fila.id_viaje, fila.id_estado_viaje, fila.agendada_para, datetime.utcnow())
+            return _guardar(id_viaje, fila.pedida_por_id_usuario, fila.id_hotel, resultado, ahora_mono)
+
+    resultado = _colas[viaje.id_hotel].estimar(viaje, datetime.utcnow())
+    return _guardar(id_viaje, viaje.pedida_por, viaje.id_hotel, resultado, ahora_mono)
+
+
+def _guardar(id_viaje: int, pedida_por: int, id_hotel: int, resultado: dict, ahora_mono: float) -> tuple:
+    _resultados[id_viaje] = (ahora_mono + settings.ETA_CACHE_SEGUNDOS, pedida_por, id_hotel, resultado)
+    if len(_resultados) >= 10_000:
+        # Descarta vencidos solo cuando la caché crece (no en cada llamada)
+        for clave in [k for k, e in _resultados.items() if e[0] <= ahora_mono]:
+            _resultados.pop(clave, None)
+    return pedida_por, id_hotel, resultado
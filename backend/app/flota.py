@@ -0,0 +1,215 @@
+# app/flota.py
+"""
+Registro de flota en memoria: por hotel, qué conductores hay, si están en
+turno y con qué vehículo.
+
+Reemplaza los joins Usuario⋈Conductor⋈ConductorVehiculo⋈Vehiculo⋈Marca de
+mi-vehiculo, estado-turno, el listado de asignaciones activas y la
+auto-asignación por búsquedas en diccionarios.
+
+Se carga al iniciar la app (`cargar_todo`) y cada hotel se reconstruye
+completo (cuatro consultas) cuando cambia. Las rutas que modifican turnos,
+tenencias de vehículo o el estado de conductores/vehículos llaman:
+
+    flota.registrar_cambio(db, id_hotel)   # antes del commit (sube la versión)
+    db.commit()
+    flota.invalidar(id_hotel)              # después del commit
+
+Con varios workers, cada lectura compara la versión de la foto con la copia
+local de versiones_hotel (ver versiones.py, se relee cada VERSIONES_REFRESCO_MS).
+Los objetos devueltos son de solo lectura: se reemplazan, no se modifican.
+"""
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models, versiones
+
+
+class VehiculoEnFlota:
+    __slots__ = ("id_vehiculo", "patente", "modelo", "anio", "capacidad", "marca", "id_estado_vehiculo")
+
+    def __init__(self, id_vehiculo, patente, modelo, anio, capacidad, marca, id_estado_vehiculo):
+        self.id_vehiculo = id_vehiculo
+        self.patente = patente
+        self.modelo = modelo
+        self.anio = anio
+        self.capacidad = capacidad
+        self.marca = marca
+        self.id_estado_vehiculo = id_estado_vehiculo
+
+
+class ConductorEnFlota:
+    __slots__ = (
+        "id_conductor", "id_usuario", "nombre", "apellido", "id_tipo_usuario",
+        "id_estado_actividad", "is_suspended",
+        "inicio_turno",
+        "id_conductor_vehiculo", "id_vehiculo", "hora_asignacion", "vehiculo",
+    )
+
+    def __init__(self, id_conductor, id_usuario, nombre, apellido, id_tipo_usuario,
+                 id_estado_actividad, is_suspended):
+        self.id_conductor = id_conductor
+        self.id_usuario = id_usuario
+        self.nombre = nombre
+        self.apellido = apellido
+        self.id_tipo_usuario = id_tipo_usuario
+        self.id_estado_actividad = id_estado_actividad
+        self.is_suspended = bool(is_suspended)
+        self.inicio_turno: Optional[datetime] = None  # turno abierto (turnos_conductor)
+        self.id_conductor_vehiculo: Optional[int] = None
+        self.id_vehiculo: Optional[int] = None
+        self.hora_asignacion: Optional[datetime] = None
+        self.vehiculo: Optional[VehiculoEnFlota] = None
+
+    @property
+    def disponible(self) -> bool:
+        return self.id_estado_actividad == 1 and not self.is_suspended
+
+    @property
+    def en_turno(self) -> bool:
+        return self.disponible and self.inicio_turno is not None
+
+
+class FlotaHotel:
+    """Foto de la flota de un hotel en una versión dada."""
+
+    def __init__(self, id_hotel: int, version: int):
+        self.id_hotel = id_hotel
+        self.version = version
+        self.conductores: Dict[int, ConductorEnFlota] = {}   # por id_conductor
+        self.por_usuario: Dict[int, ConductorEnFlota] = {}   # por id_usuario
+        self.vehiculos: Dict[int, VehiculoEnFlota] = {}
+
+    def con_vehiculo(self) -> List[ConductorEnFlota]:
+        """Conductores con una tenencia de vehículo activa (ordenados por id)."""
+        return [c for _, c in sorted(self.conductores.items()) if c.id_conductor_vehiculo is not None]
+
+    def despachables(self) -> List[ConductorEnFlota]:
+        """Choferes activos, no suspendidos y con vehículo: candidatos a auto-asignación."""
+        return [c for c in self.con_vehiculo() if c.id_tipo_usuario == 2 and c.disponible]
+
+
+def _construir(db: Session, id_hotel: int) -> FlotaHotel:
+    # La versión se lee antes que los datos: si algo cambia entre medio, la
+    # próxima verificación verá una versión mayor y recargará.
+    flota = FlotaHotel(id_hotel, versiones.leer(db, id_hotel, "flota"))
+
+    u = models.Usuario
+    c = models.Conductor
+    for fila in db.execute(
+        select(c.id_conductor, u.id_usuario, u.nombre_usuario, u.apellido1_usuario,
+               u.id_tipo_usuario, u.id_estado_actividad, u.is_suspended)
+        .join(u, u.id_usuario == c.id_usuario)
+        .where(u.id_hotel == id_hotel)
+    ):
+        cond = ConductorEnFlota(*fila)
+        flota.conductores[cond.id_conductor] = cond
+        flota.por_usuario[cond.id_usuario] = cond
+
+    v = models.Vehiculo
+    m = models.MarcaVehiculo
+    for fila in db.execute(
+        select(v.id_vehiculo, v.patente, v.modelo, v.anio, v.capacidad,
+               m.nombre_marca_vehiculo, v.id_estado_vehiculo)
+        .join(m, m.id_marca_vehiculo == v.id_marca_vehiculo)
+        .where(v.id_hotel == id_hotel)
+    ):
+        flota.vehiculos[fila[0]] = VehiculoEnFlota(*fila)
+
+    t = models.TurnoConductor
+    for id_conductor, inicio in db.execute(
+        select(t.id_conductor, t.inicio)
+        .join(c, c.id_conductor == t.id_conductor)
+        .join(u, u.id_usuario == c.id_usuario)
+        .where(u.id_hotel == id_hotel, t.fin.is_(None))
+    ):
+        cond = flota.conductores.get(id_conductor)
+        if cond is not None:
+            cond.inicio_turno = inicio
+
+    cv = models.ConductorVehiculo
+    for id_cv, id_conductor, id_vehiculo, hora in db.execute(
+        select(cv.id_conductor_vehiculo, cv.id_conductor, cv.id_vehiculo, cv.hora_asignacion)
+        .join(c, c.id_conductor == cv.id_conductor)
+        .join(u, u.id_usuario == c.id_usuario)
+        .where(u.id_hotel == id_hotel, cv.hora_fin_asignacion.is_(None))
+        .order_by(cv.hora_asignacion)  # si hay varias abiertas, gana la más reciente
+    ):
+        cond = flota.conductores.get(id_conductor)
+        if cond is not None:
+            cond.id_conductor_vehiculo = id_cv
+            cond.id_vehiculo = id_vehiculo
+            cond.hora_asignacion = hora
+            cond.vehiculo = flota.vehiculos.get(id_vehiculo)
+
+    return flota
+
+
+# =========================
+#   Registro por hotel
+# =========================
+
+_flotas: Dict[int, FlotaHotel] = {}
+_hotel_de_usuario: Dict[int, int] = {}
+_carga_lock = threading.Lock()
+
+
+def _recargar(db: Session, id_hotel: int) -> FlotaHotel:
+    with _carga_lock:
+        flota = _construir(db, id_hotel)
+        _flotas[id_hotel] = flota
+        for id_usuario in flota.por_usuario:
+            _hotel_de_usuario[id_usuario] = id_hotel
+    return flota
+
+
+def cargar_todo(db: Session) -> int:
+    """Carga la flota de todos los hoteles (al iniciar la app). Devuelve cuántos."""
+    ids = db.execute(select(models.Hotel.id_hotel)).scalars().all()
+    for id_hotel in ids:
+        _recargar(db, id_hotel)
+    return len(ids)
+
+
+def obtener(db: Session, id_hotel: int) -> FlotaHotel:
+    """Flota del hotel; recarga si no está o si hay una versión más nueva."""
+    flota = _flotas.get(id_hotel)
+    if flota is None or versiones.actual(db, id_hotel, "flota") > flota.version:
+        return _recargar(db, id_hotel)
+    return flota
+
+
+def conductor_de_usuario(db: Session, id_usuario: int) -> Optional[ConductorEnFlota]:
+    """Conductor (en su flota) del usuario, o None si el usuario no es conductor."""
+    id_hotel = _hotel_de_usuario.get(id_usuario)
+    if id_hotel is None:
+        id_hotel = db.execute(
+            select(models.Usuario.id_hotel).where(models.Usuario.id_usuario == id_usuario)
+        ).scalar()
+        if id_hotel is None:
+            return None
+    return obtener(db, id_hotel).por_usuario.get(id_usuario)
+
+
+def hotel_de_usuario(id_usuario: int) -> Optional[int]:
+    """Hotel de un conductor ya cargado en el registro."""
+    return _hotel_de_usuario.get(id_usuario)
+
+
+def registrar_cambio(db: Session, id_hotel: Optional[int], *otros: str) -> None:
+    """
+    Sube la versión de flota del hotel (y de los dominios `otros`, p. ej.
+    "vehiculos") en la transacción actual (sin commit).
+    """
+    if id_hotel is not None:
+        versiones.incrementar(db, id_hotel, "flota", *otros)
+
+
+def invalidar(id_hotel: Optional[int]) -> None:
+    """Fuerza a este worker a verificar la versión en la próxima lectura."""
+    if id_hotel is not None:
+        versiones.invalidar()
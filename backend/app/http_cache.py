@@ -0,0 +1,143 @@
+# app/http_cache.py
+"""
+GET condicional (ETag / If-None-Match, Last-Modified / If-Modified-Since)
+para los listados que la app móvil consulta una y otra vez.
+
+    r = http_cache.validar(request, response, db, id_hotel, ("viajes",), user_id)
+    if r is not None:
+        return r            # 304: el cliente ya tiene esta versión
+    ...consulta normal...
+
+El validador no se calcula sobre el cuerpo: sale de las versiones por hotel
+(ver versiones.py) de los dominios de los que depende el listado, más la
+versión global de catálogos y `partes` (usuario, rol, etc.; la ruta, la
+query string y el formato pedido se agregan solos). Last-Modified es el actualizado_en de esas
+filas.
+
+Para decidir el 304 se usa la copia local de versiones, sin consultas. Si hay
+que responder, las versiones se releen en la transacción del request antes
+que los datos, así un validador nunca acompaña datos más viejos que él.
+
+Los listados que no dependen de un hotel (p. ej. notificaciones de un
+usuario) usan `condicional` con un validador propio (un sondeo count/max).
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Sequence
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from . import versiones, serializacion
+
+CACHE_CONTROL_LISTADOS = "private, no-cache"
+
+# Last-Modified tiene resolución de segundos y actualizado_en es la hora del
+# worker que escribió: no se informa hasta que pasó este margen, así una
+# escritura en el mismo segundo (o con un reloj algo atrasado) no queda
+# tapada por un If-Modified-Since.
+_MARGEN_LAST_MODIFIED = timedelta(seconds=2)
+
+
+def etag(*partes) -> str:
+    return '"' + hashlib.blake2b(repr(partes).encode(), digest_size=12).hexdigest() + '"'
+
+
+def coincide(request: Request, valor: str) -> bool:
+    """¿If-None-Match trae `valor` (o "*")?"""
+    pedidos = request.headers.get("if-none-match")
+    if not pedidos:
+        return False
+    etiquetas = [e.strip().removeprefix("W/") for e in pedidos.split(",")]
+    return valor in etiquetas or "*" in etiquetas
+
+
+def no_modificado(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def _ultima_modificacion(actualizado_en: Optional[datetime]) -> Optional[datetime]:
+    """actualizado_en redondeado al segundo siguiente, o None si es muy reciente."""
+    if actualizado_en is None:
+        return None
+    redondeado = actualizado_en.replace(microsecond=0)
+    if redondeado < actualizado_en:
+        redondeado += timedelta(seconds=1)
+    if redondeado + _MARGEN_LAST_MODIFIED > datetime.utcnow():
+        return None
+    return redondeado
+
+
+def _sin_cambios_desde(request: Request, modificado: Optional[datetime]) -> bool:
+    """If-Modified-Since (solo si no hay If-None-Match, que tiene prioridad)."""
+    if modificado is None or "if-none-match" in request.headers:
+        return False
+    desde = request.headers.get("if-modified-since")
+    if not desde:
+        return False
+    try:
+        desde = parsedate_to_datetime(desde)
+    except (TypeError, ValueError):
+        return False
+    if desde.tzinfo is not None:
+        desde = desde.astimezone(timezone.utc).replace(tzinfo=None)
+    return modificado <= desde
+
+
+def condicional(
+    request: Request,
+    response: Response,
+    valor: str,
+    actualizado_en: Optional[datetime] = None,
+) -> Optional[Response]:
+    """
+    304 si el cliente ya tiene `valor` (o no hubo cambios desde su
+    If-Modified-Since); si no, deja los encabezados en `response` y devuelve None.
+    """
+    headers = {"ETag": valor, "Cache-Control": CACHE_CONTROL_LISTADOS}
+    modificado = _ultima_modificacion(actualizado_en)
+    if modificado is not None:
+        headers["Last-Modified"] = format_datetime(modificado.replace(tzinfo=timezone.utc), usegmt=True)
+    if coincide(request, valor) or _sin_cambios_desde(request, modificado):
+        return no_modificado(headers)
+    response.headers.update(headers)
+    return None
+
+
+def _validador(request: Request, dominios: Sequence[str], hotel, globales, partes):
+    valor = etag(
+        request.url.path, str(request.url.query), serializacion.es_columnar(request),
+        tuple(getattr(hotel, d) for d in dominios), globales.catalogos, partes,
+    )
+    fechas = [f for f in (hotel.actualizado_en, globales.actualizado_en) if f is not None]
+    return valor, max(fechas) if fechas else None
+
+
+def validar(
+    request: Request,
+    response: Response,
+    db: Session,
+    id_hotel: Optional[int],
+    dominios: Sequence[str],
+    *partes,
+) -> Optional[Response]:
+    """
+    `condicional` con el validador de las versiones `dominios` del hotel.
+    Sin hotel no hay validador: devuelve None y la respuesta va sin ETag.
+    """
+    if id_hotel is None:
+        return None
+    # Con la copia local: ¿el cliente ya tiene lo vigente?
+    valor, actualizado_en = _validador(
+        request, dominios, versiones.de_hotel(db, id_hotel), versiones.de_hotel(db, versiones.ID_GLOBAL), partes
+    )
+    modificado = _ultima_modificacion(actualizado_en)
+    if coincide(request, valor) or _sin_cambios_desde(request, modificado):
+        return condicional(request, response, valor, actualizado_en)
+
+    # Hay que responder: validador leído en la transacción, antes que los datos
+    filas = versiones.leer_filas(db, (id_hotel, versiones.ID_GLOBAL))
+    valor, actualizado_en = _validador(request, dominios, filas[id_hotel], filas[versiones.ID_GLOBAL], partes)
+    condicional(request, response, valor, actualizado_en)
+    return None
@@ -0,0 +1,361 @@
+# app/importacion.py
+"""
+Importación masiva de historial (viajes y sus asignaciones) desde NDJSON o CSV.
+
+Para dar de alta un hotel con años de historial de su sistema anterior. No
+pasa por POST /viajes: no hay asignación automática, ni notificaciones, ni
+contadores por fila. Por cada lote de IMPORTACION_LOTE filas:
+
+  1. se resuelven las claves (ruta, solicitante, conductor, vehículo) con
+     consultas por conjunto (rutas, vehículos y conductores del hotel se
+     cargan una vez; los solicitantes con un IN por lote),
+  2. se validan las filas (las inválidas se informan y se saltan),
+  3. se insertan los viajes y luego sus asignaciones, cada uno con un
+     executemany, y se hace commit.
+
+Al terminar se reconstruyen los agregados (métricas de conductores, demanda,
+duraciones aprendidas) y se sube la versión de viajes del hotel.
+
+Una fila (NDJSON: un objeto por línea; CSV: encabezado con estos nombres):
+
+    agendada_para             obligatorio, ISO 8601 (con zona se pasa a UTC)
+    hora_pedida               por defecto agendada_para
+    id_estado_viaje           por defecto 5 (FINALIZADO)
+    pasajeros                 por defecto 1
+    id_ruta | ruta_nombre     ruta del hotel
+    pedida_por_id_usuario | solicitante_correo
+    id_conductor | conductor_correo        opcionales (sin conductor no hay asignación)
+    id_vehiculo | patente                  opcional
+    hora_asignacion (por defecto hora_pedida), hora_aceptacion, inicio_viaje, fin_viaje
+
+Las columnas de /exportaciones/viajes sirven tal cual.
+
+    python -m app.importacion historial.csv --hotel 3
+"""
+import csv
+import json
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Dict, Iterable, Iterator, Optional, TextIO, Tuple
+from uuid import uuid4
+
+from sqlalchemy import insert, or_, select
+from sqlalchemy.orm import Session
+
+from . import models, catalogos, metricas_conductor, demanda, duraciones, almacen_viajes, versiones
+from .config import settings
+
+FORMATOS = ("ndjson", "csv")
+_MAX_ERRORES = 100  # errores informados (las filas rechazadas se cuentan todas)
+
+
+class FilaInvalida(ValueError):
+    pass
+
+
+# =========================
+#   Lectura
+# =========================
+
+def leer(archivo: TextIO, formato: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """(línea, fila) del archivo; fila None si la línea no es JSON válido."""
+    if formato == "csv":
+        yield from enumerate(csv.DictReader(archivo), start=2)
+        return
+    for linea, texto in enumerate(archivo, start=1):
+        if not texto.strip():
+            continue
+        try:
+            fila = json.loads(texto)
+        except ValueError:
+            fila = None
+        yield linea, fila if isinstance(fila, dict) else None
+
+
+def _valor(fila: dict, campo: str):
+    v = fila.get(campo)
+    if isinstance(v, str):
+        v = v.strip()
+        return v or None
+    return v
+
+
+def _entero(fila: dict, campo: str) -> Optional[int]:
+    v = _valor(fila, campo)
+    if v is None:
+        return None
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        raise FilaInvalida(f"{campo} no es un entero")
+
+
+def _fecha(fila: dict, campo: str) -> Optional[datetime]:
+    v = _valor(fila, campo)
+    if v is None:
+        return None
+    try:
+        fecha = datetime.fromisoformat(str(v).replace("Z", "+00:00"))
+    except ValueError:
+        raise FilaInvalida(f"{campo} no es una fecha ISO 8601")
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+# =========================
+#   Resolución de claves
+# =========================
+
+class _Claves:
+    """
+    Ids del hotel por id o por clave natural. Rutas, vehículos y conductores
+    se cargan enteros (son pocos); los solicitantes se consultan por lote.
+    """
+
+    def __init__(self, db: Session, id_hotel: int):
+        self.id_hotel = id_hotel
+        r, v, c, u = models.Ruta, models.Vehiculo, models.Conductor, models.Usuario
+
+        self.rutas: Dict = {}
+        for id_ruta, nombre in db.execute(select(r.id_ruta, r.nombre_ruta).where(r.id_hotel == id_hotel)):
+            self.rutas[id_ruta] = self.rutas[nombre.casefold()] = id_ruta
+
+        self.vehiculos: Dict = {}
+        for id_vehiculo, patente in db.execute(select(v.id_vehiculo, v.patente).where(v.id_hotel == id_hotel)):
+            self.vehiculos[id_vehiculo] = self.vehiculos[patente.casefold()] = id_vehiculo
+
+        self.conductores: Dict = {}
+        for id_conductor, correo in db.execute(
+            select(c.id_conductor, u.correo_usuario).join(u, u.id_usuario == c.id_usuario).where(u.id_hotel == id_hotel)
+        ):
+            self.conductores[id_conductor] = id_conductor
+            if correo:
+                self.conductores[correo.casefold()] = id_conductor
+
+        self.usuarios: Dict = {}
+
+    def cargar_usuarios(self, db: Session, ids: set, correos: set) -> None:
+        """Busca de una vez los solicitantes del lote que todavía no se conocen."""
+        ids = {i for i in ids if i not in self.usuarios}
+        correos = {c for c in correos if c not in self.usuarios}
+        if not ids and not correos:
+            return
+        u = models.Usuario
+        filas = db.execute(
+            select(u.id_usuario, u.correo_usuario).where(
+                u.id_hotel == self.id_hotel,
+                or_(u.id_usuario.in_(ids), u.correo_usuario.in_(correos)),
+            )
+        )
+        for id_usuario, correo in filas:
+            self.usuarios[id_usuario] = id_usuario
+            if correo:
+                self.usuarios[correo.casefold()] = id_usuario
+
+    @staticmethod
+    def buscar(tabla: Dict, id_, nombre, que: str, obligatorio: bool = True) -> Optional[int]:
+        if id_ is not None:
+            clave = id_
+        elif nombre is not None:
+            clave = str(nombre).casefold()
+        elif obligatorio:
+            raise FilaInvalida(f"falta {que}")
+        else:
+            return None
+        encontrado = tabla.get(clave)
+        if encontrado is None:
+            raise FilaInvalida(f"{que} no existe en este hotel: {id_ if id_ is not None else nombre}")
+        return encontrado
+
+
+# =========================
+#   Validación
+# =========================
+
+def _convertir(fila: dict, claves: _Claves, estados) -> Tuple[dict, Optional[dict]]:
+    """Fila del archivo -> (viaje, asignación o None). Lanza FilaInvalida."""
+    agendada_para = _fecha(fila, "agendada_para")
+    if agendada_para is None:
+        raise FilaInvalida("falta agendada_para")
+    hora_pedida = _fecha(fila, "hora_pedida") or agendada_para
+
+    estado = _entero(fila, "id_estado_viaje")
+    if estado is None:
+        estado = 5  # FINALIZADO
+    if estado not in estados:
+        raise FilaInvalida(f"id_estado_viaje desconocido: {estado}")
+    pasajeros = _entero(fila, "pasajeros")
+    if pasajeros is None:
+        pasajeros = 1
+    if pasajeros < 1:
+        raise FilaInvalida("pasajeros debe ser al menos 1")
+
+    viaje = {
+        "id_hotel": claves.id_hotel,
+        "id_ruta": claves.buscar(claves.rutas, _entero(fila, "id_ruta"), _valor(fila, "ruta_nombre"), "ruta"),
+        "pedida_por_id_usuario": claves.buscar(
+            claves.usuarios, _entero(fila, "pedida_por_id_usuario"), _valor(fila, "solicitante_correo"), "solicitante"
+        ),
+        "hora_pedida": hora_pedida,
+        "agendada_para": agendada_para,
+        "id_estado_viaje": estado,
+        "pasajeros": pasajeros,
+    }
+
+    id_conductor = claves.buscar(
+        claves.conductores, _entero(fila, "id_conductor"), _valor(fila, "conductor_correo"), "conductor",
+        obligatorio=False,
+    )
+    id_vehiculo = claves.buscar(
+        claves.vehiculos, _entero(fila, "id_vehiculo"), _valor(fila, "patente"), "vehículo", obligatorio=False
+    )
+    if id_conductor is None:
+        if id_vehiculo is not None:
+            raise FilaInvalida("vehículo sin conductor")
+        return viaje, None
+
+    inicio, fin = _fecha(fila, "inicio_viaje"), _fecha(fila, "fin_viaje")
+    if inicio and fin and fin < inicio:
+        raise FilaInvalida("fin_viaje anterior a inicio_viaje")
+    asignacion = {
+        "id_conductor": id_conductor,
+        "id_vehiculo": id_vehiculo,
+        "hora_asignacion": _fecha(fila, "hora_asignacion") or hora_pedida,
+        "hora_aceptacion": _fecha(fila, "hora_aceptacion"),
+        "inicio_viaje": inicio,
+        "fin_viaje": fin,
+    }
+    return viaje, asignacion
+
+
+# =========================
+#   Importación
+# =========================
+
+def _importar_lote(db: Session, claves: _Claves, estados, filas: list, resultado: dict) -> None:
+    # Solicitantes del lote en una consulta
+    ids, correos = set(), set()
+    for _, fila in filas:
+        if fila is None:
+            continue
+        try:
+            id_usuario = _entero(fila, "pedida_por_id_usuario")
+        except FilaInvalida:
+            continue
+        if id_usuario is not None:
+            ids.add(id_usuario)
+        elif _valor(fila, "solicitante_correo") is not None:
+            correos.add(str(_valor(fila, "solicitante_correo")).casefold())
+    claves.cargar_usuarios(db, ids, correos)
+
+    viajes, asignaciones = [], []
+    for linea, fila in filas:
+        try:
+            if fila is None:
+                raise FilaInvalida("no es un objeto JSON")
+            viaje, asignacion = _convertir(fila, claves, estados)
+        except FilaInvalida as e:
+            resultado["rechazadas"] += 1
+            if len(resultado["errores"]) < _MAX_ERRORES:
+                resultado["errores"].append({"linea": linea, "error": str(e)})
+            continue
+        viajes.append(viaje)
+        asignaciones.append(asignacion)
+    if not viajes:
+        return
+
+    lote = str(uuid4())
+    for viaje in viajes:
+        viaje["lote"] = lote
+    db.execute(insert(models.Viaje), viajes)
+
+    # Un mismo INSERT asigna ids crecientes en el orden de las filas (ver POST /viajes/bulk)
+    ids_viaje = db.execute(
+        select(models.Viaje.id_viaje).where(models.Viaje.lote == lote).order_by(models.Viaje.id_viaje)
+    ).scalars().all()
+    filas_asignacion = [
+        {**asignacion, "id_viaje": id_viaje}
+        for id_viaje, asignacion in zip(ids_viaje, asignaciones)
+        if asignacion is not None
+    ]
+    if filas_asignacion:
+        db.execute(insert(models.AsignacionViajes), filas_asignacion)
+
+    resultado["viajes"] += len(viajes)
+    resultado["asignaciones"] += len(filas_asignacion)
+
+
+def _reconstruir_agregados(db: Session, id_hotel: int) -> None:
+    """Agregados que POST /viajes mantiene fila a fila y la importación no."""
+    metricas_conductor.reconstruir_metricas(db, id_hotel)
+    demanda.reconstruir_demanda(db, id_hotel)
+    versiones.incrementar(db, id_hotel, "viajes")
+    db.commit()
+
+    duraciones.reconstruir(db)
+    almacen_viajes.invalidar(id_hotel)
+
+
+def importar(
+    db: Session,
+    id_hotel: int,
+    filas: Iterable[Tuple[int, Optional[dict]]],
+    lote: Optional[int] = None,
+) -> dict:
+    """
+    Importa (línea, fila) de `leer(...)` al hotel, con commit por lote.
+    Devuelve cuántas filas se leyeron, cuántos viajes y asignaciones se
+    crearon y las filas rechazadas (con los primeros errores).
+    """
+    tamano = lote or settings.IMPORTACION_LOTE
+    claves = _Claves(db, id_hotel)
+    estados = catalogos.obtener(db).estados_viaje
+    resultado = {"leidas": 0, "viajes": 0, "asignaciones": 0, "rechazadas": 0, "errores": []}
+
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, tamano))
+        if not bloque:
+            break
+        resultado["leidas"] += len(bloque)
+        try:
+            _importar_lote(db, claves, estados, bloque, resultado)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    if resultado["viajes"]:
+        _reconstruir_agregados(db, id_hotel)
+    return resultado
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Importa historial de viajes (NDJSON o CSV) a un hotel.")
+    parser.add_argument("archivo", help="Ruta del archivo")
+    parser.add_argument("--hotel", type=int, required=True, help="Hotel destino")
+    parser.add_argument("--formato", choices=FORMATOS, default=None,
+                        help="Por defecto según la extensión (.csv -> csv, si no ndjson)")
+    parser.add_argument("--lote", type=int, default=None, help="Filas por lote (por defecto IMPORTACION_LOTE)")
+    args = parser.parse_args()
+
+    formato = args.formato or ("csv" if args.archivo.lower().endswith(".csv") else "ndjson")
+    db = SessionLocal()
+    try:
+        inicio = time.monotonic()
+        with open(args.archivo, encoding="utf-8-sig", newline="") as archivo:
+            resultado = importar(db, args.hotel, leer(archivo, formato), args.lote)
+        for error in resultado["errores"]:
+            print(f"  línea {error['linea']}: {error['error']}")
+        print(
+            f"✅ {resultado['viajes']} viajes y {resultado['asignaciones']} asignaciones importados "
+            f"({resultado['rechazadas']} filas rechazadas) en {time.monotonic() - inicio:.1f} s"
+        )
+    finally:
+        db.close()
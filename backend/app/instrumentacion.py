@@ -0,0 +1,172 @@
+# app/instrumentacion.py
+"""
+Cuántas consultas hace cada request, cuánto tardan y cuáles se repiten.
+
+Los eventos before/after_cursor_execute del engine anotan cada sentencia en
+el recolector del request en curso (una ContextVar: llega a los endpoints
+síncronos del threadpool y a los generadores de StreamingResponse, que
+copian el contexto). Fuera de un request (tareas de fondo, CLIs) no se
+anota nada.
+
+Por request:
+
+- encabezado  Server-Timing: db;dur=12.4;desc="9 SQL", app;dur=30.1
+  (visible en la pestaña Network del navegador)
+- una línea JSON en el logger "app.sql":
+  {"metodo": "GET", "ruta": "/viajes", "estado": 200, "consultas": 9,
+   "db_ms": 12.4, "total_ms": 30.1, "repetidas": 2}
+- un aviso de N+1 por cada forma de sentencia (SQL con los parámetros
+  como ?; un IN de cualquier largo cuenta igual) que se ejecutó más de
+  SQL_N1_UMBRAL veces en el mismo request.
+
+Con SQL_INSTRUMENTACION=false no se instala nada.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger("app.sql")
+
+_FORMATO_PARAMETROS = re.compile(r"%\(\w+\)s|%s|\?|:\w+")
+_LISTA_PARAMETROS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+def forma(sentencia: str) -> str:
+    """SQL sin valores: parámetros como ?, listas IN (?, ?, ...) como (?), espacios simples."""
+    sql = _FORMATO_PARAMETROS.sub("?", sentencia)
+    sql = _LISTA_PARAMETROS.sub("(?)", sql)
+    return _ESPACIOS.sub(" ", sql).strip()
+
+
+class Recolector:
+    """Sentencias de un request: cantidad, tiempo total y veces por forma."""
+
+    __slots__ = ("consultas", "segundos", "formas", "inicio")
+
+    def __init__(self) -> None:
+        self.consultas = 0
+        self.segundos = 0.0
+        self.formas: Counter = Counter()
+        self.inicio = time.perf_counter()
+
+    def anotar(self, sentencia: str, segundos: float) -> None:
+        self.consultas += 1
+        self.segundos += segundos
+        self.formas[forma(sentencia)] += 1
+
+    def repetidas(self, umbral: int) -> list:
+        """(forma, veces) de las que se ejecutaron más de `umbral` veces, de más a menos."""
+        return [(f, n) for f, n in self.formas.most_common() if n > umbral]
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.inicio) * 1000
+        return (
+            f'db;dur={self.segundos * 1000:.1f};desc="{self.consultas} SQL", '
+            f"app;dur={total:.1f}"
+        )
+
+
+_recolector: ContextVar[Optional[Recolector]] = ContextVar("recolector_sql", default=None)
+
+
+# =========================
+#   Eventos del engine
+# =========================
+
+def _antes(conn, cursor, sentencia, parametros, contexto, executemany) -> None:
+    if _recolector.get() is not None:
+        conn.info.setdefault("inicio_sql", []).append(time.perf_counter())
+
+
+def _despues(conn, cursor, sentencia, parametros, contexto, executemany) -> None:
+    rec = _recolector.get()
+    if rec is not None and conn.info.get("inicio_sql"):
+        rec.anotar(sentencia, time.perf_counter() - conn.info["inicio_sql"].pop())
+
+
+def escuchar(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", _antes)
+    event.listen(engine, "after_cursor_execute", _despues)
+
+
+# =========================
+#   Middleware
+# =========================
+
+class InstrumentacionSQL:
+    """
+    Middleware ASGI: abre un recolector por request, agrega Server-Timing al
+    responder y, terminado el cuerpo (también en streaming), deja la línea de
+    log y los avisos de N+1.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rec = Recolector()
+        token = _recolector.set(rec)
+        estado = {"codigo": 500}
+
+        async def enviar(mensaje) -> None:
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [
+                    (b"server-timing", rec.server_timing().encode("latin-1"))
+                ]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _recolector.reset(token)
+            _registrar(scope, rec, estado["codigo"])
+
+
+def _registrar(scope, rec: Recolector, codigo: int) -> None:
+    if not rec.consultas:
+        return
+    ruta = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+    umbral = settings.SQL_N1_UMBRAL
+    repetidas = rec.repetidas(umbral)
+    logger.info(json.dumps({
+        "metodo": scope.get("method"),
+        "ruta": ruta,
+        "estado": codigo,
+        "consultas": rec.consultas,
+        "db_ms": round(rec.segundos * 1000, 1),
+        "total_ms": round((time.perf_counter() - rec.inicio) * 1000, 1),
+        "repetidas": len(repetidas),
+    }, ensure_ascii=False))
+    for sql, veces in repetidas:
+        logger.warning(
+            "⚠️ Posible N+1 en %s %s: %d veces (umbral %d): %s",
+            scope.get("method"), ruta, veces, umbral, sql[:300],
+        )
+
+
+def instalar(app, engine: Engine) -> None:
+    """Eventos del engine y middleware (si SQL_INSTRUMENTACION)."""
+    if not settings.SQL_INSTRUMENTACION:
+        return
+    if not logger.handlers:
+        manejador = logging.StreamHandler()
+        manejador.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(manejador)
+        logger.setLevel(logging.INFO)
+    escuchar(engine)
+    app.add_middleware(InstrumentacionSQL)
@@ -1,7 +1,11 @@
 # app/main.py
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
+from .database import SessionLocal, engine
+from . import flota, catalogos, duraciones, instrumentacion, metricas_conductor, plantillas as plantillas_viaje, posiciones as posiciones_gps
 
 # Importar routers
 from .routers import (
@@ -15,6 +19,11 @@ from .routers import (
     conductor_vehiculo,
     kpis,
     notificaciones,
+    posiciones,
+    plantillas,
+    catalogos as catalogos_router,
+    exportaciones,
+    importaciones,
 )
 
 app = FastAPI(
@@ -32,6 +41,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Consultas por request: Server-Timing, log y aviso de N+1
+instrumentacion.instalar(app, engine)
+
 # Registrar routers
 app.include_router(auth.router)
 app.include_router(hoteles.router)
@@ -43,6 +55,60 @@ app.include_router(asignaciones.router)
 app.include_router(conductor_vehiculo.router)
 app.include_router(kpis.router)
 app.include_router(notificaciones.router)
+app.include_router(posiciones.router)
+app.include_router(plantillas.router)
+app.include_router(catalogos_router.router)
+app.include_router(exportaciones.router)
+app.include_router(importaciones.router)
+
+
+@app.on_event("startup")
+def cargar_registros():
+    """Carga catálogos y flota; si la BD no responde, se cargan al primer uso."""
+    db = SessionLocal()
+    try:
+        catalogos.recargar(db)
+        print("✅ Catálogos cargados")
+    except Exception as e:
+        print(f"⚠️ No se pudieron cargar los catálogos al iniciar: {e}")
+    finally:
+        db.close()
+
+    db = SessionLocal()
+    try:
+        hoteles_cargados = flota.cargar_todo(db)
+        print(f"✅ Flota cargada ({hoteles_cargados} hoteles)")
+    except Exception as e:
+        print(f"⚠️ No se pudo cargar la flota al iniciar: {e}")
+    finally:
+        db.close()
+
+    db = SessionLocal()
+    try:
+        print(f"✅ Duraciones aprendidas cargadas ({duraciones.cargar(db)})")
+    except Exception as e:
+        print(f"⚠️ No se pudieron cargar las duraciones aprendidas: {e}")
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def iniciar_tareas():
+    app.state.tarea_posiciones = asyncio.create_task(posiciones_gps.tarea_vaciado())
+    app.state.tarea_duraciones = asyncio.create_task(duraciones.tarea_guardado())
+    app.state.tarea_plantillas = asyncio.create_task(plantillas_viaje.tarea_expansion())
+    app.state.tarea_metricas = asyncio.create_task(metricas_conductor.tarea_cambio_de_mes())
+
+
+@app.on_event("shutdown")
+async def detener_tareas():
+    app.state.tarea_posiciones.cancel()
+    app.state.tarea_duraciones.cancel()
+    app.state.tarea_plantillas.cancel()
+    app.state.tarea_metricas.cancel()
+    await posiciones_gps.vaciado_final()
+    await duraciones.guardado_final()
+
 
 @app.get("/")
 def root():
@@ -0,0 +1,264 @@
+# app/metricas_conductor.py
+"""
+Contadores mensuales por conductor (tabla conductor_metricas_mensuales).
+
+Cada cambio de ciclo de vida de un viaje (asignación, aceptación, desasignación,
+finalización) suma o resta en la fila (conductor, mes) dentro de la MISMA
+transacción que el cambio, así /kpis/conductores lee una tabla pequeña en vez
+de agregar todo el historial de asignaciones.
+
+El mes se toma de `Viaje.agendada_para`, igual que el filtro de rango del KPI.
+`Conductor.numero_viajes_mensuales` refleja los viajes completados del mes en
+curso: se actualiza con cada finalización y, al cambiar de mes, la tarea de
+fondo `tarea_cambio_de_mes` lo recalcula para todos (si no, quien no completa
+viajes en el mes nuevo seguiría mostrando los del anterior).
+
+Si los contadores se desalinean (cargas manuales, errores), `reconstruir_metricas`
+los recalcula desde asignacion_viajes:
+
+    python -m app.metricas_conductor --hotel 3
+"""
+import asyncio
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import case, delete, func, insert, literal_column, select, text, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from . import models, archivo
+
+
+def periodo_de(fecha: datetime) -> date:
+    """Primer día del mes de `fecha` (clave de la fila mensual)."""
+    return date(fecha.year, fecha.month, 1)
+
+
+def siguiente_periodo(periodo: date) -> date:
+    """Primer día del mes siguiente."""
+    return date(periodo.year + periodo.month // 12, periodo.month % 12 + 1, 1)
+
+
+def _sumar(
+    db: Session,
+    id_conductor: int,
+    id_hotel: int,
+    fecha: datetime,
+    asignados: int = 0,
+    aceptados: int = 0,
+    completados: int = 0,
+    minutos: int = 0,
+    cronometrados: int = 0,
+) -> None:
+    """Upsert atómico (INSERT ... ON DUPLICATE KEY UPDATE) sobre la fila del mes."""
+    m = models.ConductorMetricaMensual
+    periodo = periodo_de(fecha)
+    stmt = mysql_insert(m).values(
+        id_conductor=id_conductor,
+        id_hotel=id_hotel,
+        periodo=periodo,
+        viajes_asignados=asignados,
+        viajes_aceptados=aceptados,
+        viajes_completados=completados,
+        minutos_totales=minutos,
+        viajes_cronometrados=cronometrados,
+    )
+    stmt = stmt.on_duplicate_key_update(
+        viajes_asignados=m.viajes_asignados + stmt.inserted.viajes_asignados,
+        viajes_aceptados=m.viajes_aceptados + stmt.inserted.viajes_aceptados,
+        viajes_completados=m.viajes_completados + stmt.inserted.viajes_completados,
+        minutos_totales=m.minutos_totales + stmt.inserted.minutos_totales,
+        viajes_cronometrados=m.viajes_cronometrados + stmt.inserted.viajes_cronometrados,
+    )
+    db.execute(stmt)
+
+    if completados and periodo == periodo_de(datetime.utcnow()):
+        _sincronizar_numero_mensual(db, id_conductor, periodo)
+
+
+def _sincronizar_numero_mensual(db: Session, id_conductor: int, periodo: date) -> None:
+    """Copia los completados del mes en curso a Conductor.numero_viajes_mensuales."""
+    m = models.ConductorMetricaMensual
+    completados = (
+        select(m.viajes_completados)
+        .where(m.id_conductor == id_conductor, m.periodo == periodo)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(models.Conductor)
+        .where(models.Conductor.id_conductor == id_conductor)
+        .values(numero_viajes_mensuales=func.coalesce(completados, 0))
+    )
+
+
+# =========================
+#   Eventos de ciclo de vida
+# =========================
+
+def registrar_asignacion(db: Session, viaje: models.Viaje, id_conductor: int) -> None:
+    """Viaje asignado (automática o manualmente) a un conductor."""
+    _sumar(db, id_conductor, viaje.id_hotel, viaje.agendada_para, asignados=1)
+
+
+def registrar_desasignacion(db: Session, viaje: models.Viaje, asignacion: models.AsignacionViajes) -> None:
+    """La asignación se elimina o pasa a otro conductor (rechazo, reasignación)."""
+    _sumar(
+        db,
+        asignacion.id_conductor,
+        viaje.id_hotel,
+        viaje.agendada_para,
+        asignados=-1,
+        aceptados=-1 if asignacion.hora_aceptacion else 0,
+    )
+
+
+def registrar_aceptacion(db: Session, viaje: models.Viaje, asignacion: models.AsignacionViajes) -> None:
+    """El conductor aceptó el viaje."""
+    _sumar(db, asignacion.id_conductor, viaje.id_hotel, viaje.agendada_para, aceptados=1)
+
+
+def registrar_finalizacion(db: Session, viaje: models.Viaje, asignacion: models.AsignacionViajes) -> None:
+    """El viaje pasó a COMPLETADO; suma su duración real si hay inicio y fin."""
+    minutos, cronometrados = 0, 0
+    if asignacion.inicio_viaje and asignacion.fin_viaje:
+        minutos = int((asignacion.fin_viaje - asignacion.inicio_viaje).total_seconds() // 60)
+        cronometrados = 1
+    _sumar(
+        db,
+        asignacion.id_conductor,
+        viaje.id_hotel,
+        viaje.agendada_para,
+        completados=1,
+        minutos=minutos,
+        cronometrados=cronometrados,
+    )
+
+
+# =========================
+#   Reconciliación
+# =========================
+
+def reconstruir_metricas(db: Session, id_hotel: Optional[int] = None) -> int:
+    """
+    Recalcula los contadores desde asignacion_viajes, archivo incluido (todo el historial o un hotel).
+    Borra e inserta en la transacción del llamador; no hace commit.
+    Devuelve el número de filas (conductor, mes) generadas.
+    """
+    m = models.ConductorMetricaMensual
+    a = archivo.asignaciones(True)
+    v = archivo.viajes(True)
+
+    borrar = delete(m)
+    if id_hotel is not None:
+        borrar = borrar.where(m.id_hotel == id_hotel)
+    db.execute(borrar)
+
+    # Se agrupa por alias: con el formato como parámetro MySQL no reconoce
+    # la misma expresión en SELECT y GROUP BY (ONLY_FULL_GROUP_BY).
+    periodo = func.date_format(v.agendada_para, "%Y-%m-01").label("periodo_mes")
+    cronometrado = a.inicio_viaje.isnot(None) & a.fin_viaje.isnot(None)
+    origen = (
+        select(
+            a.id_conductor,
+            v.id_hotel,
+            periodo,
+            func.count(a.id_asignacion),
+            func.sum(case((a.hora_aceptacion.isnot(None), 1), else_=0)),
+            func.sum(case((v.id_estado_viaje == 5, 1), else_=0)),
+            func.coalesce(
+                func.sum(
+                    case(
+                        (cronometrado & (v.id_estado_viaje == 5),
+                         func.timestampdiff(text("MINUTE"), a.inicio_viaje, a.fin_viaje)),
+                        else_=0,
+                    )
+                ),
+                0,
+            ),
+            func.sum(case((cronometrado & (v.id_estado_viaje == 5), 1), else_=0)),
+        )
+        .join(v, a.id_viaje == v.id_viaje)
+        .group_by(a.id_conductor, v.id_hotel, literal_column("periodo_mes"))
+    )
+    if id_hotel is not None:
+        origen = origen.where(v.id_hotel == id_hotel)
+
+    result = db.execute(
+        insert(m).from_select(
+            [
+                "id_conductor", "id_hotel", "periodo",
+                "viajes_asignados", "viajes_aceptados", "viajes_completados",
+                "minutos_totales", "viajes_cronometrados",
+            ],
+            origen,
+        )
+    )
+
+    sincronizar_mes(db, id_hotel)
+    return result.rowcount or 0
+
+
+def sincronizar_mes(db: Session, id_hotel: Optional[int] = None) -> None:
+    """numero_viajes_mensuales = completados del mes en curso (0 si no hay fila). Sin commit."""
+    m = models.ConductorMetricaMensual
+    mes_actual = periodo_de(datetime.utcnow())
+    completados = (
+        select(m.viajes_completados)
+        .where(m.id_conductor == models.Conductor.id_conductor, m.periodo == mes_actual)
+        .scalar_subquery()
+    )
+    sincronizar = update(models.Conductor).values(numero_viajes_mensuales=func.coalesce(completados, 0))
+    if id_hotel is not None:
+        sincronizar = sincronizar.where(
+            models.Conductor.id_usuario.in_(
+                select(models.Usuario.id_usuario).where(models.Usuario.id_hotel == id_hotel)
+            )
+        )
+    db.execute(sincronizar)
+
+
+def _sincronizar_con_sesion() -> None:
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        sincronizar_mes(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def tarea_cambio_de_mes() -> None:
+    """
+    Bucle de fondo: al iniciar y al comenzar cada mes (UTC, como `periodo_de`)
+    recalcula numero_viajes_mensuales. Idempotente, da igual cuántos workers lo corran.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(_sincronizar_con_sesion)
+        except Exception as e:
+            print(f"⚠️ No se pudo sincronizar numero_viajes_mensuales: {e}")
+        ahora = datetime.utcnow()
+        proximo = datetime.combine(siguiente_periodo(periodo_de(ahora)), datetime.min.time())
+        # Dormir por tramos acotados: el reloj del sistema puede ajustarse
+        while ahora < proximo:
+            await asyncio.sleep(min((proximo - ahora).total_seconds() + 1, 3600))
+            ahora = datetime.utcnow()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Reconstruye los contadores mensuales de conductores.")
+    parser.add_argument("--hotel", type=int, default=None, help="Solo este hotel (por defecto todos)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        filas = reconstruir_metricas(db, args.hotel)
+        db.commit()
+        print(f"✅ Métricas reconstruidas: {filas} filas")
+    finally:
+        db.close()
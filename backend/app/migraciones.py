@@ -0,0 +1,401 @@
+# app/migraciones.py
+"""
+Migraciones de esquema versionadas (MySQL 5.7+/8).
+
+models.py describe el esquema final; una base creada antes de algún cambio
+no lo recibe sola. Cada migración es una lista de pasos idempotentes (crear
+tablas que faltan, agregar una columna, un índice o una clave foránea) y se
+registra en schema_migraciones al terminar. Los pasos revisan el catálogo
+antes de ejecutar, así que una migración cortada a medias (en MySQL cada
+ALTER hace commit) se puede volver a correr.
+
+Los ALTER van en línea para no frenar la operación:
+
+- índices:          ALGORITHM=INPLACE, LOCK=NONE (lecturas y escrituras siguen)
+- columnas:         ALGORITHM=INSTANT (8.0.12+), si no INPLACE, LOCK=NONE
+- claves foráneas:  INPLACE con foreign_key_checks=0 (la columna es nueva y NULL)
+
+y con lock_wait_timeout = MIGRACION_LOCK_TIMEOUT: si una transacción larga
+retiene el bloqueo de metadatos, el ALTER aborta en vez de dejar en cola a
+todas las consultas detrás de él. Se reintenta más tarde.
+
+    python -m app.migraciones                       # aplica lo pendiente
+    python -m app.migraciones estado                # versiones aplicadas / pendientes
+    python -m app.migraciones verificar [--estricto]
+
+`verificar` corre EXPLAIN sobre las consultas calientes de los routers
+(CONSULTAS_CALIENTES) y termina con código 1 si alguna no tiene un índice
+utilizable sobre su tabla. Con --estricto también falla si el optimizador
+eligió recorrer la tabla completa (útil con datos de tamaño real; en una
+base casi vacía MySQL prefiere el recorrido aunque exista el índice).
+tests/test_planes.py hace lo mismo en modo estricto contra una base MySQL de
+pruebas que llena con datos (ver tests/conftest.py).
+
+Una migración nueva se agrega al final de MIGRACIONES con la versión
+siguiente; el índice o la columna se declaran también en models.py.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import UniqueConstraint, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn
+
+from . import models
+from .config import settings
+from .database import Base
+
+_CANDADO = "schema_migraciones"  # GET_LOCK: una sola instancia migrando a la vez
+
+
+# =========================
+#   Pasos
+# =========================
+
+Paso = Callable[[Connection], Optional[str]]  # devuelve la sentencia ejecutada (o None si ya estaba)
+
+
+def _q(conexion: Connection, nombre: str) -> str:
+    return conexion.dialect.identifier_preparer.quote(nombre)
+
+
+def _indice_de(modelo, nombre: str):
+    tabla = modelo.__table__
+    for ix in list(tabla.indexes) + list(tabla.constraints):
+        if ix.name == nombre:
+            return ix
+    raise KeyError(f"{tabla.name}.{nombre} no está declarado en models.py")
+
+
+def crear_tablas() -> Paso:
+    """Tablas de models.py que no existen (con sus índices). No toca las existentes."""
+    def paso(conexion: Connection) -> Optional[str]:
+        existentes = set(inspect(conexion).get_table_names())
+        faltan = [t for t in Base.metadata.sorted_tables if t.name not in existentes]
+        if not faltan:
+            return None
+        Base.metadata.create_all(conexion, tables=faltan, checkfirst=True)
+        return "CREATE TABLE " + ", ".join(t.name for t in faltan)
+    return paso
+
+
+def agregar_columna(modelo, nombre: str) -> Paso:
+    """Columna declarada en el modelo (sin su clave foránea: ver agregar_fk)."""
+    columna = modelo.__table__.c[nombre]
+
+    def paso(conexion: Connection) -> Optional[str]:
+        tabla = modelo.__tablename__
+        if any(c["name"] == nombre for c in inspect(conexion).get_columns(tabla)):
+            return None
+        definicion = CreateColumn(columna).compile(dialect=conexion.dialect)
+        base = f"ALTER TABLE {_q(conexion, tabla)} ADD COLUMN {definicion}"
+        try:
+            sql = f"{base}, ALGORITHM=INSTANT"
+            conexion.exec_driver_sql(sql)
+        except OperationalError:
+            conexion.rollback()
+            sql = f"{base}, ALGORITHM=INPLACE, LOCK=NONE"
+            conexion.exec_driver_sql(sql)
+        return sql
+    return paso
+
+
+def agregar_indice(modelo, nombre: str) -> Paso:
+    """Índice (o restricción UNIQUE) declarado en el modelo, en línea."""
+    ix = _indice_de(modelo, nombre)
+    columnas = [c.name for c in ix.columns]
+    unico = isinstance(ix, UniqueConstraint) or ix.unique
+
+    def paso(conexion: Connection) -> Optional[str]:
+        tabla = modelo.__tablename__
+        insp = inspect(conexion)
+        existentes = insp.get_indexes(tabla) + insp.get_unique_constraints(tabla)
+        # Ya está con ese nombre, o con otro nombre sobre las mismas columnas
+        if any(e["name"] == nombre or list(e["column_names"]) == columnas for e in existentes):
+            return None
+        cols = ", ".join(_q(conexion, c) for c in columnas)
+        sql = (
+            f"ALTER TABLE {_q(conexion, tabla)} ADD {'UNIQUE ' if unico else ''}INDEX "
+            f"{_q(conexion, nombre)} ({cols}), ALGORITHM=INPLACE, LOCK=NONE"
+        )
+        conexion.exec_driver_sql(sql)
+        return sql
+    return paso
+
+
+def agregar_fk(modelo, columna: str) -> Paso:
+    """Clave foránea de una columna recién agregada (todas sus filas en NULL)."""
+    fk = next(iter(modelo.__table__.c[columna].foreign_keys))
+
+    def paso(conexion: Connection) -> Optional[str]:
+        tabla = modelo.__tablename__
+        if any(f["constrained_columns"] == [columna] for f in inspect(conexion).get_foreign_keys(tabla)):
+            return None
+        destino = fk.column
+        sql = (
+            f"ALTER TABLE {_q(conexion, tabla)} ADD CONSTRAINT {_q(conexion, f'fk_{tabla}_{columna}')} "
+            f"FOREIGN KEY ({_q(conexion, columna)}) "
+            f"REFERENCES {_q(conexion, destino.table.name)} ({_q(conexion, destino.name)})"
+            f"{' ON DELETE ' + fk.ondelete if fk.ondelete else ''}, ALGORITHM=INPLACE, LOCK=NONE"
+        )
+        # Sin revisar filas existentes: INPLACE solo se permite con foreign_key_checks=0
+        conexion.exec_driver_sql("SET SESSION foreign_key_checks = 0")
+        try:
+            conexion.exec_driver_sql(sql)
+        finally:
+            conexion.exec_driver_sql("SET SESSION foreign_key_checks = 1")
+        return sql
+    return paso
+
+
+# =========================
+#   Migraciones
+# =========================
+
+class Migracion(NamedTuple):
+    version: int
+    descripcion: str
+    pasos: Tuple[Paso, ...]
+
+
+MIGRACIONES: Tuple[Migracion, ...] = (
+    Migracion(1, "Tablas nuevas (turnos, calendarios, plantillas, métricas, demanda, archivo, ...)", (
+        crear_tablas(),
+    )),
+    Migracion(2, "Columnas e índices agregados a hoteles, viajes y asignacion_viajes", (
+        agregar_columna(models.Hotel, "zona_horaria"),
+        agregar_columna(models.Viaje, "pasajeros"),
+        agregar_columna(models.Viaje, "id_plantilla"),
+        agregar_columna(models.Viaje, "lote"),
+        agregar_indice(models.Viaje, "idx_via_hotel_fecha"),
+        # Antes de la FK, para que MySQL la apoye en este índice y no cree otro
+        agregar_indice(models.Viaje, "uq_via_plantilla_fecha"),
+        agregar_fk(models.Viaje, "id_plantilla"),
+        agregar_indice(models.Viaje, "idx_via_lote"),
+        agregar_columna(models.AsignacionViajes, "id_recorrido"),
+        agregar_indice(models.AsignacionViajes, "idx_asg_recorrido"),
+        agregar_fk(models.AsignacionViajes, "id_recorrido"),
+    )),
+    Migracion(3, "Índices compuestos para las consultas calientes de los routers", (
+        # /viajes de huésped: pedida_por = ? ORDER BY agendada_para
+        agregar_indice(models.Viaje, "idx_via_solicitante_fecha"),
+        # ETA, despacho, reasignación, /viajes?estado=: hotel + estado(s) + rango de fechas
+        agregar_indice(models.Viaje, "idx_via_hotel_estado_fecha"),
+        # /usuarios/mios: hotel + tipos
+        agregar_indice(models.Usuario, "idx_usr_hotel_tipo"),
+        # Vehículo vigente del conductor: hora_fin_asignacion IS NULL
+        agregar_indice(models.ConductorVehiculo, "idx_cv_conductor_fin"),
+        # Notificaciones no leídas / marcar todas leídas
+        agregar_indice(models.Notificacion, "idx_not_user_estado_fecha"),
+    )),
+    Migracion(4, "Dominio de versión \"hotel\" (zona horaria en caché por worker)", (
+        agregar_columna(models.VersionHotel, "hotel"),
+    )),
+    Migracion(5, "Índice de notificaciones por estado y fecha (archivo de leídas)", (
+        agregar_indice(models.Notificacion, "idx_not_estado_fecha"),
+    )),
+)
+
+
+def _aplicadas(conexion: Connection) -> dict:
+    sm = models.SchemaMigracion
+    return {version: aplicada for version, aplicada in conexion.execute(select(sm.version, sm.aplicada_en))}
+
+
+def aplicar(conexion: Connection, hasta: Optional[int] = None, registro: Callable[[str], None] = print) -> List[int]:
+    """
+    Aplica en orden las migraciones pendientes (hasta la versión `hasta`).
+    Devuelve las versiones aplicadas. Toma un candado con nombre para que dos
+    procesos no migren a la vez.
+    """
+    if conexion.dialect.name != "mysql":
+        raise RuntimeError("Las migraciones usan DDL en línea de MySQL")
+    obtenido = conexion.exec_driver_sql(f"SELECT GET_LOCK('{_CANDADO}', 60)").scalar()
+    if obtenido != 1:
+        raise RuntimeError("Otra instancia está aplicando migraciones")
+    try:
+        conexion.exec_driver_sql(f"SET SESSION lock_wait_timeout = {int(settings.MIGRACION_LOCK_TIMEOUT)}")
+        models.SchemaMigracion.__table__.create(conexion, checkfirst=True)
+        conexion.commit()
+        ya = _aplicadas(conexion)
+        aplicadas = []
+        for m in MIGRACIONES:
+            if m.version in ya or (hasta is not None and m.version > hasta):
+                continue
+            registro(f"→ {m.version}: {m.descripcion}")
+            t0 = time.perf_counter()
+            for paso in m.pasos:
+                sql = paso(conexion)
+                conexion.commit()
+                if sql:
+                    registro(f"   {sql}")
+            conexion.execute(models.SchemaMigracion.__table__.insert().values(
+                version=m.version,
+                descripcion=m.descripcion[:200],
+                aplicada_en=datetime.utcnow(),
+                duracion_ms=int((time.perf_counter() - t0) * 1000),
+            ))
+            conexion.commit()
+            aplicadas.append(m.version)
+        return aplicadas
+    finally:
+        conexion.exec_driver_sql(f"SELECT RELEASE_LOCK('{_CANDADO}')")
+        conexion.commit()
+
+
+def pendientes(conexion: Connection) -> List[Migracion]:
+    if not inspect(conexion).has_table(models.SchemaMigracion.__tablename__):
+        return list(MIGRACIONES)
+    ya = _aplicadas(conexion)
+    return [m for m in MIGRACIONES if m.version not in ya]
+
+
+# =========================
+#   Planes de consultas
+# =========================
+
+class ConsultaCaliente(NamedTuple):
+    nombre: str
+    construir: Callable[[], object]  # -> select(...)
+    tabla: str
+    indices: Sequence[str]  # cualquiera de estos sirve
+
+
+def _hace(dias: int) -> datetime:
+    return datetime.utcnow() - timedelta(days=dias)
+
+
+_v, _a, _u = models.Viaje, models.AsignacionViajes, models.Usuario
+_cv, _n, _t = models.ConductorVehiculo, models.Notificacion, models.TurnoConductor
+
+# Formas de las consultas de los routers y servicios (valores de ejemplo: el plan no depende de ellos)
+CONSULTAS_CALIENTES: Tuple[ConsultaCaliente, ...] = (
+    ConsultaCaliente(
+        "GET /viajes (huésped)",
+        lambda: select(_v.id_viaje).where(_v.pedida_por_id_usuario == 1).order_by(_v.agendada_para.desc()),
+        "viajes", ("idx_via_solicitante_fecha",),
+    ),
+    ConsultaCaliente(
+        "GET /viajes (supervisor)",
+        lambda: select(_v.id_viaje).where(_v.id_hotel == 1, _v.agendada_para >= _hace(30))
+        .order_by(_v.agendada_para.desc()),
+        "viajes", ("idx_via_hotel_fecha", "idx_via_hotel_estado_fecha"),
+    ),
+    ConsultaCaliente(
+        "GET /viajes?estado= / colas de ETA / reasignación",
+        lambda: select(_v.id_viaje).where(
+            _v.id_hotel == 1, _v.id_estado_viaje.in_((1, 2, 3, 4)), _v.agendada_para >= _hace(1),
+        ),
+        "viajes", ("idx_via_hotel_estado_fecha",),
+    ),
+    ConsultaCaliente(
+        "Archivo: viajes terminados antiguos",
+        lambda: select(_v.id_viaje).where(_v.id_estado_viaje.in_((5, 6)), _v.agendada_para < _hace(365)),
+        "viajes", ("idx_via_estado_fecha",),
+    ),
+    ConsultaCaliente(
+        "Archivo: notificaciones leídas antiguas",
+        lambda: select(_n.id_notificacion).where(_n.id_estado_mensaje == 2, _n.fecha_envio < _hace(365).date()),
+        "notificaciones", ("idx_not_estado_fecha",),
+    ),
+    ConsultaCaliente(
+        "GET /viajes (conductor) / despacho",
+        lambda: select(_a.id_viaje).where(_a.id_conductor == 1).order_by(_a.hora_asignacion),
+        "asignacion_viajes", ("idx_asg_conductor",),
+    ),
+    ConsultaCaliente(
+        "GET /usuarios/mios",
+        lambda: select(_u.id_usuario).where(_u.id_hotel == 1, _u.id_tipo_usuario.in_((1, 2))),
+        "usuarios", ("idx_usr_hotel_tipo",),
+    ),
+    ConsultaCaliente(
+        "Vehículo vigente del conductor",
+        lambda: select(_cv.id_conductor_vehiculo).where(_cv.id_conductor == 1, _cv.hora_fin_asignacion.is_(None)),
+        "conductor_vehiculo", ("idx_cv_conductor_fin",),
+    ),
+    ConsultaCaliente(
+        "GET /notificaciones",
+        lambda: select(_n.id_notificacion).where(_n.id_usuario == 1).order_by(_n.fecha_envio.desc()),
+        "notificaciones", ("idx_not_user_fecha", "idx_not_user_estado_fecha"),
+    ),
+    ConsultaCaliente(
+        "GET /notificaciones?solo_no_leidas / marcar leídas",
+        lambda: select(_n.id_notificacion).where(_n.id_usuario == 1, _n.id_estado_mensaje == 1)
+        .order_by(_n.fecha_envio.desc()),
+        "notificaciones", ("idx_not_user_estado_fecha",),
+    ),
+    ConsultaCaliente(
+        "Turno abierto del conductor",
+        lambda: select(_t.id_turno).where(_t.id_conductor == 1, _t.fin.is_(None)),
+        "turnos_conductor", ("idx_tc_conductor_fin",),
+    ),
+)
+
+
+def revisar_plan(conexion: Connection, c: ConsultaCaliente, estricto: bool = False) -> Optional[str]:
+    """
+    EXPLAIN de una consulta caliente. Devuelve el problema encontrado o None:
+    tabla sin índice utilizable o, con `estricto`, recorrida completa.
+    """
+    compilada = c.construir().compile(dialect=conexion.dialect, compile_kwargs={"render_postcompile": True})
+    filas = conexion.exec_driver_sql("EXPLAIN " + compilada.string, compilada.params).mappings().all()
+    fila = next((f for f in filas if f["table"] == c.tabla), None)
+    if fila is None:
+        return f"{c.nombre}: EXPLAIN no muestra la tabla {c.tabla}"
+    posibles = set((fila["possible_keys"] or "").split(","))
+    if not posibles & set(c.indices):
+        return (
+            f"{c.nombre}: sin índice utilizable en {c.tabla} "
+            f"(esperado {' o '.join(c.indices)}; possible_keys={fila['possible_keys']})"
+        )
+    if estricto and (fila["type"] == "ALL" or not fila["key"]):
+        return f"{c.nombre}: recorrido completo de {c.tabla} (type={fila['type']}, rows={fila['rows']})"
+    return None
+
+
+def verificar_planes(db: Session, estricto: bool = False) -> List[str]:
+    """
+    `revisar_plan` de cada consulta caliente. Devuelve los problemas
+    encontrados (lista vacía = todo bien). tests/test_planes.py lo corre en
+    modo estricto sobre una base de pruebas con datos.
+    """
+    conexion = db.connection()
+    problemas = [revisar_plan(conexion, c, estricto) for c in CONSULTAS_CALIENTES]
+    return [p for p in problemas if p]
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from .database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Migraciones de esquema y verificación de planes.")
+    parser.add_argument("accion", nargs="?", default="aplicar", choices=["aplicar", "estado", "verificar"])
+    parser.add_argument("--hasta", type=int, default=None, help="Aplicar solo hasta esta versión")
+    parser.add_argument("--estricto", action="store_true", help="verificar: fallar también con recorridos completos")
+    args = parser.parse_args()
+
+    if args.accion == "verificar":
+        db = SessionLocal()
+        try:
+            problemas = verificar_planes(db, args.estricto)
+        finally:
+            db.close()
+        for p in problemas:
+            print(f"❌ {p}")
+        if problemas:
+            sys.exit(1)
+        print(f"✅ {len(CONSULTAS_CALIENTES)} consultas calientes con índice")
+    elif args.accion == "estado":
+        with engine.connect() as conexion:
+            faltan = pendientes(conexion)
+        for m in MIGRACIONES:
+            print(f"{'pendiente' if m in faltan else 'aplicada '}  {m.version}: {m.descripcion}")
+    else:
+        with engine.connect() as conexion:
+            hechas = aplicar(conexion, args.hasta)
+        print(f"✅ Migraciones aplicadas: {hechas or 'ninguna (al día)'}")
@@ -4,8 +4,8 @@ from typing import List, Optional
 from datetime import date, datetime, time
 
 from sqlalchemy import (
-    String, Integer, Date, DateTime, Time, ForeignKey, DECIMAL,
-    UniqueConstraint, Index, Boolean, text
+    String, Integer, BigInteger, Float, Date, DateTime, Time, ForeignKey, DECIMAL,
+    UniqueConstraint, Index, Boolean, LargeBinary, text
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .database import Base
@@ -86,6 +86,7 @@ class Hotel(Base):
     direccion_hotel: Mapped[Optional[str]] = mapped_column(String(200))
     email_hotel: Mapped[Optional[str]] = mapped_column(String(40))
     contacto_telefonico_hotel: Mapped[Optional[str]] = mapped_column(String(20))
+    zona_horaria: Mapped[Optional[str]] = mapped_column(String(40))  # IANA, ej. "America/Santiago"
 
     id_ciudad: Mapped[int] = mapped_column(ForeignKey("ciudad.id_ciudad"), nullable=False)
     id_estado_actividad: Mapped[int] = mapped_column(ForeignKey("estado_actividad.id_estado_actividad"), nullable=False)
@@ -101,6 +102,7 @@ class Hotel(Base):
 
 class Usuario(Base):
     __tablename__ = "usuarios"
+    __table_args__ = (Index("idx_usr_hotel_tipo", "id_hotel", "id_tipo_usuario"),)
 
     id_usuario: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     nombre_usuario: Mapped[str] = mapped_column(String(30), nullable=False)
@@ -201,6 +203,7 @@ class ConductorVehiculo(Base):
     __table_args__ = (
         Index("idx_cv_conductor", "id_conductor", "hora_asignacion"),
         Index("idx_cv_vehiculo", "id_vehiculo", "hora_asignacion"),
+        Index("idx_cv_conductor_fin", "id_conductor", "hora_fin_asignacion"),
     )
 
     id_conductor_vehiculo: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -226,9 +229,94 @@ class DisponibilidadConductores(Base):
     conductor: Mapped[Conductor] = relationship(back_populates="disponibilidades")
 
 
+class TurnoConductor(Base):
+    """Registro de turnos (solo se agrega); fin NULL = turno abierto."""
+    __tablename__ = "turnos_conductor"
+    __table_args__ = (
+        Index("idx_tc_conductor_fin", "id_conductor", "fin"),
+        Index("idx_tc_conductor_inicio", "id_conductor", "inicio"),
+    )
+
+    id_turno: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    id_conductor: Mapped[int] = mapped_column(ForeignKey("conductores.id_conductor"), nullable=False)
+    inicio: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    fin: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+
+class CalendarioConductor(Base):
+    """Disponibilidad semanal en hora local: 7 días × 96 franjas de 15 min (1 bit c/u)."""
+    __tablename__ = "calendarios_conductor"
+
+    id_conductor: Mapped[int] = mapped_column(
+        ForeignKey("conductores.id_conductor"), primary_key=True, autoincrement=False
+    )
+    franjas: Mapped[bytes] = mapped_column(LargeBinary(84), nullable=False)
+    actualizado_en: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+
+class ExcepcionCalendario(Base):
+    """Reemplaza el calendario de un conductor en una fecha (96 bits; vacío = libre)."""
+    __tablename__ = "excepciones_calendario"
+    __table_args__ = (UniqueConstraint("id_conductor", "fecha", name="uq_exc_conductor_fecha"),)
+
+    id_excepcion: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    id_conductor: Mapped[int] = mapped_column(ForeignKey("conductores.id_conductor"), nullable=False)
+    fecha: Mapped[date] = mapped_column(Date, nullable=False)
+    franjas: Mapped[bytes] = mapped_column(LargeBinary(12), nullable=False)
+
+
+class PlantillaViaje(Base):
+    """
+    Viaje recurrente: en los días de `dias_semana` (bit 0 = lunes), desde
+    hora_inicio cada `cada_minutos` hasta hora_fin (hora local del hotel).
+    Sin cada_minutos es un viaje por día a hora_inicio.
+    """
+    __tablename__ = "plantillas_viaje"
+
+    id_plantilla: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    id_hotel: Mapped[int] = mapped_column(ForeignKey("hoteles.id_hotel"), nullable=False)
+    id_ruta: Mapped[int] = mapped_column(ForeignKey("rutas.id_ruta"), nullable=False)
+    pedida_por_id_usuario: Mapped[int] = mapped_column(ForeignKey("usuarios.id_usuario"), nullable=False)
+    pasajeros: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("1"), default=1)
+    dias_semana: Mapped[int] = mapped_column(Integer, nullable=False)
+    hora_inicio: Mapped[time] = mapped_column(Time, nullable=False)
+    hora_fin: Mapped[Optional[time]] = mapped_column(Time)
+    cada_minutos: Mapped[Optional[int]] = mapped_column(Integer)
+    vigente_desde: Mapped[date] = mapped_column(Date, nullable=False)
+    vigente_hasta: Mapped[Optional[date]] = mapped_column(Date)
+    activa: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("1"), default=True)
+    generada_hasta: Mapped[Optional[datetime]] = mapped_column(DateTime)  # UTC; ya expandida hasta aquí
+    creada_en: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    excepciones: Mapped[List["ExcepcionPlantilla"]] = relationship(
+        back_populates="plantilla", cascade="all, delete-orphan"
+    )
+
+
+class ExcepcionPlantilla(Base):
+    """Fecha (local) en que una plantilla no genera viajes."""
+    __tablename__ = "excepciones_plantilla"
+    __table_args__ = (UniqueConstraint("id_plantilla", "fecha", name="uq_exc_plantilla_fecha"),)
+
+    id_excepcion: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    id_plantilla: Mapped[int] = mapped_column(ForeignKey("plantillas_viaje.id_plantilla", ondelete="CASCADE"), nullable=False)
+    fecha: Mapped[date] = mapped_column(Date, nullable=False)
+    motivo: Mapped[Optional[str]] = mapped_column(String(100))
+
+    plantilla: Mapped[PlantillaViaje] = relationship(back_populates="excepciones")
+
+
 class Viaje(Base):
     __tablename__ = "viajes"
-    __table_args__ = (Index("idx_via_estado_fecha", "id_estado_viaje", "agendada_para"),)
+    __table_args__ = (
+        Index("idx_via_estado_fecha", "id_estado_viaje", "agendada_para"),
+        Index("idx_via_hotel_fecha", "id_hotel", "agendada_para"),
+        Index("idx_via_hotel_estado_fecha", "id_hotel", "id_estado_viaje", "agendada_para"),
+        Index("idx_via_solicitante_fecha", "pedida_por_id_usuario", "agendada_para"),
+        # Una plantilla genera a lo más un viaje por horario (expansión idempotente)
+        UniqueConstraint("id_plantilla", "agendada_para", name="uq_via_plantilla_fecha"),
+        Index("idx_via_lote", "lote"),
+    )
 
     id_viaje: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     id_hotel: Mapped[int] = mapped_column(ForeignKey("hoteles.id_hotel"), nullable=False)
@@ -237,6 +325,9 @@ class Viaje(Base):
     hora_pedida: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     agendada_para: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     id_estado_viaje: Mapped[int] = mapped_column(ForeignKey("estado_viaje.id_estado_viaje"), nullable=False)
+    pasajeros: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("1"), default=1)
+    id_plantilla: Mapped[Optional[int]] = mapped_column(ForeignKey("plantillas_viaje.id_plantilla"))
+    lote: Mapped[Optional[str]] = mapped_column(String(36))  # uuid de la creación masiva que lo generó
 
     hotel: Mapped[Hotel] = relationship(back_populates="viajes")
     ruta: Mapped[Ruta] = relationship(back_populates="viajes")
@@ -251,6 +342,7 @@ class AsignacionViajes(Base):
     __table_args__ = (
         UniqueConstraint("id_viaje", name="uq_asg_viaje"),
         Index("idx_asg_conductor", "id_conductor", "hora_asignacion"),
+        Index("idx_asg_recorrido", "id_recorrido"),
     )
 
     id_asignacion: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -258,6 +350,7 @@ class AsignacionViajes(Base):
     id_conductor: Mapped[int] = mapped_column(ForeignKey("conductores.id_conductor"), nullable=False)
     id_vehiculo: Mapped[Optional[int]] = mapped_column(ForeignKey("vehiculos.id_vehiculo"))
     asignado_a_id_usuario: Mapped[Optional[int]] = mapped_column(ForeignKey("usuarios.id_usuario"))
+    id_recorrido: Mapped[Optional[int]] = mapped_column(ForeignKey("recorridos_compartidos.id_recorrido"))
 
     hora_asignacion: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     hora_aceptacion: Mapped[Optional[datetime]] = mapped_column(DateTime)
@@ -268,11 +361,128 @@ class AsignacionViajes(Base):
     conductor: Mapped[Conductor] = relationship(back_populates="asignaciones")
     vehiculo: Mapped[Optional[Vehiculo]] = relationship(back_populates="asignaciones")
     usuario_asignador: Mapped[Optional[Usuario]] = relationship(back_populates="asignaciones_realizadas")
+    recorrido: Mapped[Optional["RecorridoCompartido"]] = relationship(back_populates="asignaciones")
+
+
+class RecorridoCompartido(Base):
+    """Varios viajes de la misma ruta y horario cercano en un solo vehículo."""
+    __tablename__ = "recorridos_compartidos"
+
+    id_recorrido: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    id_hotel: Mapped[int] = mapped_column(ForeignKey("hoteles.id_hotel"), nullable=False)
+    id_ruta: Mapped[int] = mapped_column(ForeignKey("rutas.id_ruta"), nullable=False)
+    id_conductor: Mapped[int] = mapped_column(ForeignKey("conductores.id_conductor"), nullable=False)
+    id_vehiculo: Mapped[Optional[int]] = mapped_column(ForeignKey("vehiculos.id_vehiculo"))
+    sale_a: Mapped[datetime] = mapped_column(DateTime, nullable=False)  # primer viaje del grupo
+    creado_en: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    asignaciones: Mapped[List[AsignacionViajes]] = relationship(back_populates="recorrido")
+
+
+class ConductorMetricaMensual(Base):
+    """Contadores mensuales por conductor, mantenidos en cada cambio de ciclo de vida."""
+    __tablename__ = "conductor_metricas_mensuales"
+    __table_args__ = (
+        UniqueConstraint("id_conductor", "periodo", name="uq_cmm_conductor_periodo"),
+        Index("idx_cmm_hotel_periodo", "id_hotel", "periodo"),
+    )
+
+    id_metrica: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    id_conductor: Mapped[int] = mapped_column(ForeignKey("conductores.id_conductor"), nullable=False)
+    id_hotel: Mapped[int] = mapped_column(ForeignKey("hoteles.id_hotel"), nullable=False)
+    periodo: Mapped[date] = mapped_column(Date, nullable=False)  # primer día del mes (agendada_para)
+
+    viajes_asignados: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    viajes_aceptados: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    viajes_completados: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    minutos_totales: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    viajes_cronometrados: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+
+
+class DemandaHoraSemana(Base):
+    """Viajes solicitados por (ruta, día de la semana, hora), mantenido al crear cada viaje."""
+    __tablename__ = "demanda_hora_semana"
+    __table_args__ = (
+        UniqueConstraint("id_ruta", "dia_semana", "hora", name="uq_dhs_ruta_slot"),
+        Index("idx_dhs_hotel", "id_hotel"),
+    )
+
+    id_demanda: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    id_hotel: Mapped[int] = mapped_column(ForeignKey("hoteles.id_hotel"), nullable=False)
+    id_ruta: Mapped[int] = mapped_column(ForeignKey("rutas.id_ruta"), nullable=False)
+    dia_semana: Mapped[int] = mapped_column(Integer, nullable=False)  # 0 = lunes
+    hora: Mapped[int] = mapped_column(Integer, nullable=False)  # 0-23
+    total: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+
+
+class DemandaDiaria(Base):
+    """Viajes solicitados por ruta y fecha (serie para el pronóstico)."""
+    __tablename__ = "demanda_diaria"
+    __table_args__ = (
+        UniqueConstraint("id_ruta", "fecha", name="uq_dd_ruta_fecha"),
+        Index("idx_dd_hotel_fecha", "id_hotel", "fecha"),
+    )
+
+    id_demanda_diaria: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    id_hotel: Mapped[int] = mapped_column(ForeignKey("hoteles.id_hotel"), nullable=False)
+    id_ruta: Mapped[int] = mapped_column(ForeignKey("rutas.id_ruta"), nullable=False)
+    fecha: Mapped[date] = mapped_column(Date, nullable=False)
+    total: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+
+
+class DuracionRutaHora(Base):
+    """Duración real aprendida (EWMA) por ruta y hora local de inicio."""
+    __tablename__ = "duraciones_ruta_hora"
+
+    id_ruta: Mapped[int] = mapped_column(ForeignKey("rutas.id_ruta"), primary_key=True)
+    hora: Mapped[int] = mapped_column(Integer, primary_key=True)  # 0-23
+    minutos: Mapped[float] = mapped_column(Float, nullable=False)
+    muestras: Mapped[int] = mapped_column(Integer, nullable=False)
+    actualizado_en: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class VersionHotel(Base):
+    """
+    Contadores de versión por hotel y dominio; cada escritura relevante
+    incrementa los suyos (ver versiones.py). La fila id_hotel = 0 guarda las
+    versiones globales (catálogos).
+    """
+    __tablename__ = "versiones_hotel"
+
+    id_hotel: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    flota: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    viajes: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    rutas: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    vehiculos: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    usuarios: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    calendarios: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    catalogos: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    hotel: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    actualizado_en: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+
+class PosicionVehiculo(Base):
+    """Recorrido GPS muestreado de un vehículo (se escribe en lotes desde memoria)."""
+    __tablename__ = "posiciones_vehiculo"
+    __table_args__ = (Index("idx_pos_vehiculo_fecha", "id_vehiculo", "registrada_en"),)
+
+    id_posicion: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    id_vehiculo: Mapped[int] = mapped_column(ForeignKey("vehiculos.id_vehiculo"), nullable=False)
+    id_hotel: Mapped[int] = mapped_column(ForeignKey("hoteles.id_hotel"), nullable=False)
+    registrada_en: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    latitud: Mapped[float] = mapped_column(DECIMAL(9, 6), nullable=False)
+    longitud: Mapped[float] = mapped_column(DECIMAL(9, 6), nullable=False)
+    velocidad_kmh: Mapped[Optional[int]] = mapped_column(Integer)
+    rumbo: Mapped[Optional[int]] = mapped_column(Integer)
 
 
 class Notificacion(Base):
     __tablename__ = "notificaciones"
-    __table_args__ = (Index("idx_not_user_fecha", "id_usuario", "fecha_envio"),)
+    __table_args__ = (
+        Index("idx_not_user_fecha", "id_usuario", "fecha_envio"),
+        Index("idx_not_user_estado_fecha", "id_usuario", "id_estado_mensaje", "fecha_envio"),
+        Index("idx_not_estado_fecha", "id_estado_mensaje", "fecha_envio"),
+    )
 
     id_notificacion: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     id_usuario: Mapped[int] = mapped_column(ForeignKey("usuarios.id_usuario"), nullable=False)
@@ -282,4 +492,74 @@ class Notificacion(Base):
     id_estado_mensaje: Mapped[int] = mapped_column(ForeignKey("estados_mensajes.id_estado_mensaje"), nullable=False)
 
     usuario: Mapped[Usuario] = relationship(back_populates="notificaciones")
-    estado_mensaje: Mapped[EstadosMensajes] = relationship(back_populates="notificaciones")
\ No newline at end of file
+    estado_mensaje: Mapped[EstadosMensajes] = relationship(back_populates="notificaciones")
+
+
+# =========================
+#   Archivo (historial frío)
+# =========================
+# Mismas columnas que viajes, asignacion_viajes y notificaciones, sin claves
+# foráneas, más archivado_en. Las filas se mueven por lotes (ver archivo.py).
+
+class ViajeArchivo(Base):
+    __tablename__ = "viajes_archivo"
+    __table_args__ = (Index("idx_viaa_hotel_fecha", "id_hotel", "agendada_para"),)
+
+    id_viaje: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    id_hotel: Mapped[int] = mapped_column(Integer, nullable=False)
+    id_ruta: Mapped[int] = mapped_column(Integer, nullable=False)
+    pedida_por_id_usuario: Mapped[int] = mapped_column(Integer, nullable=False)
+    hora_pedida: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    agendada_para: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    id_estado_viaje: Mapped[int] = mapped_column(Integer, nullable=False)
+    pasajeros: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("1"), default=1)
+    id_plantilla: Mapped[Optional[int]] = mapped_column(Integer)
+    lote: Mapped[Optional[str]] = mapped_column(String(36))
+    archivado_en: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class AsignacionViajeArchivo(Base):
+    __tablename__ = "asignacion_viajes_archivo"
+    __table_args__ = (
+        UniqueConstraint("id_viaje", name="uq_asga_viaje"),
+        Index("idx_asga_conductor", "id_conductor", "hora_asignacion"),
+    )
+
+    id_asignacion: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    id_viaje: Mapped[int] = mapped_column(Integer, nullable=False)
+    id_conductor: Mapped[int] = mapped_column(Integer, nullable=False)
+    id_vehiculo: Mapped[Optional[int]] = mapped_column(Integer)
+    asignado_a_id_usuario: Mapped[Optional[int]] = mapped_column(Integer)
+    id_recorrido: Mapped[Optional[int]] = mapped_column(Integer)
+    hora_asignacion: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    hora_aceptacion: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    inicio_viaje: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    fin_viaje: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    archivado_en: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class NotificacionArchivo(Base):
+    __tablename__ = "notificaciones_archivo"
+    __table_args__ = (Index("idx_nota_user_fecha", "id_usuario", "fecha_envio"),)
+
+    id_notificacion: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    id_usuario: Mapped[int] = mapped_column(Integer, nullable=False)
+    contenido_notificacion: Mapped[str] = mapped_column(String(500), nullable=False)
+    hora_envio: Mapped[Optional[time]] = mapped_column(Time)
+    fecha_envio: Mapped[Optional[date]] = mapped_column(Date)
+    id_estado_mensaje: Mapped[int] = mapped_column(Integer, nullable=False)
+    archivado_en: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+# =========================
+#   Migraciones de esquema
+# =========================
+
+class SchemaMigracion(Base):
+    """Versiones de app/migraciones.py ya aplicadas a esta base."""
+    __tablename__ = "schema_migraciones"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    descripcion: Mapped[str] = mapped_column(String(200), nullable=False)
+    aplicada_en: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    duracion_ms: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -0,0 +1,271 @@
+# app/plantillas.py
+"""
+Viajes recurrentes (plantillas_viaje) expandidos de a poco.
+
+Una plantilla no crea sus viajes de una vez: `expandir` genera solo los que
+caen dentro del horizonte (ahora + PLANTILLAS_HORIZONTE_HORAS) y recuerda
+hasta dónde llegó en `generada_hasta`. Una tarea de fondo la llama cada
+PLANTILLAS_INTERVALO_SEGUNDOS, así nunca hay más que un par de días de
+viajes por plantilla ni asignaciones calculadas para meses adelante.
+
+Cada expansión:
+- bloquea la fila de la plantilla (SELECT ... FOR UPDATE), así dos workers
+  no expanden el mismo tramo;
+- inserta los viajes nuevos con un solo executemany (INSERT IGNORE sobre
+  uq_via_plantilla_fecha por si acaso);
+- suma la demanda en lote y despacha todos los pendientes con un único
+  `Despachador`.
+
+Las fechas en excepciones_plantilla no generan viajes. Al agregar una
+excepción, editar o desactivar una plantilla se cancelan sus viajes futuros
+que aún no empiezan; quedan como historial sin id_plantilla, para que una
+nueva expansión pueda volver a ocupar esos horarios.
+"""
+import asyncio
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, joinedload
+
+from . import models, demanda, despacho, flota, zona_horaria, almacen_viajes, versiones
+from .config import settings
+
+ESTADOS_CANCELABLES = (1, 2, 3)  # PENDIENTE, ASIGNADO, ACEPTADO
+
+
+# =========================
+#   Horarios
+# =========================
+
+def dias_a_bits(dias: Iterable[int]) -> int:
+    bits = 0
+    for d in dias:
+        bits |= 1 << d
+    return bits
+
+
+def bits_a_dias(bits: int) -> List[int]:
+    return [d for d in range(7) if bits >> d & 1]
+
+
+def horas_del_dia(p: models.PlantillaViaje) -> List[time]:
+    """Horas locales de salida en un día en que la plantilla corre."""
+    if not p.cada_minutos or p.hora_fin is None:
+        return [p.hora_inicio]
+    horas = []
+    actual = datetime.combine(date.min, p.hora_inicio)
+    fin = datetime.combine(date.min, p.hora_fin)
+    while actual <= fin:
+        horas.append(actual.time())
+        actual += timedelta(minutes=p.cada_minutos)
+    return horas
+
+
+def corre_el(p: models.PlantillaViaje, fecha: date, excepciones: Set[date]) -> bool:
+    return (
+        fecha >= p.vigente_desde
+        and (p.vigente_hasta is None or fecha <= p.vigente_hasta)
+        and bool(p.dias_semana >> fecha.weekday() & 1)
+        and fecha not in excepciones
+    )
+
+
+def ocurrencias(
+    p: models.PlantillaViaje, desde: datetime, hasta: datetime, tz, excepciones: Set[date]
+) -> List[datetime]:
+    """Salidas (UTC naive) de la plantilla en (desde, hasta]."""
+    horas = horas_del_dia(p)
+    salidas = set()
+    fecha = zona_horaria.a_local(desde, tz).date()
+    ultima = zona_horaria.a_local(hasta, tz).date()
+    while fecha <= ultima:
+        if corre_el(p, fecha, excepciones):
+            for hora in horas:
+                salida = zona_horaria.a_utc(datetime.combine(fecha, hora), tz)
+                if desde < salida <= hasta:
+                    salidas.add(salida)
+        fecha += timedelta(days=1)
+    return sorted(salidas)
+
+
+def _excepciones(db: Session, id_plantilla: int, desde: date, hasta: date) -> Set[date]:
+    e = models.ExcepcionPlantilla
+    return set(db.execute(
+        select(e.fecha).where(e.id_plantilla == id_plantilla, e.fecha >= desde, e.fecha <= hasta)
+    ).scalars())
+
+
+def proximas(db: Session, p: models.PlantillaViaje, dias: int) -> List[datetime]:
+    """Salidas de los próximos `dias` días (vista previa, no crea nada)."""
+    tz = zona_horaria.zona_de_hotel(db, p.id_hotel)
+    ahora = datetime.utcnow()
+    hasta = ahora + timedelta(days=dias)
+    excepciones = _excepciones(
+        db, p.id_plantilla, zona_horaria.a_local(ahora, tz).date(), zona_horaria.a_local(hasta, tz).date()
+    )
+    return ocurrencias(p, ahora, hasta, tz, excepciones)
+
+
+# =========================
+#   Expansión
+# =========================
+
+def expandir(db: Session, id_plantilla: int, hasta: Optional[datetime] = None) -> List[models.Viaje]:
+    """
+    Genera y despacha los viajes de la plantilla hasta `hasta` (por defecto el
+    horizonte). Sin commit; devuelve los viajes creados.
+    """
+    p = (
+        db.query(models.PlantillaViaje)
+        .filter(models.PlantillaViaje.id_plantilla == id_plantilla)
+        .with_for_update()
+        .first()
+    )
+    if p is None or not p.activa:
+        return []
+
+    ahora = datetime.utcnow().replace(microsecond=0)
+    hasta = hasta or ahora + timedelta(hours=settings.PLANTILLAS_HORIZONTE_HORAS)
+    desde = max(p.generada_hasta or ahora, ahora)
+    if hasta <= desde:
+        return []
+
+    tz = zona_horaria.zona_de_hotel(db, p.id_hotel)
+    excepciones = _excepciones(
+        db, p.id_plantilla, zona_horaria.a_local(desde, tz).date(), zona_horaria.a_local(hasta, tz).date()
+    )
+    salidas = ocurrencias(p, desde, hasta, tz, excepciones)
+    p.generada_hasta = hasta
+
+    v = models.Viaje
+    existentes = set(db.execute(
+        select(v.agendada_para).where(v.id_plantilla == p.id_plantilla, v.agendada_para > desde, v.agendada_para <= hasta)
+    ).scalars())
+    nuevas = [s for s in salidas if s not in existentes]
+    if not nuevas:
+        return []
+
+    db.execute(insert(v).prefix_with("IGNORE", dialect="mysql"), [
+        {
+            "id_hotel": p.id_hotel,
+            "id_ruta": p.id_ruta,
+            "pedida_por_id_usuario": p.pedida_por_id_usuario,
+            "hora_pedida": ahora,
+            "agendada_para": salida,
+            "id_estado_viaje": 1,  # PENDIENTE
+            "pasajeros": p.pasajeros,
+            "id_plantilla": p.id_plantilla,
+        }
+        for salida in nuevas
+    ])
+    viajes = (
+        db.query(v)
+        .filter(v.id_plantilla == p.id_plantilla, v.agendada_para.in_(nuevas))
+        .order_by(v.agendada_para)
+        .all()
+    )
+    demanda.registrar_viajes(db, viajes)
+    _despachar(db, p.id_hotel, viajes)
+    versiones.incrementar(db, p.id_hotel, "viajes")
+    return viajes
+
+
+def _despachar(db: Session, id_hotel: int, viajes: List[models.Viaje]) -> int:
+    """Asigna en lote los viajes nuevos (un Despachador para todos). Devuelve cuántos."""
+    despachador = despacho.Despachador(db, id_hotel, viajes)
+    if not despachador.candidatos:
+        return 0
+    mensajes = []
+    for viaje in viajes:
+        info = despachador.asignar(viaje)
+        if info:
+            mensajes.append((
+                info["conductor_usuario_id"],
+                f"Nuevo viaje asignado: {despachador.nombre_ruta(viaje)} "
+                f"para {viaje.agendada_para.strftime('%d/%m/%Y %H:%M')}",
+            ))
+    from .routers.notificaciones import agregar_notificaciones
+    agregar_notificaciones(db, mensajes)
+    return len(mensajes)
+
+
+def expandir_todas(db: Session) -> int:
+    """Expande cada plantilla activa en su propia transacción. Devuelve los viajes creados."""
+    t = models.PlantillaViaje
+    ids = db.execute(select(t.id_plantilla).where(t.activa.is_(True))).scalars().all()
+    total = 0
+    for id_plantilla in ids:
+        try:
+            viajes = expandir(db, id_plantilla)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ No se pudo expandir la plantilla {id_plantilla}: {e}")
+            continue
+        for viaje in viajes:
+            almacen_viajes.registrar(viaje)
+        total += len(viajes)
+    return total
+
+
+def cancelar_futuros(
+    db: Session, p: models.PlantillaViaje, fecha: Optional[date] = None, motivo: str = ""
+) -> int:
+    """
+    Cancela los viajes de la plantilla que aún no empiezan (solo los de la
+    fecha local `fecha`, si se indica) y los desliga de ella. Sin commit.
+    """
+    v = models.Viaje
+    q = db.query(v).options(joinedload(v.asignacion)).filter(
+        v.id_plantilla == p.id_plantilla,
+        v.id_estado_viaje.in_(ESTADOS_CANCELABLES),
+        v.agendada_para >= datetime.utcnow(),
+    )
+    if fecha is not None:
+        tz = zona_horaria.zona_de_hotel(db, p.id_hotel)
+        q = q.filter(
+            v.agendada_para >= zona_horaria.a_utc(datetime.combine(fecha, time()), tz),
+            v.agendada_para < zona_horaria.a_utc(datetime.combine(fecha + timedelta(days=1), time()), tz),
+        )
+    viajes = q.all()
+
+    conductores = flota.obtener(db, p.id_hotel).conductores
+    sufijo = f" ({motivo})" if motivo else ""
+    mensajes = []
+    for viaje in viajes:
+        if viaje.asignacion is not None:
+            c = conductores.get(viaje.asignacion.id_conductor)
+            if c is not None:
+                mensajes.append((c.id_usuario, f"Viaje cancelado: {viaje.agendada_para.strftime('%d/%m/%Y %H:%M')}{sufijo}"))
+        viaje.id_estado_viaje = 6  # CANCELADO
+        viaje.id_plantilla = None
+    despacho.soltar_de_recorridos(db, [viaje.asignacion for viaje in viajes if viaje.asignacion is not None])
+    from .routers.notificaciones import agregar_notificaciones
+    agregar_notificaciones(db, mensajes)
+    if viajes:
+        versiones.incrementar(db, p.id_hotel, "viajes")
+    db.flush()  # libera los horarios antes de una nueva expansión
+    return len(viajes)
+
+
+def _expandir_con_sesion() -> int:
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return expandir_todas(db)
+    finally:
+        db.close()
+
+
+async def tarea_expansion() -> None:
+    """Bucle de fondo: al iniciar y cada PLANTILLAS_INTERVALO_SEGUNDOS."""
+    while True:
+        try:
+            creados = await asyncio.to_thread(_expandir_con_sesion)
+            if creados:
+                print(f"🗓️ Plantillas: {creados} viajes generados")
+        except Exception as e:
+            print(f"⚠️ No se pudieron expandir las plantillas: {e}")
+        await asyncio.sleep(settings.PLANTILLAS_INTERVALO_SEGUNDOS)
@@ -0,0 +1,252 @@
+# app/posiciones.py
+"""
+Posiciones GPS de vehículos en memoria, con guardado en lotes.
+
+Cada vehículo tiene un buffer circular de tamaño fijo (POSICIONES_BUFFER
+puntos en arrays tipados), así un ping cuesta unas asignaciones en memoria y
+ninguna consulta. La "última posición de cada vehículo del hotel" se lee de
+ahí.
+
+Una tarea de fondo (`tarea_vaciado`, cada POSICIONES_FLUSH_SEGUNDOS) toma los
+puntos nuevos de cada buffer, se queda con uno cada
+POSICIONES_MUESTREO_SEGUNDOS y los inserta en posiciones_vehiculo con un solo
+executemany.
+
+Un ping más nuevo que el último del buffer se descarta si no lo supera, así
+que un reloj adelantado en el teléfono bloquearía los siguientes: un lote que
+llega con puntos más allá de ahora + POSICIONES_TOLERANCIA_FUTURO_SEGUNDOS se
+corre entero hacia atrás hasta que el último quede en la hora del servidor
+(se conserva el espaciado entre puntos).
+
+Carga de prueba del buffer y del vaciado: benchmarks/carga_posiciones.py.
+
+Los buffers son por proceso: con varios workers, cada conductor debe enviar
+siempre al mismo (p. ej. WebSocket con afinidad) para que /ultimas lo vea.
+"""
+import asyncio
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+
+# (epoch UTC en segundos, latitud, longitud, velocidad_kmh, rumbo)
+Punto = Tuple[float, float, float, Optional[int], Optional[int]]
+
+_SIN_DATO = -1
+_MAX_REINTENTO = 50_000
+
+
+def epoch(fecha: Optional[datetime]) -> float:
+    """datetime (naive = UTC) -> segundos epoch; None = ahora."""
+    if fecha is None:
+        return time.time()
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha.timestamp()
+
+
+def _fecha(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+
+class Recorrido:
+    """Buffer circular de posiciones de un vehículo."""
+
+    def __init__(self, id_vehiculo: int, id_hotel: int, capacidad: int):
+        self.id_vehiculo = id_vehiculo
+        self.id_hotel = id_hotel
+        self.ts = array("d", bytes(8 * capacidad))
+        self.lat = array("d", bytes(8 * capacidad))
+        self.lon = array("d", bytes(8 * capacidad))
+        self.vel = array("h", bytes(2 * capacidad))
+        self.rumbo = array("h", bytes(2 * capacidad))
+        self.inicio = 0      # índice del punto más antiguo
+        self.n = 0           # puntos en el buffer
+        self.revisado_hasta = 0.0   # ts hasta donde ya se muestreó para guardar
+        self.muestreado_en = 0.0    # ts del último punto elegido para guardar
+        self.lock = threading.Lock()
+
+    def agregar(self, puntos: List[Punto]) -> int:
+        """Agrega puntos (ordenados por ts); descarta los que no son más nuevos que el último."""
+        cap = len(self.ts)
+        agregados = 0
+        with self.lock:
+            ultimo_ts = self.ts[(self.inicio + self.n - 1) % cap] if self.n else 0.0
+            for ts, lat, lon, vel, rumbo in puntos:
+                if ts <= ultimo_ts:
+                    continue
+                i = (self.inicio + self.n) % cap
+                if self.n == cap:
+                    self.inicio = (self.inicio + 1) % cap
+                else:
+                    self.n += 1
+                self.ts[i] = ts
+                self.lat[i] = lat
+                self.lon[i] = lon
+                self.vel[i] = _SIN_DATO if vel is None else max(0, min(vel, 32767))
+                self.rumbo[i] = _SIN_DATO if rumbo is None else rumbo % 360
+                ultimo_ts = ts
+                agregados += 1
+        return agregados
+
+    def ultimo(self) -> Optional[Punto]:
+        with self.lock:
+            if not self.n:
+                return None
+            i = (self.inicio + self.n - 1) % len(self.ts)
+            return self._punto(i)
+
+    def _punto(self, i: int) -> Punto:
+        vel, rumbo = self.vel[i], self.rumbo[i]
+        return (
+            self.ts[i], self.lat[i], self.lon[i],
+            None if vel == _SIN_DATO else vel,
+            None if rumbo == _SIN_DATO else rumbo,
+        )
+
+    def muestrear(self, cada_segundos: float) -> List[Punto]:
+        """Puntos nuevos desde el último muestreo, a lo sumo uno cada `cada_segundos`."""
+        cap = len(self.ts)
+        elegidos = []
+        with self.lock:
+            # Solo los nuevos: desde el más reciente hacia atrás hasta lo ya revisado
+            primero = self.n
+            while primero and self.ts[(self.inicio + primero - 1) % cap] > self.revisado_hasta:
+                primero -= 1
+            for k in range(primero, self.n):
+                i = (self.inicio + k) % cap
+                ts = self.ts[i]
+                if ts - self.muestreado_en >= cada_segundos:
+                    elegidos.append(self._punto(i))
+                    self.muestreado_en = ts
+                self.revisado_hasta = ts
+        return elegidos
+
+
+# =========================
+#   Registro de vehículos
+# =========================
+
+_recorridos: Dict[int, Recorrido] = {}
+_por_hotel: Dict[int, Set[int]] = {}
+_registro_lock = threading.Lock()
+_reintento: List[dict] = []
+
+
+def _recorrido(id_hotel: int, id_vehiculo: int) -> Recorrido:
+    rec = _recorridos.get(id_vehiculo)
+    if rec is None:
+        with _registro_lock:
+            rec = _recorridos.get(id_vehiculo)
+            if rec is None:
+                rec = _recorridos[id_vehiculo] = Recorrido(id_vehiculo, id_hotel, settings.POSICIONES_BUFFER)
+                _por_hotel.setdefault(id_hotel, set()).add(id_vehiculo)
+    return rec
+
+
+def _corregir_futuro(puntos: List[Punto], ahora: float) -> List[Punto]:
+    """Corre hacia atrás un lote (ordenado) cuyo último punto está en el futuro."""
+    if not puntos or puntos[-1][0] <= ahora + settings.POSICIONES_TOLERANCIA_FUTURO_SEGUNDOS:
+        return puntos
+    corrimiento = puntos[-1][0] - ahora
+    return [(ts - corrimiento, lat, lon, vel, rumbo) for ts, lat, lon, vel, rumbo in puntos]
+
+
+def registrar(id_hotel: int, id_vehiculo: int, puntos: Iterable[Punto]) -> int:
+    """Agrega posiciones del vehículo al buffer. Devuelve cuántas se aceptaron."""
+    puntos = _corregir_futuro(sorted(puntos, key=lambda p: p[0]), time.time())
+    return _recorrido(id_hotel, id_vehiculo).agregar(puntos)
+
+
+def _como_dict(id_vehiculo: int, punto: Punto, ahora: float) -> dict:
+    ts, lat, lon, vel, rumbo = punto
+    return {
+        "id_vehiculo": id_vehiculo,
+        "latitud": lat,
+        "longitud": lon,
+        "velocidad_kmh": vel,
+        "rumbo": rumbo,
+        "registrada_en": _fecha(ts),
+        "hace_segundos": round(ahora - ts, 1),
+    }
+
+
+def ultima(id_vehiculo: int) -> Optional[dict]:
+    """Última posición conocida (en este proceso) de un vehículo."""
+    rec = _recorridos.get(id_vehiculo)
+    punto = rec.ultimo() if rec else None
+    return _como_dict(id_vehiculo, punto, time.time()) if punto else None
+
+
+def ultimas(id_hotel: int) -> List[dict]:
+    """Última posición conocida (en este proceso) de cada vehículo del hotel."""
+    ahora = time.time()
+    resultado = []
+    for id_vehiculo in sorted(_por_hotel.get(id_hotel, ())):
+        punto = _recorridos[id_vehiculo].ultimo()
+        if punto is not None:
+            resultado.append(_como_dict(id_vehiculo, punto, ahora))
+    return resultado
+
+
+def vaciar(db: Session) -> int:
+    """Guarda en la BD los puntos muestreados pendientes (un executemany). Devuelve cuántos."""
+    global _reintento
+    filas, _reintento = _reintento, []
+    for rec in list(_recorridos.values()):
+        for ts, lat, lon, vel, rumbo in rec.muestrear(settings.POSICIONES_MUESTREO_SEGUNDOS):
+            filas.append({
+                "id_vehiculo": rec.id_vehiculo,
+                "id_hotel": rec.id_hotel,
+                "registrada_en": _fecha(ts),
+                "latitud": round(lat, 6),
+                "longitud": round(lon, 6),
+                "velocidad_kmh": vel,
+                "rumbo": rumbo,
+            })
+    if not filas:
+        return 0
+    try:
+        db.execute(insert(models.PosicionVehiculo), filas)
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Se reintenta en la próxima vuelta (acotado, para no crecer sin límite)
+        _reintento = filas[-_MAX_REINTENTO:]
+        raise
+    return len(filas)
+
+
+def _vaciar_con_sesion() -> int:
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return vaciar(db)
+    finally:
+        db.close()
+
+
+async def tarea_vaciado() -> None:
+    """Bucle de fondo: guarda los puntos muestreados cada POSICIONES_FLUSH_SEGUNDOS."""
+    while True:
+        await asyncio.sleep(settings.POSICIONES_FLUSH_SEGUNDOS)
+        try:
+            await asyncio.to_thread(_vaciar_con_sesion)
+        except Exception as e:
+            print(f"⚠️ No se pudieron guardar posiciones: {e}")
+
+
+async def vaciado_final() -> None:
+    """Al apagar la app: último guardado."""
+    try:
+        await asyncio.to_thread(_vaciar_con_sesion)
+    except Exception as e:
+        print(f"⚠️ No se pudieron guardar posiciones al cerrar: {e}")
@@ -0,0 +1,198 @@
+# app/reasignacion.py
+"""
+Reasignación en lote de viajes futuros cuando un conductor o vehículo deja de
+estar disponible: suspensión, fin de turno, fin de la tenencia del vehículo o
+vehículo dado de baja (id_estado_vehiculo distinto de activo).
+
+    resultado = reasignacion.reasignar(db, id_hotel, conductores=[id_conductor])
+    db.commit()
+    reasignacion.despues_del_commit(resultado)
+
+Una sola consulta reúne los viajes ASIGNADO/ACEPTADO afectados; un
+`Despachador` los reparte contra la disponibilidad actual (excluyendo a los
+conductores/vehículos que originan el cambio). Las asignaciones se actualizan
+en su lugar (id_viaje es único en asignacion_viajes); los viajes sin
+conductor libre vuelven a PENDIENTE. Si hay viajes compartidos, los
+reasignados se vuelven a agrupar con el nuevo conductor y los recorridos que
+quedan con un solo viaje se deshacen (despacho.depurar_recorridos). Asignaciones, contadores y
+notificaciones quedan en la misma transacción que el cambio que la dispara.
+
+Si el conductor solo cambia de vehículo, `cambiar_vehiculo` le deja sus
+viajes con el vehículo nuevo y reasigna únicamente los que no caben en él.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from . import models, flota, metricas_conductor, almacen_viajes, versiones
+from .despacho import Despachador, depurar_recorridos
+
+ESTADOS_REASIGNABLES = (2, 3)  # ASIGNADO, ACEPTADO
+
+
+def reasignar(
+    db: Session,
+    id_hotel: int,
+    conductores: Iterable[int] = (),
+    vehiculos: Iterable[int] = (),
+    hasta: Optional[datetime] = None,
+    motivo: str = "",
+    viajes: Iterable[int] = (),
+    excluir_conductores: Iterable[int] = (),
+) -> dict:
+    """
+    Reasigna los viajes futuros (hasta `hasta`, si se indica) de los conductores
+    y/o vehículos dados, o los viajes indicados. Los conductores y vehículos
+    dados (y `excluir_conductores`) no reciben viajes. Sin commit.
+    """
+    conductores = list(conductores)
+    vehiculos = list(vehiculos)
+    viajes = list(viajes)
+    resultado = {"reasignados": [], "sin_conductor": [], "viajes": []}
+    if not conductores and not vehiculos and not viajes:
+        return resultado
+
+    a, v = models.AsignacionViajes, models.Viaje
+    afectados = []
+    if conductores:
+        afectados.append(a.id_conductor.in_(conductores))
+    if vehiculos:
+        afectados.append(a.id_vehiculo.in_(vehiculos))
+    if viajes:
+        afectados.append(v.id_viaje.in_(viajes))
+
+    q = (
+        db.query(v, a)
+        .join(a, a.id_viaje == v.id_viaje)
+        .filter(
+            v.id_hotel == id_hotel,
+            v.id_estado_viaje.in_(ESTADOS_REASIGNABLES),
+            v.agendada_para >= datetime.utcnow(),
+            or_(*afectados),
+        )
+        .order_by(v.agendada_para)
+    )
+    if hasta is not None:
+        q = q.filter(v.agendada_para < hasta)
+    filas = q.all()
+    if not filas:
+        return resultado
+
+    despachador = Despachador(
+        db, id_hotel, [viaje for viaje, _ in filas],
+        excluir_conductores=conductores + list(excluir_conductores), excluir_vehiculos=vehiculos,
+    )
+    por_conductor = flota.obtener(db, id_hotel).conductores
+    sufijo = f" ({motivo})" if motivo else ""
+    ahora = datetime.utcnow()
+    mensajes: List[tuple] = []
+    recorridos = {asig.id_recorrido for _, asig in filas}
+
+    for viaje, asig in filas:
+        anterior = por_conductor.get(asig.id_conductor)
+        descripcion = f"{despachador.nombre_ruta(viaje)} para {viaje.agendada_para.strftime('%d/%m/%Y %H:%M')}"
+        metricas_conductor.registrar_desasignacion(db, viaje, asig)
+
+        nuevo = despachador.elegir(viaje)
+        if nuevo is not None:
+            asig.id_conductor = nuevo.id_conductor
+            asig.id_vehiculo = nuevo.id_vehiculo
+            asig.asignado_a_id_usuario = None
+            asig.hora_asignacion = ahora
+            asig.hora_aceptacion = None
+            despachador.agrupar(viaje, asig)
+            viaje.id_estado_viaje = 2  # ASIGNADO (debe aceptarlo el nuevo conductor)
+            metricas_conductor.registrar_asignacion(db, viaje, nuevo.id_conductor)
+            mensajes.append((nuevo.id_usuario, f"Nuevo viaje asignado: {descripcion}"))
+            resultado["reasignados"].append(viaje.id_viaje)
+        else:
+            db.delete(asig)
+            viaje.id_estado_viaje = 1  # PENDIENTE
+            resultado["sin_conductor"].append(viaje.id_viaje)
+
+        if anterior is not None:
+            mensajes.append((anterior.id_usuario, f"Viaje reasignado: {descripcion}{sufijo}"))
+        resultado["viajes"].append(viaje)
+
+    depurar_recorridos(db, recorridos)
+    from .routers.notificaciones import agregar_notificaciones
+    agregar_notificaciones(db, mensajes)
+    versiones.incrementar(db, id_hotel, "viajes")
+    print(
+        f"🔁 Reasignación{sufijo}: {len(resultado['reasignados'])} reasignados, "
+        f"{len(resultado['sin_conductor'])} sin conductor"
+    )
+    return resultado
+
+
+def cambiar_vehiculo(
+    db: Session,
+    id_hotel: int,
+    id_conductor: int,
+    anteriores: Iterable[int],
+    nuevo: models.Vehiculo,
+) -> dict:
+    """
+    El conductor deja los vehículos `anteriores` por `nuevo`: sus viajes
+    futuros con esos vehículos pasan al nuevo si caben (un recorrido
+    compartido cuenta con todos sus pasajeros); los que no caben se
+    reasignan con `reasignar`. Sin commit.
+    """
+    anteriores = list(anteriores)
+    if not anteriores:
+        return {"reasignados": [], "sin_conductor": [], "viajes": []}
+
+    a, v = models.AsignacionViajes, models.Viaje
+    filas = (
+        db.query(v, a)
+        .join(a, a.id_viaje == v.id_viaje)
+        .filter(
+            v.id_hotel == id_hotel,
+            v.id_estado_viaje.in_(ESTADOS_REASIGNABLES),
+            v.agendada_para >= datetime.utcnow(),
+            a.id_conductor == id_conductor,
+            a.id_vehiculo.in_(anteriores),
+        )
+        .all()
+    )
+    pasajeros: Dict[object, int] = {}
+    for viaje, asig in filas:
+        clave = ("r", asig.id_recorrido) if asig.id_recorrido else ("a", asig.id_asignacion)
+        pasajeros[clave] = pasajeros.get(clave, 0) + (viaje.pasajeros or 1)
+
+    no_caben = []
+    recorridos = set()
+    for viaje, asig in filas:
+        clave = ("r", asig.id_recorrido) if asig.id_recorrido else ("a", asig.id_asignacion)
+        if nuevo.capacidad is not None and pasajeros[clave] > nuevo.capacidad:
+            no_caben.append(viaje.id_viaje)
+            continue
+        asig.id_vehiculo = nuevo.id_vehiculo
+        if asig.id_recorrido:
+            recorridos.add(asig.id_recorrido)
+    for id_recorrido in recorridos:
+        db.get(models.RecorridoCompartido, id_recorrido).id_vehiculo = nuevo.id_vehiculo
+
+    resultado = reasignar(
+        db, id_hotel, viajes=no_caben, excluir_conductores=[id_conductor],
+        motivo="no caben en el vehículo nuevo",
+    ) if no_caben else {"reasignados": [], "sin_conductor": [], "viajes": []}
+    if filas:
+        versiones.incrementar(db, id_hotel, "viajes")
+    resultado["viajes"] = [viaje for viaje, _ in filas]
+    return resultado
+
+
+def despues_del_commit(resultado: dict) -> None:
+    """Refleja los viajes tocados en el almacén analítico (si está habilitado)."""
+    for viaje in resultado["viajes"]:
+        almacen_viajes.registrar(viaje)
+
+
+def resumen(resultado: dict) -> dict:
+    return {
+        "viajes_reasignados": len(resultado["reasignados"]),
+        "viajes_sin_conductor": len(resultado["sin_conductor"]),
+    }
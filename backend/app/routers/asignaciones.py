@@ -1,17 +1,20 @@
 # app/routers/asignaciones.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 from ..deps import get_db
 from ..auth_deps import get_current_claims, require_role
-from .. import models, schemas
+from .. import models, schemas, despacho, metricas_conductor, almacen_viajes, versiones, http_cache, serializacion
 
 router = APIRouter(prefix="/asignaciones", tags=["asignaciones"])
 
 
 @router.get("/", response_model=list[schemas.AsignacionOut])
 def listar_asignaciones(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     claims: dict = Depends(get_current_claims)
 ):
@@ -19,6 +22,7 @@ def listar_asignaciones(
     Lista todas las asignaciones.
     - Admin/Supervisor: todas de su hotel
     - Conductor: solo las suyas
+    Con ?format=columnar responde {"columns": [...], "rows": [[...], ...]}.
     """
     user_id = int(claims["sub"])
     role = int(claims.get("role", 0))
@@ -26,27 +30,37 @@ def listar_asignaciones(
     
     if not me:
         raise HTTPException(404, "Usuario no encontrado")
-    
-    q = db.query(models.AsignacionViajes)
+
+    # Las asignaciones cambian junto con los viajes (misma versión)
+    if role in (2, 3, 4):
+        no_modificado = http_cache.validar(request, response, db, me.id_hotel, ("viajes",), user_id, role)
+        if no_modificado is not None:
+            return no_modificado
+
+    a = models.AsignacionViajes
+    columnas = serializacion.columnas(a, schemas.AsignacionOut)
+    claves = [c.key for c in columnas]
+    q = select(*columnas)
     
     if role in (3, 4):  # Supervisor/Admin
         if not me.id_hotel:
             raise HTTPException(403, "Sin hotel asignado")
         # Filtrar por hotel a través del viaje
-        q = q.join(models.Viaje).filter(models.Viaje.id_hotel == me.id_hotel)
+        q = q.join(models.Viaje, models.Viaje.id_viaje == a.id_viaje).where(models.Viaje.id_hotel == me.id_hotel)
     elif role == 2:  # Conductor
         conductor = db.query(models.Conductor).filter(
             models.Conductor.id_usuario == user_id
         ).first()
 
         if not conductor:
-            return []
+            return serializacion.tabla(request, response, claves, [])
 
-        q = q.filter(models.AsignacionViajes.id_conductor == conductor.id_conductor)
+        q = q.where(a.id_conductor == conductor.id_conductor)
     else:
         raise HTTPException(403, "Sin permisos para ver asignaciones")
     
-    return q.order_by(models.AsignacionViajes.hora_asignacion.desc()).all()
+    filas = db.execute(q.order_by(a.hora_asignacion.desc())).all()
+    return serializacion.tabla(request, response, claves, filas)
 
 
 @router.get("/{id_asignacion}", response_model=schemas.AsignacionOut)
@@ -123,6 +137,13 @@ def actualizar_asignacion(
     if conductor.id_estado_actividad != 1 or conductor.is_suspended:
         raise HTTPException(400, "Conductor no disponible")
     
+    # id_conductor llega como id de usuario; la asignación guarda el de conductores
+    registro_conductor = db.query(models.Conductor).filter(
+        models.Conductor.id_usuario == conductor.id_usuario
+    ).first()
+    if not registro_conductor:
+        raise HTTPException(400, "Conductor no válido")
+    
     # Validar nuevo vehículo
     vehiculo = db.query(models.Vehiculo).get(id_vehiculo)
     if not vehiculo or vehiculo.id_hotel != me.id_hotel:
@@ -131,8 +152,12 @@ def actualizar_asignacion(
     if vehiculo.id_estado_vehiculo != 1:
         raise HTTPException(400, "Vehículo no disponible")
     
-    # Actualizar
-    asig.id_conductor = id_conductor
+    # Actualizar (los contadores salen del conductor anterior y pasan al nuevo)
+    metricas_conductor.registrar_desasignacion(db, viaje, asig)
+    if (asig.id_conductor, asig.id_vehiculo) != (registro_conductor.id_conductor, id_vehiculo):
+        # Con otro conductor o vehículo ya no es parte del recorrido compartido
+        despacho.soltar_de_recorridos(db, [asig])
+    asig.id_conductor = registro_conductor.id_conductor
     asig.id_vehiculo = id_vehiculo
     asig.asignado_a_id_usuario = user_id
     asig.hora_asignacion = datetime.utcnow()
@@ -142,8 +167,11 @@ def actualizar_asignacion(
     if viaje.id_estado_viaje == 3:
         viaje.id_estado_viaje = 2
     
+    metricas_conductor.registrar_asignacion(db, viaje, asig.id_conductor)
+    versiones.incrementar(db, viaje.id_hotel, "viajes")
     db.commit()
     db.refresh(asig)
+    almacen_viajes.registrar(viaje, asig)
     
     # Notificar al nuevo conductor
     from .notificaciones import notificar_viaje_asignado
@@ -184,7 +212,11 @@ def eliminar_asignacion(
     # Volver a PENDIENTE
     viaje.id_estado_viaje = 1
     
+    metricas_conductor.registrar_desasignacion(db, viaje, asig)
+    despacho.soltar_de_recorridos(db, [asig])
     db.delete(asig)
+    versiones.incrementar(db, viaje.id_hotel, "viajes")
     db.commit()
+    almacen_viajes.registrar(viaje)
     
     return {"ok": True, "message": "Asignación eliminada, viaje vuelve a PENDIENTE"}
\ No newline at end of file
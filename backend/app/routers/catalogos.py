@@ -0,0 +1,25 @@
+# app/routers/catalogos.py
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+
+from .. import catalogos
+from ..deps import get_db
+
+router = APIRouter(prefix="/catalogos", tags=["catalogos"])
+
+
+@router.get("")
+def listar_catalogos(request: Request, db: Session = Depends(get_db)):
+    """
+    Todos los catálogos en una respuesta: estados, tipos de usuario, ciudades
+    y marcas. Se sirve desde memoria con ETag; el cliente puede reusar su copia.
+    """
+    return catalogos.respuesta(request, db, "todos")
+
+
+@router.get("/{nombre}")
+def obtener_catalogo(nombre: str, request: Request, db: Session = Depends(get_db)):
+    """Un catálogo (p. ej. estados_viaje, tipos_usuario, ciudades, marcas)."""
+    if nombre not in catalogos.NOMBRES:
+        raise HTTPException(404, "Catálogo no encontrado")
+    return catalogos.respuesta(request, db, nombre)
@@ -1,10 +1,10 @@
 # app/routers/conductor_vehiculo.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
 from typing import List, Optional
 
-from .. import models, schemas
+from .. import models, schemas, flota, turnos, calendario, zona_horaria, reasignacion, versiones, http_cache
 from ..deps import get_db
 from ..auth_deps import get_current_claims, require_role
 
@@ -18,57 +18,33 @@ def obtener_mi_vehiculo(
     """
     Obtiene el vehículo actualmente asignado al conductor.
     """
-    user_id = int(claims["sub"])
-    
-    # Buscar conductor
-    conductor = (
-        db.query(models.Conductor)
-        .filter(models.Conductor.id_usuario == user_id)
-        .first()
-    )
-    
+    conductor = flota.conductor_de_usuario(db, int(claims["sub"]))
     if not conductor:
         raise HTTPException(404, "No eres conductor")
     
-    # Buscar asignación activa
-    asignacion = (
-        db.query(
-            models.ConductorVehiculo,
-            models.Vehiculo.patente,
-            models.Vehiculo.modelo,
-            models.Vehiculo.anio,
-            models.Vehiculo.capacidad,
-            models.MarcaVehiculo.nombre_marca_vehiculo
-        )
-        .join(models.Vehiculo, models.ConductorVehiculo.id_vehiculo == models.Vehiculo.id_vehiculo)
-        .join(models.MarcaVehiculo, models.Vehiculo.id_marca_vehiculo == models.MarcaVehiculo.id_marca_vehiculo)
-        .filter(
-            models.ConductorVehiculo.id_conductor == conductor.id_conductor,
-            models.ConductorVehiculo.hora_fin_asignacion.is_(None)
-        )
-        .first()
-    )
-    
-    if not asignacion:
+    if conductor.id_conductor_vehiculo is None:
         return {"tiene_vehiculo": False}
     
-    cv, patente, modelo, anio, capacidad, marca = asignacion
+    v = conductor.vehiculo
+    patente, marca, modelo = (v.patente, v.marca, v.modelo) if v else (None, None, None)
     
     return {
         "tiene_vehiculo": True,
-        "id_conductor_vehiculo": cv.id_conductor_vehiculo,
+        "id_conductor_vehiculo": conductor.id_conductor_vehiculo,
         "patente": patente,
         "marca": marca,
         "modelo": modelo,
-        "anio": anio,
-        "capacidad": capacidad,
+        "anio": v.anio if v else None,
+        "capacidad": v.capacidad if v else None,
         "descripcion": f"{patente} - {marca} {modelo or ''}".strip(),
-        "asignado_desde": cv.hora_asignacion.isoformat()
+        "asignado_desde": conductor.hora_asignacion.isoformat()
     }
 
 
 @router.get("", response_model=List[dict], dependencies=[Depends(require_role(3))])
 def listar_asignaciones_actuales(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     claims: dict = Depends(get_current_claims)
 ):
@@ -79,42 +55,23 @@ def listar_asignaciones_actuales(
     me = db.query(models.Usuario).get(int(claims["sub"]))
     if not me or not me.id_hotel:
         raise HTTPException(403, "Usuario sin hotel")
-    
-    # Buscar asignaciones activas del hotel
-    asignaciones = (
-        db.query(
-            models.ConductorVehiculo,
-            models.Usuario.id_usuario,
-            models.Usuario.nombre_usuario,
-            models.Usuario.apellido1_usuario,
-            models.Usuario.id_estado_actividad,
-            models.Usuario.is_suspended,
-            models.Vehiculo.patente,
-            models.MarcaVehiculo.nombre_marca_vehiculo
-        )
-        .join(models.Conductor, models.ConductorVehiculo.id_conductor == models.Conductor.id_conductor)
-        .join(models.Usuario, models.Conductor.id_usuario == models.Usuario.id_usuario)
-        .join(models.Vehiculo, models.ConductorVehiculo.id_vehiculo == models.Vehiculo.id_vehiculo)
-        .join(models.MarcaVehiculo, models.Vehiculo.id_marca_vehiculo == models.MarcaVehiculo.id_marca_vehiculo)
-        .filter(
-            models.Usuario.id_hotel == me.id_hotel,
-            models.ConductorVehiculo.hora_fin_asignacion.is_(None)  # Solo activas
-        )
-        .all()
-    )
-    
+    no_modificado = http_cache.validar(request, response, db, me.id_hotel, ("flota",))
+    if no_modificado is not None:
+        return no_modificado
+
+    # Asignaciones activas del hotel, desde el registro de flota
     resultado = []
-    for cv, id_usuario, nombre, apellido, estado_actividad, is_suspended, patente, marca in asignaciones:
-        disponible = estado_actividad == 1 and not bool(is_suspended)
+    for c in flota.obtener(db, me.id_hotel).con_vehiculo():
+        v = c.vehiculo
         resultado.append({
-            "id_conductor_vehiculo": cv.id_conductor_vehiculo,
-            "id_conductor": cv.id_conductor,
-            "id_usuario": id_usuario,
-            "conductor_nombre": f"{nombre} {apellido}",
-            "id_vehiculo": cv.id_vehiculo,
-            "vehiculo_info": f"{patente} - {marca}",
-            "disponible": disponible,
-            "hora_asignacion": cv.hora_asignacion.isoformat(),
+            "id_conductor_vehiculo": c.id_conductor_vehiculo,
+            "id_conductor": c.id_conductor,
+            "id_usuario": c.id_usuario,
+            "conductor_nombre": f"{c.nombre} {c.apellido}",
+            "id_vehiculo": c.id_vehiculo,
+            "vehiculo_info": f"{v.patente} - {v.marca}" if v else "",
+            "disponible": c.disponible,
+            "hora_asignacion": c.hora_asignacion.isoformat(),
         })
     
     return resultado
@@ -128,7 +85,8 @@ def asignar_vehiculo_a_conductor(
 ):
     """
     Asigna un vehículo a un conductor.
-    Finaliza cualquier asignación previa activa del conductor.
+    Finaliza cualquier asignación previa activa del conductor; sus viajes
+    futuros pasan al vehículo nuevo (los que no caben se reasignan).
     """
     me = db.query(models.Usuario).get(int(claims["sub"]))
     if not me or not me.id_hotel:
@@ -170,6 +128,13 @@ def asignar_vehiculo_a_conductor(
     for asig in asignaciones_previas:
         asig.hora_fin_asignacion = ahora
     
+    # Viajes futuros con el vehículo anterior, en la misma transacción
+    resultado = reasignacion.cambiar_vehiculo(
+        db, me.id_hotel, conductor.id_conductor,
+        {a.id_vehiculo for a in asignaciones_previas if a.id_vehiculo != vehiculo.id_vehiculo},
+        vehiculo,
+    )
+    
     # Crear nueva asignación
     nueva = models.ConductorVehiculo(
         id_conductor=conductor.id_conductor,  # Usar id_conductor, NO id_usuario
@@ -177,13 +142,17 @@ def asignar_vehiculo_a_conductor(
         hora_asignacion=ahora
     )
     db.add(nueva)
+    flota.registrar_cambio(db, me.id_hotel)
     db.commit()
+    flota.invalidar(me.id_hotel)
+    reasignacion.despues_del_commit(resultado)
     db.refresh(nueva)
     
     return {
         "ok": True,
         "id_conductor_vehiculo": nueva.id_conductor_vehiculo,
-        "message": "Vehículo asignado correctamente"
+        "message": "Vehículo asignado correctamente",
+        **reasignacion.resumen(resultado)
     }
 
 @router.post("/iniciar-turno")
@@ -201,31 +170,16 @@ def iniciar_turno(
     if not conductor:
         raise HTTPException(404, "No eres conductor")
     
-    # Buscar o crear disponibilidad
-    disponibilidad = (
-        db.query(models.DisponibilidadConductores)
-        .filter(models.DisponibilidadConductores.id_conductor == conductor.id_conductor)
-        .first()
-    )
-    
-    if not disponibilidad:
-        disponibilidad = models.DisponibilidadConductores(
-            id_conductor=conductor.id_conductor,
-            dias_disponibles_semanales=7,
-            inicio_turno=datetime.utcnow().time(),
-            fin_turno=None
-        )
-        db.add(disponibilidad)
-    else:
-        disponibilidad.dias_disponibles_semanales = 7
-        disponibilidad.inicio_turno = datetime.utcnow().time()
-        disponibilidad.fin_turno = None
+    # Abrir turno (si ya hay uno abierto se mantiene)
+    turnos.abrir(db, conductor.id_conductor)
     
     # Marcar usuario como disponible
     usuario = db.query(models.Usuario).get(user_id)
     usuario.id_estado_actividad = 1  # Activo
     
+    flota.registrar_cambio(db, usuario.id_hotel)
     db.commit()
+    flota.invalidar(usuario.id_hotel)
     return {"ok": True, "message": "Turno iniciado", "disponible": True}
 
 
@@ -244,23 +198,31 @@ def finalizar_turno(
     if not conductor:
         raise HTTPException(404, "No eres conductor")
     
-    # Actualizar disponibilidad
-    disponibilidad = (
-        db.query(models.DisponibilidadConductores)
-        .filter(models.DisponibilidadConductores.id_conductor == conductor.id_conductor)
-        .first()
-    )
-    
-    if disponibilidad:
-        disponibilidad.dias_disponibles_semanales = 0
-        disponibilidad.fin_turno = datetime.utcnow().time()
+    # Cerrar el turno abierto
+    turnos.cerrar(db, conductor.id_conductor)
     
     # Marcar usuario como no disponible
     usuario = db.query(models.Usuario).get(user_id)
     usuario.id_estado_actividad = 2  # Inactivo
     
+    # Sus viajes de lo que queda del día (hora local) pasan a otros conductores
+    resultado = {"reasignados": [], "sin_conductor": [], "viajes": []}
+    if usuario.id_hotel:
+        tz = zona_horaria.zona_de_hotel(db, usuario.id_hotel)
+        hoy = zona_horaria.a_local(datetime.utcnow(), tz).date()
+        fin_del_dia = zona_horaria.a_utc(datetime.combine(hoy + timedelta(days=1), time()), tz)
+        resultado = reasignacion.reasignar(
+            db, usuario.id_hotel,
+            conductores=[conductor.id_conductor],
+            hasta=fin_del_dia,
+            motivo="fin de turno",
+        )
+    
+    flota.registrar_cambio(db, usuario.id_hotel)
     db.commit()
-    return {"ok": True, "message": "Turno finalizado", "disponible": False}
+    flota.invalidar(usuario.id_hotel)
+    reasignacion.despues_del_commit(resultado)
+    return {"ok": True, "message": "Turno finalizado", "disponible": False, **reasignacion.resumen(resultado)}
 
 
 @router.get("/estado-turno")
@@ -269,33 +231,220 @@ def obtener_estado_turno(
     claims: dict = Depends(get_current_claims)
 ):
     """Obtiene el estado actual del turno del conductor."""
-    user_id = int(claims["sub"])
+    conductor = flota.conductor_de_usuario(db, int(claims["sub"]))
+    if not conductor:
+        raise HTTPException(404, "No eres conductor")
     
-    conductor = db.query(models.Conductor).filter(
-        models.Conductor.id_usuario == user_id
-    ).first()
+    if conductor.inicio_turno:
+        inicio, fin = conductor.inicio_turno, None
+    else:
+        # Sin turno abierto: mostrar el último (índice id_conductor, inicio)
+        anterior = turnos.ultimo(db, conductor.id_conductor)
+        inicio, fin = (anterior.inicio, anterior.fin) if anterior else (None, None)
     
+    return {
+        "disponible": conductor.en_turno,
+        "inicio_turno": inicio.isoformat() if inicio else None,
+        "fin_turno": fin.isoformat() if fin else None
+    }
+
+# ========================================
+#   Calendario de disponibilidad semanal
+# ========================================
+
+def _conductor_del_hotel(db: Session, claims: dict, id_usuario: int):
+    """Conductor (registro de flota) del hotel del supervisor, o 404."""
+    me = db.query(models.Usuario).get(int(claims["sub"]))
+    if not me or not me.id_hotel:
+        raise HTTPException(403, "Usuario sin hotel")
+    conductor = flota.obtener(db, me.id_hotel).por_usuario.get(id_usuario)
+    if not conductor or conductor.id_tipo_usuario != 2:
+        raise HTTPException(404, "Conductor no encontrado")
+    return me.id_hotel, conductor
+
+
+def _calendario_out(db: Session, id_hotel: int, id_conductor: int) -> dict:
+    semana = calendario.leer(db, id_conductor)
+    hoy = zona_horaria.a_local(datetime.utcnow(), zona_horaria.zona_de_hotel(db, id_hotel)).date()
+    excepciones = (
+        db.query(models.ExcepcionCalendario)
+        .filter(
+            models.ExcepcionCalendario.id_conductor == id_conductor,
+            models.ExcepcionCalendario.fecha >= hoy
+        )
+        .order_by(models.ExcepcionCalendario.fecha)
+        .all()
+    )
+    return {
+        "id_conductor": id_conductor,
+        "tiene_calendario": semana is not None,
+        "dias": [calendario.bits_a_franjas(d) for d in semana] if semana else [],
+        "dias_disponibles_semanales": calendario.dias_con_disponibilidad(semana) if semana else None,
+        "excepciones": [
+            {
+                "fecha": e.fecha.isoformat(),
+                "franjas": calendario.bits_a_franjas(calendario.dia_de_bytes(e.franjas)),
+            }
+            for e in excepciones
+        ],
+    }
+
+
+@router.get("/calendario/mio")
+def obtener_mi_calendario(
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """Calendario semanal (hora local del hotel) y excepciones próximas del conductor."""
+    conductor = flota.conductor_de_usuario(db, int(claims["sub"]))
     if not conductor:
         raise HTTPException(404, "No eres conductor")
+    id_hotel = flota.hotel_de_usuario(conductor.id_usuario)
+    return _calendario_out(db, id_hotel, conductor.id_conductor)
+
+
+@router.get("/calendario/disponibles", dependencies=[Depends(require_role(3))])
+def conductores_disponibles_por_franja(
+    fecha: Optional[date] = Query(None, description="Fecha local (por defecto hoy)"),
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Cuántos conductores del hotel tienen disponibilidad en cada franja de 15
+    minutos de la fecha, según su calendario (solo conductores con calendario).
+    """
+    me = db.query(models.Usuario).get(int(claims["sub"]))
+    if not me or not me.id_hotel:
+        raise HTTPException(403, "Usuario sin hotel")
     
-    usuario = db.query(models.Usuario).get(user_id)
-    disponibilidad = (
+    if fecha is None:
+        tz = zona_horaria.zona_de_hotel(db, me.id_hotel)
+        fecha = zona_horaria.a_local(datetime.utcnow(), tz).date()
+    
+    ids = [c.id_conductor for c in flota.obtener(db, me.id_hotel).conductores.values() if c.id_tipo_usuario == 2]
+    cal = calendario.cargar(db, ids, fecha, fecha)
+    return {
+        "fecha": fecha.isoformat(),
+        "minutos_franja": calendario.MINUTOS_FRANJA,
+        "conductores_con_calendario": len(cal.ids),
+        "disponibles": cal.conteo_por_franja(fecha),
+    }
+
+
+@router.get("/calendario/{id_usuario}", dependencies=[Depends(require_role(3))])
+def obtener_calendario(
+    id_usuario: int,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """Calendario semanal y excepciones próximas de un conductor del hotel."""
+    id_hotel, conductor = _conductor_del_hotel(db, claims, id_usuario)
+    return _calendario_out(db, id_hotel, conductor.id_conductor)
+
+
+@router.put("/calendario/{id_usuario}", dependencies=[Depends(require_role(3))])
+def guardar_calendario(
+    id_usuario: int,
+    body: schemas.CalendarioIn,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Reemplaza el calendario semanal del conductor (franjas en hora local del
+    hotel, redondeadas a 15 minutos; una franja como 22:00-06:00 sigue en el
+    día siguiente). Actualiza dias_disponibles_semanales.
+    """
+    id_hotel, conductor = _conductor_del_hotel(db, claims, id_usuario)
+    semana = calendario.semana_de_franjas([[(f.desde, f.hasta) for f in dia] for dia in body.dias])
+    
+    fila = db.get(models.CalendarioConductor, conductor.id_conductor)
+    if not fila:
+        fila = models.CalendarioConductor(id_conductor=conductor.id_conductor)
+        db.add(fila)
+    fila.franjas = calendario.semana_a_bytes(semana)
+    fila.actualizado_en = datetime.utcnow()
+    
+    # dias_disponibles_semanales refleja el calendario
+    dias = calendario.dias_con_disponibilidad(semana)
+    disponibilidades = (
         db.query(models.DisponibilidadConductores)
         .filter(models.DisponibilidadConductores.id_conductor == conductor.id_conductor)
-        .first()
+        .all()
     )
+    if not disponibilidades:
+        db.add(models.DisponibilidadConductores(
+            id_conductor=conductor.id_conductor,
+            dias_disponibles_semanales=dias
+        ))
+    for d in disponibilidades:
+        d.dias_disponibles_semanales = dias
     
-    esta_disponible = (
-        usuario.id_estado_actividad == 1 and
-        disponibilidad and
-        disponibilidad.dias_disponibles_semanales > 0
+    versiones.incrementar(db, id_hotel, "calendarios")
+    db.commit()
+    return _calendario_out(db, id_hotel, conductor.id_conductor)
+
+
+@router.put("/calendario/{id_usuario}/excepciones", dependencies=[Depends(require_role(3))])
+def guardar_excepcion(
+    id_usuario: int,
+    body: schemas.ExcepcionCalendarioIn,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Define la disponibilidad de una fecha puntual (sin franjas = día libre).
+    Las franjas no pueden cruzar la medianoche (400): la fecha siguiente se
+    define con su propia excepción.
+    """
+    id_hotel, conductor = _conductor_del_hotel(db, claims, id_usuario)
+    if not db.get(models.CalendarioConductor, conductor.id_conductor):
+        raise HTTPException(400, "El conductor no tiene calendario semanal")
+    
+    try:
+        bits = calendario.franjas_a_bits((f.desde, f.hasta) for f in body.franjas)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    exc = (
+        db.query(models.ExcepcionCalendario)
+        .filter(
+            models.ExcepcionCalendario.id_conductor == conductor.id_conductor,
+            models.ExcepcionCalendario.fecha == body.fecha
+        )
+        .first()
     )
+    if not exc:
+        exc = models.ExcepcionCalendario(id_conductor=conductor.id_conductor, fecha=body.fecha)
+        db.add(exc)
+    exc.franjas = calendario.dia_a_bytes(bits)
     
-    return {
-        "disponible": esta_disponible,
-        "inicio_turno": disponibilidad.inicio_turno.isoformat() if disponibilidad and disponibilidad.inicio_turno else None,
-        "fin_turno": disponibilidad.fin_turno.isoformat() if disponibilidad and disponibilidad.fin_turno else None
-    }
+    versiones.incrementar(db, id_hotel, "calendarios")
+    db.commit()
+    return _calendario_out(db, id_hotel, conductor.id_conductor)
+
+
+@router.delete("/calendario/{id_usuario}/excepciones/{fecha}", dependencies=[Depends(require_role(3))])
+def eliminar_excepcion(
+    id_usuario: int,
+    fecha: date,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """Elimina la excepción de una fecha (vuelve a regir el calendario semanal)."""
+    id_hotel, conductor = _conductor_del_hotel(db, claims, id_usuario)
+    borradas = (
+        db.query(models.ExcepcionCalendario)
+        .filter(
+            models.ExcepcionCalendario.id_conductor == conductor.id_conductor,
+            models.ExcepcionCalendario.fecha == fecha
+        )
+        .delete(synchronize_session=False)
+    )
+    if not borradas:
+        raise HTTPException(404, "Excepción no encontrada")
+    versiones.incrementar(db, id_hotel, "calendarios")
+    db.commit()
+    return {"ok": True}
+
 
 @router.patch("/{id_conductor_vehiculo}/finalizar", dependencies=[Depends(require_role(3))])
 def finalizar_asignacion(
@@ -324,6 +473,17 @@ def finalizar_asignacion(
         raise HTTPException(400, "La asignación ya fue finalizada")
     
     asig.hora_fin_asignacion = datetime.utcnow()
+    
+    # El conductor queda sin vehículo: sus viajes futuros se reasignan
+    resultado = reasignacion.reasignar(
+        db, me.id_hotel,
+        conductores=[asig.id_conductor],
+        motivo="conductor sin vehículo",
+    )
+    
+    flota.registrar_cambio(db, me.id_hotel)
     db.commit()
+    flota.invalidar(me.id_hotel)
+    reasignacion.despues_del_commit(resultado)
     
-    return {"ok": True, "message": "Asignación finalizada"}
\ No newline at end of file
+    return {"ok": True, "message": "Asignación finalizada", **reasignacion.resumen(resultado)}
\ No newline at end of file
@@ -0,0 +1,117 @@
+# app/routers/exportaciones.py
+from datetime import datetime
+from typing import Iterator, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+
+from .. import models, serializacion, archivo
+from ..config import settings
+from ..database import SessionLocal
+from ..deps import get_db
+from ..auth_deps import get_current_claims, require_role
+
+router = APIRouter(prefix="/exportaciones", tags=["exportaciones"])
+
+
+_FORMATOS = {
+    "ndjson": (serializacion.a_ndjson, "application/x-ndjson"),
+    "csv": (serializacion.a_csv, "text/csv; charset=utf-8"),
+    "columnar": (serializacion.a_columnar, "application/json"),
+}
+
+
+def _hotel_of_user(db: Session, claims: dict) -> int:
+    """Helper: obtiene el hotel del usuario actual."""
+    me = db.query(models.Usuario).get(int(claims["sub"]))
+    if not me or not me.id_hotel:
+        raise HTTPException(403, "Usuario sin hotel")
+    return me.id_hotel
+
+
+def _consulta_viajes(id_hotel: int, desde, hasta, estado, incluir_archivados: bool = False):
+    """Viajes con ruta, solicitante y (si tiene) asignación, conductor y vehículo."""
+    v, r = archivo.viajes(incluir_archivados), models.Ruta
+    a = archivo.asignaciones(incluir_archivados)
+    solicitante, usuario_conductor = aliased(models.Usuario), aliased(models.Usuario)
+    q = (
+        select(
+            v.id_viaje, v.id_hotel, v.id_estado_viaje, v.hora_pedida, v.agendada_para, v.pasajeros,
+            v.id_ruta, r.nombre_ruta.label("ruta_nombre"), r.origen_ruta, r.destino_ruta, r.precio_ruta,
+            v.pedida_por_id_usuario,
+            solicitante.nombre_usuario.label("solicitante_nombre"),
+            solicitante.apellido1_usuario.label("solicitante_apellido"),
+            solicitante.telefono_usuario.label("solicitante_telefono"),
+            a.id_asignacion, a.id_conductor,
+            usuario_conductor.nombre_usuario.label("conductor_nombre"),
+            usuario_conductor.apellido1_usuario.label("conductor_apellido"),
+            a.id_vehiculo, models.Vehiculo.patente,
+            a.hora_asignacion, a.hora_aceptacion, a.inicio_viaje, a.fin_viaje,
+        )
+        .join(r, r.id_ruta == v.id_ruta)
+        .outerjoin(solicitante, solicitante.id_usuario == v.pedida_por_id_usuario)
+        .outerjoin(a, a.id_viaje == v.id_viaje)
+        .outerjoin(models.Conductor, models.Conductor.id_conductor == a.id_conductor)
+        .outerjoin(usuario_conductor, usuario_conductor.id_usuario == models.Conductor.id_usuario)
+        .outerjoin(models.Vehiculo, models.Vehiculo.id_vehiculo == a.id_vehiculo)
+        .where(v.id_hotel == id_hotel)
+        .order_by(v.agendada_para, v.id_viaje)
+    )
+    if desde:
+        q = q.where(v.agendada_para >= desde)
+    if hasta:
+        q = q.where(v.agendada_para < hasta)
+    if estado:
+        q = q.where(v.id_estado_viaje == estado)
+    return q
+
+
+def _lotes(consulta) -> Iterator[list]:
+    """
+    Lotes de filas desde un cursor del servidor (stream_results + yield_per),
+    en una sesión propia que vive lo que dura la respuesta: la del request se
+    cierra antes de terminar de enviar.
+    """
+    db = SessionLocal()
+    try:
+        resultado = db.execute(
+            consulta.execution_options(stream_results=True, yield_per=settings.EXPORTACION_LOTE)
+        )
+        for lote in resultado.partitions():
+            yield lote
+    finally:
+        db.close()
+
+
+@router.get("/viajes", dependencies=[Depends(require_role(3))])
+def exportar_viajes(
+    formato: Literal["ndjson", "csv", "columnar"] = Query("ndjson"),
+    desde: Optional[datetime] = Query(None, description="agendada_para >= desde"),
+    hasta: Optional[datetime] = Query(None, description="agendada_para < hasta"),
+    estado: Optional[int] = Query(None, description="Filtrar por estado"),
+    incluir_archivados: bool = Query(False, description="Incluir viajes archivados"),
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims),
+):
+    """
+    Exporta los viajes del hotel (sin límite de filas) junto con ruta,
+    solicitante, conductor, vehículo y horas de la asignación.
+
+    Las filas se leen por lotes de un cursor del servidor y se envían a
+    medida que llegan (NDJSON, CSV o columnar): la memoria no crece con la
+    cantidad de filas y el primer byte sale de inmediato.
+    Con incluir_archivados=true entra también el historial archivado.
+    """
+    hotel_id = _hotel_of_user(db, claims)
+    consulta = _consulta_viajes(hotel_id, desde, hasta, estado, incluir_archivados)
+    claves = list(consulta.selected_columns.keys())
+
+    codificar, media_type = _FORMATOS[formato]
+    nombre = f"viajes_{hotel_id}_{datetime.utcnow():%Y%m%d%H%M%S}.{'json' if formato == 'columnar' else formato}"
+    return StreamingResponse(
+        codificar(claves, _lotes(consulta)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'},
+    )
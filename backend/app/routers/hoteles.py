@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from ..deps import get_db
-from .. import models, schemas
+from .. import models, schemas, versiones, zona_horaria
 from ..auth_deps import get_current_claims
 
 router = APIRouter(prefix="/hoteles", tags=["hoteles"])
@@ -54,6 +54,8 @@ def crear_hotel(
     """
     Crea un nuevo hotel (solo para super admin típicamente).
     """
+    if payload.zona_horaria and not zona_horaria.es_valida(payload.zona_horaria):
+        raise HTTPException(400, "Zona horaria inválida")
     h = models.Hotel(**payload.model_dump())
     db.add(h)
     db.commit()
@@ -74,10 +76,14 @@ def actualizar_hotel(
     h = db.get(models.Hotel, id_hotel)
     if not h:
         raise HTTPException(404, "Hotel no encontrado")
+    if payload.zona_horaria and not zona_horaria.es_valida(payload.zona_horaria):
+        raise HTTPException(400, "Zona horaria inválida")
     
     for k, v in payload.model_dump(exclude_unset=True).items():
         setattr(h, k, v)
     
+    # Otros workers tienen la zona horaria en caché
+    versiones.incrementar(db, id_hotel, "hotel")
     db.commit()
     db.refresh(h)
     return h
\ No newline at end of file
@@ -0,0 +1,63 @@
+# app/routers/importaciones.py
+import io
+import tempfile
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+
+from .. import models, importacion
+from ..database import SessionLocal
+from ..auth_deps import get_current_claims, require_role
+
+router = APIRouter(prefix="/importaciones", tags=["importaciones"])
+
+# Hasta este tamaño el cuerpo queda en memoria; más grande va a un archivo temporal
+_CUERPO_EN_MEMORIA = 16 * 1024 * 1024
+
+
+def _hotel_destino(claims: dict, hotel_id: Optional[int]) -> int:
+    """Admin: el hotel indicado (o el suyo). Supervisor: siempre el suyo."""
+    db = SessionLocal()
+    try:
+        me = db.query(models.Usuario).get(int(claims["sub"]))
+        if int(claims.get("role", 0) or 0) == 4 and hotel_id:
+            if not db.query(models.Hotel).get(hotel_id):
+                raise HTTPException(404, "Hotel no encontrado")
+            return hotel_id
+        if not me or not me.id_hotel:
+            raise HTTPException(403, "Usuario sin hotel")
+        return me.id_hotel
+    finally:
+        db.close()
+
+
+def _importar(id_hotel: int, cuerpo, formato: str) -> dict:
+    db = SessionLocal()
+    try:
+        texto = io.TextIOWrapper(cuerpo, encoding="utf-8-sig", newline="")
+        return importacion.importar(db, id_hotel, importacion.leer(texto, formato))
+    finally:
+        db.close()
+
+
+@router.post("/viajes", dependencies=[Depends(require_role(3))])
+async def importar_viajes(
+    request: Request,
+    formato: Literal["ndjson", "csv"] = Query("ndjson"),
+    hotelId: Optional[int] = Query(None, alias="hotelId"),
+    claims: dict = Depends(get_current_claims),
+):
+    """
+    Importa historial de viajes y asignaciones (cuerpo NDJSON o CSV, ver
+    app/importacion.py) sin asignación automática ni notificaciones.
+    Responde cuántos viajes y asignaciones se crearon y las filas rechazadas.
+    """
+    id_hotel = await run_in_threadpool(_hotel_destino, claims, hotelId)
+
+    # El cuerpo se guarda a medida que llega y se procesa en el threadpool
+    with tempfile.SpooledTemporaryFile(max_size=_CUERPO_EN_MEMORIA) as cuerpo:
+        async for trozo in request.stream():
+            cuerpo.write(trozo)
+        cuerpo.seek(0)
+        return await run_in_threadpool(_importar, id_hotel, cuerpo, formato)
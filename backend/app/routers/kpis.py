@@ -1,11 +1,12 @@
 # app/routers/kpis.py
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, text
-from datetime import datetime, timedelta
+from sqlalchemy import func, text, select, or_
+from datetime import datetime, time, timedelta
 from typing import Optional
+import heapq
 
-from .. import models
+from .. import models, metricas_conductor, utilizacion, almacen_viajes, demanda, series_tiempo, zona_horaria, flota, calendario, catalogos, archivo
 from ..deps import get_db
 from ..auth_deps import (
     get_current_claims,
@@ -22,12 +23,14 @@ def get_dashboard_kpis(
     hotel_id: Optional[int] = Query(None, alias="hotelId"),
     fecha_desde: Optional[datetime] = Query(None),
     fecha_hasta: Optional[datetime] = Query(None),
+    incluir_archivados: bool = Query(False, description="Contar también viajes archivados"),
     db: Session = Depends(get_db),
     claims: dict = Depends(get_current_claims)
 ):
     """
     Obtiene KPIs principales del dashboard para Supervisor y Admin.
     Admin debe pasar hotelId como query parameter.
+    Con incluir_archivados=true cuenta también el historial archivado.
     """
     role = int(claims.get("role", 0))
     
@@ -48,30 +51,36 @@ def get_dashboard_kpis(
     if not fecha_hasta:
         fecha_hasta = datetime.utcnow()
     
-    # === VIAJES POR ESTADO ===
-    viajes_por_estado = (
-        db.query(
-            models.EstadoViaje.nombre_estado_viaje,
-            func.count(models.Viaje.id_viaje).label("total")
-        )
-        .join(models.EstadoViaje, models.Viaje.id_estado_viaje == models.EstadoViaje.id_estado_viaje)
-        .filter(
-            models.Viaje.id_hotel == selected_hotel,
-            models.Viaje.agendada_para.between(fecha_desde, fecha_hasta)
+    v = archivo.viajes(incluir_archivados)
+    a = archivo.asignaciones(incluir_archivados)
+
+    # === VIAJES POR ESTADO === (nombres desde el catálogo en memoria)
+    estados_viaje = catalogos.obtener(db).estados_viaje
+    viajes_por_estado = [
+        (estados_viaje.get(id_estado, str(id_estado)), total)
+        for id_estado, total in (
+            db.query(
+                v.id_estado_viaje,
+                func.count(v.id_viaje).label("total")
+            )
+            .filter(
+                v.id_hotel == selected_hotel,
+                v.agendada_para.between(fecha_desde, fecha_hasta)
+            )
+            .group_by(v.id_estado_viaje)
+            .all()
         )
-        .group_by(models.EstadoViaje.nombre_estado_viaje)
-        .all()
-    )
+    ]
     
     # === VIAJES HOY ===
     hoy_inicio = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     hoy_fin = hoy_inicio + timedelta(days=1)
     
     viajes_hoy = (
-        db.query(func.count(models.Viaje.id_viaje))
+        db.query(func.count(v.id_viaje))
         .filter(
-            models.Viaje.id_hotel == selected_hotel,
-            models.Viaje.agendada_para.between(hoy_inicio, hoy_fin)
+            v.id_hotel == selected_hotel,
+            v.agendada_para.between(hoy_inicio, hoy_fin)
         )
         .scalar()
     )
@@ -104,17 +113,17 @@ def get_dashboard_kpis(
             func.avg(
                 func.timestampdiff(
                     text("MINUTE"),
-                    models.AsignacionViajes.inicio_viaje,
-                    models.AsignacionViajes.fin_viaje
+                    a.inicio_viaje,
+                    a.fin_viaje
                 )
             )
         )
-        .join(models.Viaje, models.AsignacionViajes.id_viaje == models.Viaje.id_viaje)
+        .join(v, a.id_viaje == v.id_viaje)
         .filter(
-            models.Viaje.id_hotel == selected_hotel,
-            models.AsignacionViajes.inicio_viaje.isnot(None),
-            models.AsignacionViajes.fin_viaje.isnot(None),
-            models.Viaje.agendada_para.between(fecha_desde, fecha_hasta)
+            v.id_hotel == selected_hotel,
+            a.inicio_viaje.isnot(None),
+            a.fin_viaje.isnot(None),
+            v.agendada_para.between(fecha_desde, fecha_hasta)
         )
         .scalar()
     )
@@ -123,15 +132,15 @@ def get_dashboard_kpis(
     rutas_top = (
         db.query(
             models.Ruta.nombre_ruta,
-            func.count(models.Viaje.id_viaje).label("total_viajes")
+            func.count(v.id_viaje).label("total_viajes")
         )
-        .join(models.Viaje, models.Ruta.id_ruta == models.Viaje.id_ruta)
+        .join(v, models.Ruta.id_ruta == v.id_ruta)
         .filter(
-            models.Viaje.id_hotel == selected_hotel,
-            models.Viaje.agendada_para.between(fecha_desde, fecha_hasta)
+            v.id_hotel == selected_hotel,
+            v.agendada_para.between(fecha_desde, fecha_hasta)
         )
         .group_by(models.Ruta.nombre_ruta)
-        .order_by(func.count(models.Viaje.id_viaje).desc())
+        .order_by(func.count(v.id_viaje).desc())
         .limit(5)
         .all()
     )
@@ -173,6 +182,9 @@ def get_conductores_stats(
 ):
     """
     Estadísticas de conductores.
+    Se leen de los contadores mensuales: el rango se amplía a meses completos
+    (por agendada_para, UTC) y "periodo" devuelve el rango efectivo
+    [desde, hasta) junto con el solicitado.
     Admin debe pasar hotelId como query parameter.
     """
     role = int(claims.get("role", 0))
@@ -193,51 +205,50 @@ def get_conductores_stats(
     if not fecha_hasta:
         fecha_hasta = datetime.utcnow()
     
+    # Lectura de los contadores mensuales (conductor_metricas_mensuales),
+    # por índice (id_hotel, periodo). El rango se redondea a meses completos.
+    primer_mes = metricas_conductor.periodo_de(fecha_desde)
+    ultimo_mes = metricas_conductor.periodo_de(fecha_hasta)
+    m = models.ConductorMetricaMensual
     stats = (
         db.query(
-            models.Conductor.id_conductor.label("id_conductor"),
+            m.id_conductor.label("id_conductor"),
             models.Usuario.id_usuario.label("id_usuario"),
             func.concat(
                 models.Usuario.nombre_usuario, ' ',
                 models.Usuario.apellido1_usuario
             ).label("nombre_completo"),
-            func.count(models.AsignacionViajes.id_asignacion).label("viajes_asignados"),
-            func.sum(
-                case((models.AsignacionViajes.hora_aceptacion.isnot(None), 1), else_=0)
-            ).label("viajes_aceptados"),
-            func.sum(
-                case((models.Viaje.id_estado_viaje == 5, 1), else_=0)
-            ).label("viajes_completados"),
-            func.avg(
-                func.timestampdiff(
-                    text("MINUTE"),
-                    models.AsignacionViajes.inicio_viaje,
-                    models.AsignacionViajes.fin_viaje
-                )
-            ).label("tiempo_promedio")
+            func.sum(m.viajes_asignados).label("viajes_asignados"),
+            func.sum(m.viajes_aceptados).label("viajes_aceptados"),
+            func.sum(m.viajes_completados).label("viajes_completados"),
+            func.sum(m.minutos_totales).label("minutos_totales"),
+            func.sum(m.viajes_cronometrados).label("viajes_cronometrados")
         )
-       .join(models.Conductor, models.Usuario.id_usuario == models.Conductor.id_usuario)
-        .join(models.AsignacionViajes, models.Conductor.id_conductor == models.AsignacionViajes.id_conductor)
-        .join(models.Viaje, models.AsignacionViajes.id_viaje == models.Viaje.id_viaje)
+        .join(models.Conductor, m.id_conductor == models.Conductor.id_conductor)
+        .join(models.Usuario, models.Conductor.id_usuario == models.Usuario.id_usuario)
         .filter(
-            models.Usuario.id_hotel == selected_hotel,
-            models.Usuario.id_tipo_usuario == 2,
-            models.Viaje.agendada_para.between(fecha_desde, fecha_hasta)
+            m.id_hotel == selected_hotel,
+            m.periodo.between(primer_mes, ultimo_mes)
         )
         .group_by(
-            models.Conductor.id_conductor,
+            m.id_conductor,
             models.Usuario.id_usuario,
             models.Usuario.nombre_usuario,
             models.Usuario.apellido1_usuario
         )
-        .order_by(func.count(models.AsignacionViajes.id_asignacion).desc())
+        .order_by(func.sum(m.viajes_asignados).desc())
         .all()
     )
     
     return {
         "periodo": {
-            "desde": fecha_desde.isoformat(),
-            "hasta": fecha_hasta.isoformat()
+            "desde": datetime.combine(primer_mes, time.min).isoformat(),
+            "hasta": datetime.combine(metricas_conductor.siguiente_periodo(ultimo_mes), time.min).isoformat(),
+            "meses_completos": True,
+            "solicitado": {
+                "desde": fecha_desde.isoformat(),
+                "hasta": fecha_hasta.isoformat()
+            }
         },
         "conductores": [
             {
@@ -252,22 +263,23 @@ def get_conductores_stats(
                     if row.viajes_asignados > 0 else 0,
                     2
                 ),
-                "tiempo_promedio_minutos": round(row.tiempo_promedio, 2) if row.tiempo_promedio else 0
+                "tiempo_promedio_minutos": round(
+                    row.minutos_totales / row.viajes_cronometrados, 2
+                ) if row.viajes_cronometrados else 0
             }
             for row in stats
         ]
     }
 
 
-@router.get("/viajes-por-dia", dependencies=[Depends(require_supervisor_or_admin)])
-def get_viajes_por_dia(
-    dias: int = Query(30, description="Número de días hacia atrás"),
+@router.post("/conductores/reconstruir", dependencies=[Depends(require_supervisor_or_admin)])
+def reconstruir_stats_conductores(
     hotel_id: Optional[int] = Query(None, alias="hotelId"),
     db: Session = Depends(get_db),
     claims: dict = Depends(get_current_claims)
 ):
     """
-    Viajes por día (útil para gráficos).
+    Recalcula los contadores mensuales de conductores desde el historial.
     Admin debe pasar hotelId como query parameter.
     """
     role = int(claims.get("role", 0))
@@ -283,27 +295,319 @@ def get_viajes_por_dia(
             raise HTTPException(403, "Usuario sin hotel")
         selected_hotel = me.id_hotel
     
-    fecha_desde = datetime.utcnow() - timedelta(days=dias)
+    filas = metricas_conductor.reconstruir_metricas(db, selected_hotel)
+    db.commit()
+    return {"ok": True, "filas": filas}
+
+
+@router.get("/viajes-por-dia", dependencies=[Depends(require_supervisor_or_admin)])
+def get_viajes_por_dia(
+    dias: int = Query(30, ge=1, le=366, description="Número de días hacia atrás"),
+    granularidad: str = Query("dia", description="hora | dia | semana"),
+    hotel_id: Optional[int] = Query(None, alias="hotelId"),
+    incluir_archivados: bool = Query(False, description="Contar también viajes archivados"),
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Viajes por hora, día o semana (útil para gráficos), en hora local del hotel.
+    La serie es densa: los periodos sin viajes aparecen con total 0.
+    Admin debe pasar hotelId como query parameter.
+    """
+    if granularidad not in series_tiempo.GRANULARIDADES:
+        raise HTTPException(400, f"granularidad debe ser una de {series_tiempo.GRANULARIDADES}")
+
+    selected_hotel = _hotel_seleccionado(db, claims, hotel_id)
+    tz = zona_horaria.zona_de_hotel(db, selected_hotel)
+
+    # Límites en hora local -> UTC; el filtro es un rango sobre agendada_para
+    # (sin funciones sobre la columna, usa idx_via_hotel_fecha)
+    ahora_local = zona_horaria.a_local(datetime.utcnow(), tz)
+    desde_local = (ahora_local - timedelta(days=dias)).replace(hour=0, minute=0, second=0, microsecond=0)
+    hasta_local = ahora_local
+    etiquetas, limites = series_tiempo.cubetas(desde_local, hasta_local, granularidad, tz)
+
+    # La BD cuenta por hora UTC (a lo más 24 × días filas); se suman por cubeta local
+    v = archivo.viajes(incluir_archivados)
+    minutos = series_tiempo.minutos_por_tramo(limites)
+    tramo = series_tiempo.tramo_utc(v.agendada_para, minutos).label("tramo")
+    conteos = db.execute(
+        select(tramo, func.count())
+        .where(
+            v.id_hotel == selected_hotel,
+            v.agendada_para >= limites[0],
+            v.agendada_para < limites[-1],
+        )
+        .group_by(tramo)
+        .order_by(tramo)
+    ).all()
+    totales = series_tiempo.sumar(
+        ((series_tiempo.inicio_de_tramo(t, minutos), n) for t, n in conteos), limites
+    )
+
+    return {
+        "granularidad": granularidad,
+        "zona_horaria": str(tz),
+        "datos": [
+            {"fecha": fecha, "total": total}
+            for fecha, total in zip(etiquetas, totales)
+        ]
+    }
+
+
+def _hotel_seleccionado(db: Session, claims: dict, hotel_id: Optional[int]) -> int:
+    """Admin debe indicar hotelId; el supervisor usa su propio hotel."""
+    role = int(claims.get("role", 0))
+    if role == 4:  # Admin
+        if not hotel_id:
+            raise HTTPException(400, "Admin debe especificar hotelId")
+        return hotel_id
+    me = db.query(models.Usuario).get(int(claims["sub"]))
+    if not me or not me.id_hotel:
+        raise HTTPException(403, "Usuario sin hotel")
+    return me.id_hotel
+
+
+# Viajes agendados hasta este margen antes del rango pueden seguir en curso dentro de él
+_MARGEN_VIAJES = timedelta(days=1)
+
+
+@router.get("/utilizacion", dependencies=[Depends(require_supervisor_or_admin)])
+def get_utilizacion(
+    hotel_id: Optional[int] = Query(None, alias="hotelId"),
+    fecha_desde: Optional[datetime] = Query(None),
+    fecha_hasta: Optional[datetime] = Query(None),
+    incluir_archivados: bool = Query(False, description="Contar también viajes archivados"),
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Porcentaje del tiempo de turno (vehículo asignado en conductor_vehiculo)
+    ocupado en viajes, por vehículo y por conductor, más la concurrencia máxima.
+    Intervalo de viaje: inicio_viaje/fin_viaje, o agendada_para + duracion_aproximada.
+    Admin debe pasar hotelId como query parameter.
+    """
+    selected_hotel = _hotel_seleccionado(db, claims, hotel_id)
     
-    resultado = (
-        db.query(
-            func.date(models.Viaje.agendada_para).label("fecha"),
-            func.count(models.Viaje.id_viaje).label("total")
+    ahora = datetime.utcnow()
+    if not fecha_desde:
+        fecha_desde = ahora - timedelta(days=7)
+    if not fecha_hasta:
+        fecha_hasta = ahora
+    if fecha_hasta <= fecha_desde:
+        raise HTTPException(400, "Rango de fechas inválido")
+    
+    # === TENENCIAS (pocas filas: una por emparejamiento conductor-vehículo) ===
+    cv = models.ConductorVehiculo
+    tenencias = db.execute(
+        select(cv.hora_asignacion, cv.hora_fin_asignacion, cv.id_conductor, cv.id_vehiculo)
+        .join(models.Vehiculo, cv.id_vehiculo == models.Vehiculo.id_vehiculo)
+        .where(
+            models.Vehiculo.id_hotel == selected_hotel,
+            cv.hora_asignacion < fecha_hasta,
+            or_(cv.hora_fin_asignacion.is_(None), cv.hora_fin_asignacion > fecha_desde)
         )
-        .filter(
-            models.Viaje.id_hotel == selected_hotel,
-            models.Viaje.agendada_para >= fecha_desde
+        .order_by(cv.hora_asignacion)
+    ).all()
+    fin_abierto = min(ahora, fecha_hasta)
+    intervalos_tenencia = [
+        (max(ini, fecha_desde), min(fin or fin_abierto, fecha_hasta), utilizacion.TENENCIA, id_c, id_v)
+        for ini, fin, id_c, id_v in tenencias
+    ]
+    
+    # === VIAJES (columnas sueltas, cursor en streaming, ya ordenados por inicio) ===
+    a = archivo.asignaciones(incluir_archivados)
+    v = archivo.viajes(incluir_archivados)
+    inicio = func.coalesce(a.inicio_viaje, v.agendada_para)
+    filas_viajes = db.execute(
+        select(inicio, a.fin_viaje, models.Ruta.duracion_aproximada, a.id_conductor, a.id_vehiculo)
+        .join(v, a.id_viaje == v.id_viaje)
+        .join(models.Ruta, v.id_ruta == models.Ruta.id_ruta)
+        .where(
+            v.id_hotel == selected_hotel,
+            v.agendada_para >= fecha_desde - _MARGEN_VIAJES,
+            v.agendada_para < fecha_hasta,
+            v.id_estado_viaje.in_([2, 3, 4, 5])
         )
-        .group_by(func.date(models.Viaje.agendada_para))
-        .order_by(func.date(models.Viaje.agendada_para).asc())
+        .order_by(inicio)
+        .execution_options(yield_per=1000)
+    )
+    
+    def intervalos_viaje():
+        for ini, fin, duracion, id_c, id_v in filas_viajes:
+            if fin is None:
+                if not duracion:
+                    continue  # sin fin real ni duración estimada: no se puede ubicar
+                fin = ini + timedelta(minutes=duracion)
+            ini, fin = max(ini, fecha_desde), min(fin, fecha_hasta)
+            if fin > ini:
+                yield ini, fin, utilizacion.VIAJE, id_c, id_v
+    
+    # Las tenencias ya están en memoria; los viajes llegan del cursor. Ambos ordenados.
+    resultado = utilizacion.barrer(
+        heapq.merge(intervalos_tenencia, intervalos_viaje(), key=lambda i: i[0])
+    )
+    
+    patentes = dict(
+        db.query(models.Vehiculo.id_vehiculo, models.Vehiculo.patente)
+        .filter(models.Vehiculo.id_hotel == selected_hotel)
         .all()
     )
+    nombres = {
+        id_c: f"{nombre} {apellido or ''}".strip()
+        for id_c, nombre, apellido in (
+            db.query(
+                models.Conductor.id_conductor,
+                models.Usuario.nombre_usuario,
+                models.Usuario.apellido1_usuario
+            )
+            .join(models.Usuario, models.Conductor.id_usuario == models.Usuario.id_usuario)
+            .filter(models.Usuario.id_hotel == selected_hotel)
+            .all()
+        )
+    }
     
+    momento_max = resultado["momento_max"]
     return {
-        "datos": [
-            {"fecha": fecha.strftime("%Y-%m-%d"), "total": total}
-            for fecha, total in resultado
+        "periodo": {
+            "desde": fecha_desde.isoformat(),
+            "hasta": fecha_hasta.isoformat()
+        },
+        "flota": {
+            "max_viajes_simultaneos": resultado["max_viajes_simultaneos"],
+            "momento_max": momento_max.isoformat() if momento_max else None,
+            "max_vehiculos_en_turno": resultado["max_vehiculos_en_turno"]
+        },
+        "vehiculos": sorted(
+            (
+                {"id_vehiculo": id_v, "patente": patentes.get(id_v), **datos}
+                for id_v, datos in resultado["vehiculos"].items()
+            ),
+            key=lambda x: x["utilizacion_pct"],
+            reverse=True
+        ),
+        "conductores": sorted(
+            (
+                {"id_conductor": id_c, "nombre": nombres.get(id_c), **datos}
+                for id_c, datos in resultado["conductores"].items()
+            ),
+            key=lambda x: x["utilizacion_pct"],
+            reverse=True
+        )
+    }
+
+
+@router.get("/analitico", dependencies=[Depends(require_supervisor_or_admin)])
+def get_analitico(
+    agrupar: Optional[str] = Query(None, description="ruta | hora | dia_semana | conductor | estado"),
+    id_ruta: Optional[int] = Query(None),
+    id_conductor: Optional[int] = Query(None),
+    estado: Optional[int] = Query(None),
+    hora: Optional[int] = Query(None, ge=0, le=23),
+    dia_semana: Optional[int] = Query(None, ge=0, le=6, description="0 = lunes"),
+    fecha_desde: Optional[datetime] = Query(None),
+    fecha_hasta: Optional[datetime] = Query(None),
+    hotel_id: Optional[int] = Query(None, alias="hotelId"),
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Consultas ad-hoc (filtro + agrupación) sobre el almacén analítico en memoria,
+    sin competir con el tráfico de reservas en MySQL.
+    Requiere ALMACEN_ANALITICO=true. Admin debe pasar hotelId como query parameter.
+    """
+    if not almacen_viajes.habilitado():
+        raise HTTPException(404, "Almacén analítico deshabilitado")
+    if agrupar is not None and agrupar not in almacen_viajes.AGRUPACIONES:
+        raise HTTPException(400, f"agrupar debe ser uno de: {', '.join(almacen_viajes.AGRUPACIONES)}")
+    
+    selected_hotel = _hotel_seleccionado(db, claims, hotel_id)
+    almacen = almacen_viajes.obtener(db, selected_hotel)
+    
+    grupos = almacen.consultar(
+        agrupar=agrupar,
+        id_ruta=id_ruta,
+        id_conductor=id_conductor,
+        estado=estado,
+        hora=hora,
+        dia_semana=dia_semana,
+        desde=fecha_desde,
+        hasta=fecha_hasta
+    )
+    
+    return {
+        "agrupar": agrupar,
+        "viajes_en_memoria": len(almacen),
+        "bytes_en_memoria": almacen.bytes_usados(),
+        "grupos": [{"clave": clave, **datos} for clave, datos in grupos.items()]
+    }
+
+
+@router.get("/demanda", dependencies=[Depends(require_supervisor_or_admin)])
+def get_demanda(
+    id_ruta: Optional[int] = Query(None, description="Solo esta ruta (por defecto todo el hotel)"),
+    dias: int = Query(7, ge=1, le=14, description="Días a pronosticar"),
+    hotel_id: Optional[int] = Query(None, alias="hotelId"),
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Mapa de calor 7×24 de demanda histórica y pronóstico por hora para los
+    próximos días, frente a los conductores disponibles en cada hora según
+    sus calendarios (o los que están en turno, si nadie tiene calendario).
+    Admin debe pasar hotelId como query parameter.
+    """
+    selected_hotel = _hotel_seleccionado(db, claims, hotel_id)
+    
+    # === CONDUCTORES EN TURNO (turno abierto en turnos_conductor) ===
+    flota_hotel = flota.obtener(db, selected_hotel)
+    conductores_en_turno = sum(1 for c in flota_hotel.conductores.values() if c.en_turno)
+    
+    # Demanda y calendarios están en hora local del hotel
+    tz = zona_horaria.zona_de_hotel(db, selected_hotel)
+    hoy = zona_horaria.a_local(datetime.utcnow(), tz).date()
+    pronostico = demanda.pronostico(db, selected_hotel, id_ruta, dias, hoy)
+    
+    # === CONDUCTORES DISPONIBLES POR HORA según calendarios ===
+    ids = [c.id_conductor for c in flota_hotel.conductores.values() if c.id_tipo_usuario == 2]
+    cal = calendario.cargar(db, ids, hoy - timedelta(days=1), hoy + timedelta(days=dias + 1))
+    
+    for dia in pronostico:
+        if cal.ids:
+            medianoche = datetime.fromisoformat(dia["fecha"])
+            disponibles = []
+            for h in range(24):
+                inicio = medianoche + timedelta(hours=h)
+                disponibles.append(cal.disponibles(inicio, inicio + timedelta(hours=1)))
+        else:
+            # Sin calendarios: se usa la dotación en turno actual
+            disponibles = [conductores_en_turno] * 24
+        dia["conductores_disponibles"] = disponibles
+        dia["viajes_por_conductor"] = [
+            round(x / n, 2) if n else None
+            for x, n in zip(dia["por_hora"], disponibles)
         ]
+    
+    return {
+        "id_ruta": id_ruta,
+        "matriz": demanda.matriz(db, selected_hotel, id_ruta),
+        "pronostico": pronostico,
+        "conductores_en_turno": conductores_en_turno,
+        "conductores_con_calendario": len(cal.ids)
     }
 
 
+@router.post("/demanda/reconstruir", dependencies=[Depends(require_supervisor_or_admin)])
+def reconstruir_demanda(
+    hotel_id: Optional[int] = Query(None, alias="hotelId"),
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Recalcula la matriz semanal y la serie diaria de demanda desde viajes.
+    Admin debe pasar hotelId como query parameter.
+    """
+    selected_hotel = _hotel_seleccionado(db, claims, hotel_id)
+    demanda.reconstruir_demanda(db, selected_hotel)
+    db.commit()
+    return {"ok": True}
@@ -1,16 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List
-from .. import models, schemas
+from .. import models, schemas, catalogos
 from ..deps import get_db
 from ..auth_deps import get_current_claims, require_role
 
 router = APIRouter(prefix="/marcas-vehiculos", tags=["marcas-vehiculos"])
 
 @router.get("", response_model=List[schemas.MarcaVehiculoOut])
-def listar_marcas(db: Session = Depends(get_db)):
-    rows = db.query(models.MarcaVehiculo).order_by(models.MarcaVehiculo.nombre_marca_vehiculo.asc()).all()
-    return rows
+def listar_marcas(request: Request, db: Session = Depends(get_db)):
+    return catalogos.respuesta(request, db, "marcas")
 
 @router.post("", response_model=schemas.MarcaVehiculoOut, status_code=status.HTTP_201_CREATED,
              dependencies=[Depends(require_role(3))])  # supervisor o admin
@@ -21,7 +20,8 @@ def crear_marca(body: schemas.MarcaVehiculoCreateIn, db: Session = Depends(get_d
     if db.query(models.MarcaVehiculo).filter(models.MarcaVehiculo.nombre_marca_vehiculo == nombre).first():
         raise HTTPException(409, "La marca ya existe")
     m = models.MarcaVehiculo(nombre_marca_vehiculo=nombre)
-    db.add(m); db.commit(); db.refresh(m)
+    db.add(m); catalogos.registrar_cambio(db); db.commit()
+    catalogos.recargar(db); db.refresh(m)
     return m
 
 @router.put("/{id_marca}", response_model=schemas.MarcaVehiculoOut,
@@ -40,5 +40,6 @@ def actualizar_marca(id_marca: int, body: schemas.MarcaVehiculoUpdate, db: Sessi
                  .first())
         if dup: raise HTTPException(409, "Ya existe otra marca con ese nombre")
         m.nombre_marca_vehiculo = nuevo
-    db.commit(); db.refresh(m)
+        catalogos.registrar_cambio(db)
+    db.commit(); catalogos.recargar(db); db.refresh(m)
     return m
@@ -1,10 +1,11 @@
 # app/routers/notificaciones.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime, date, time as time_type
 
-from .. import models, schemas
+from .. import models, schemas, http_cache
 from ..deps import get_db
 from ..auth_deps import get_current_claims
 
@@ -13,6 +14,8 @@ router = APIRouter(prefix="/notificaciones", tags=["notificaciones"])
 
 @router.get("", response_model=List[schemas.NotificacionOut])
 def listar_notificaciones(
+    request: Request,
+    response: Response,
     solo_no_leidas: bool = False,
     db: Session = Depends(get_db),
     claims: dict = Depends(get_current_claims)
@@ -22,7 +25,24 @@ def listar_notificaciones(
     Opcionalmente solo las no leídas.
     """
     user_id = int(claims["sub"])
-    
+
+    # Se agregan, se marcan leídas o se borran: cantidad, último id y no
+    # leídas bastan como validador (una consulta sobre el índice por usuario)
+    n = models.Notificacion
+    sondeo = db.execute(
+        select(
+            func.count(),
+            func.max(n.id_notificacion),
+            func.count(case((n.id_estado_mensaje == 1, 1))),
+        ).where(n.id_usuario == user_id)
+    ).one()
+    no_modificado = http_cache.condicional(
+        request, response,
+        http_cache.etag("notificaciones", user_id, str(request.url.query), tuple(sondeo)),
+    )
+    if no_modificado is not None:
+        return no_modificado
+
     q = db.query(models.Notificacion).filter(
         models.Notificacion.id_usuario == user_id
     )
@@ -179,4 +199,21 @@ def notificar_viaje_aceptado(db: Session, viaje_id: int, usuario_id: int):
         id_estado_mensaje=1
     )
     db.add(notif)
-    db.commit()
\ No newline at end of file
+    db.commit()
+
+def agregar_notificaciones(db: Session, mensajes: List[tuple]):
+    """
+    Agrega varias notificaciones [(id_usuario, mensaje)] SIN hacer commit,
+    para que se confirmen junto con el cambio que las origina.
+    """
+    ahora = datetime.utcnow()
+    db.add_all([
+        models.Notificacion(
+            id_usuario=id_usuario,
+            contenido_notificacion=mensaje[:500],
+            hora_envio=ahora.time(),
+            fecha_envio=ahora.date(),
+            id_estado_mensaje=1
+        )
+        for id_usuario, mensaje in mensajes
+    ])
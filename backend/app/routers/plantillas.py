@@ -0,0 +1,247 @@
+# app/routers/plantillas.py
+from datetime import date, datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session, selectinload
+
+from .. import models, schemas, plantillas, almacen_viajes, zona_horaria
+from ..deps import get_db
+from ..auth_deps import get_current_claims, require_supervisor_or_admin
+
+router = APIRouter(
+    prefix="/plantillas",
+    tags=["plantillas"],
+    dependencies=[Depends(require_supervisor_or_admin)],
+)
+
+
+def _hotel_of_user(db: Session, claims: dict) -> int:
+    me = db.query(models.Usuario).get(int(claims["sub"]))
+    if not me or not me.id_hotel:
+        raise HTTPException(403, "Usuario sin hotel")
+    return me.id_hotel
+
+
+def _plantilla_del_hotel(db: Session, id_plantilla: int, hotel_id: int) -> models.PlantillaViaje:
+    p = db.query(models.PlantillaViaje).get(id_plantilla)
+    if not p:
+        raise HTTPException(404, "Plantilla no encontrada")
+    if p.id_hotel != hotel_id:
+        raise HTTPException(403, "Sin acceso a esta plantilla")
+    return p
+
+
+def _validar(db: Session, p: models.PlantillaViaje) -> None:
+    """Ruta y solicitante del hotel, y horario coherente."""
+    ruta = db.query(models.Ruta).get(p.id_ruta)
+    if not ruta or ruta.id_hotel != p.id_hotel:
+        raise HTTPException(404, "Ruta no válida para este hotel")
+    solicitante = db.query(models.Usuario).get(p.pedida_por_id_usuario)
+    if not solicitante or solicitante.id_hotel != p.id_hotel:
+        raise HTTPException(400, "Usuario solicitante no válido")
+    if p.pasajeros < 1:
+        raise HTTPException(400, "pasajeros debe ser al menos 1")
+    if p.cada_minutos and (p.hora_fin is None or p.hora_fin < p.hora_inicio):
+        raise HTTPException(400, "Con cada_minutos se requiere hora_fin posterior a hora_inicio")
+    if p.vigente_hasta and p.vigente_hasta < p.vigente_desde:
+        raise HTTPException(400, "vigente_hasta es anterior a vigente_desde")
+
+
+def _hoy(db: Session, id_hotel: int) -> date:
+    """Fecha de hoy en la zona horaria del hotel."""
+    return zona_horaria.a_local(datetime.utcnow(), zona_horaria.zona_de_hotel(db, id_hotel)).date()
+
+
+def _plantilla_out(p: models.PlantillaViaje, hoy: date) -> dict:
+    return {
+        "id_plantilla": p.id_plantilla,
+        "id_hotel": p.id_hotel,
+        "id_ruta": p.id_ruta,
+        "pedida_por_id_usuario": p.pedida_por_id_usuario,
+        "pasajeros": p.pasajeros,
+        "dias_semana": plantillas.bits_a_dias(p.dias_semana),
+        "hora_inicio": p.hora_inicio.strftime("%H:%M"),
+        "hora_fin": p.hora_fin.strftime("%H:%M") if p.hora_fin else None,
+        "cada_minutos": p.cada_minutos,
+        "vigente_desde": p.vigente_desde,
+        "vigente_hasta": p.vigente_hasta,
+        "activa": p.activa,
+        "generada_hasta": p.generada_hasta,
+        "salidas_por_dia": len(plantillas.horas_del_dia(p)),
+        "excepciones": [
+            {"fecha": e.fecha, "motivo": e.motivo}
+            for e in sorted(p.excepciones, key=lambda e: e.fecha)
+            if e.fecha >= hoy
+        ],
+    }
+
+
+def _expandir_y_confirmar(db: Session, p: models.PlantillaViaje) -> int:
+    viajes = plantillas.expandir(db, p.id_plantilla)
+    db.commit()
+    for viaje in viajes:
+        almacen_viajes.registrar(viaje)
+    return len(viajes)
+
+
+@router.get("")
+def listar_plantillas(
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """Plantillas de viajes recurrentes del hotel."""
+    hotel_id = _hotel_of_user(db, claims)
+    lista = (
+        db.query(models.PlantillaViaje)
+        .options(selectinload(models.PlantillaViaje.excepciones))
+        .filter(models.PlantillaViaje.id_hotel == hotel_id)
+        .order_by(models.PlantillaViaje.id_plantilla)
+        .all()
+    )
+    hoy = _hoy(db, hotel_id)
+    return [_plantilla_out(p, hoy) for p in lista]
+
+
+@router.post("", status_code=status.HTTP_201_CREATED)
+def crear_plantilla(
+    body: schemas.PlantillaIn,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Crea un viaje recurrente. Solo se generan (y asignan) los viajes dentro
+    del horizonte; el resto se crea a medida que el horizonte avanza.
+    """
+    hotel_id = _hotel_of_user(db, claims)
+    p = models.PlantillaViaje(
+        id_hotel=hotel_id,
+        id_ruta=body.id_ruta,
+        pedida_por_id_usuario=body.pedida_por_id_usuario or int(claims["sub"]),
+        pasajeros=body.pasajeros,
+        dias_semana=plantillas.dias_a_bits(body.dias_semana),
+        hora_inicio=body.hora_inicio,
+        hora_fin=body.hora_fin,
+        cada_minutos=body.cada_minutos,
+        vigente_desde=body.vigente_desde or _hoy(db, hotel_id),
+        vigente_hasta=body.vigente_hasta,
+        activa=True,
+        creada_en=datetime.utcnow(),
+    )
+    _validar(db, p)
+    db.add(p)
+    db.flush()
+
+    generados = _expandir_y_confirmar(db, p)
+    db.refresh(p)
+    return {**_plantilla_out(p, _hoy(db, hotel_id)), "viajes_generados": generados}
+
+
+@router.put("/{id_plantilla}")
+def actualizar_plantilla(
+    id_plantilla: int,
+    body: schemas.PlantillaUpdate,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Edita la plantilla. Sus viajes futuros que aún no empiezan se cancelan y
+    se vuelven a generar con el horario nuevo.
+    """
+    hotel_id = _hotel_of_user(db, claims)
+    p = _plantilla_del_hotel(db, id_plantilla, hotel_id)
+
+    data = body.model_dump(exclude_unset=True)
+    if "dias_semana" in data:
+        data["dias_semana"] = plantillas.dias_a_bits(data["dias_semana"])
+    for k, v in data.items():
+        setattr(p, k, v)
+    _validar(db, p)
+
+    cancelados = plantillas.cancelar_futuros(db, p, motivo="cambio de horario")
+    p.generada_hasta = None
+    generados = _expandir_y_confirmar(db, p)
+    db.refresh(p)
+    return {
+        **_plantilla_out(p, _hoy(db, hotel_id)),
+        "viajes_cancelados": cancelados,
+        "viajes_generados": generados,
+    }
+
+
+@router.delete("/{id_plantilla}")
+def desactivar_plantilla(
+    id_plantilla: int,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """Desactiva la plantilla y cancela sus viajes futuros que aún no empiezan."""
+    hotel_id = _hotel_of_user(db, claims)
+    p = _plantilla_del_hotel(db, id_plantilla, hotel_id)
+
+    p.activa = False
+    cancelados = plantillas.cancelar_futuros(db, p, motivo="servicio suspendido")
+    db.commit()
+    return {"ok": True, "viajes_cancelados": cancelados}
+
+
+@router.get("/{id_plantilla}/proximas")
+def proximas_salidas(
+    id_plantilla: int,
+    dias: int = Query(7, ge=1, le=60),
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """Salidas de los próximos días según la plantilla (no crea viajes)."""
+    hotel_id = _hotel_of_user(db, claims)
+    p = _plantilla_del_hotel(db, id_plantilla, hotel_id)
+    return {"id_plantilla": p.id_plantilla, "salidas": plantillas.proximas(db, p, dias)}
+
+
+@router.post("/{id_plantilla}/excepciones", status_code=status.HTTP_201_CREATED)
+def agregar_excepcion(
+    id_plantilla: int,
+    body: schemas.ExcepcionPlantillaIn,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """No genera viajes en esa fecha (hora local); cancela los ya generados."""
+    hotel_id = _hotel_of_user(db, claims)
+    p = _plantilla_del_hotel(db, id_plantilla, hotel_id)
+
+    existe = db.query(models.ExcepcionPlantilla).filter(
+        models.ExcepcionPlantilla.id_plantilla == id_plantilla,
+        models.ExcepcionPlantilla.fecha == body.fecha
+    ).first()
+    if existe:
+        raise HTTPException(409, "Ya existe una excepción para esa fecha")
+
+    db.add(models.ExcepcionPlantilla(id_plantilla=id_plantilla, fecha=body.fecha, motivo=body.motivo))
+    cancelados = plantillas.cancelar_futuros(db, p, fecha=body.fecha, motivo=body.motivo or "")
+    db.commit()
+    return {"ok": True, "viajes_cancelados": cancelados}
+
+
+@router.delete("/{id_plantilla}/excepciones/{fecha}")
+def eliminar_excepcion(
+    id_plantilla: int,
+    fecha: date,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """Quita la excepción; si la fecha cae en el horizonte, sus viajes se generan ahora."""
+    hotel_id = _hotel_of_user(db, claims)
+    p = _plantilla_del_hotel(db, id_plantilla, hotel_id)
+
+    exc = db.query(models.ExcepcionPlantilla).filter(
+        models.ExcepcionPlantilla.id_plantilla == id_plantilla,
+        models.ExcepcionPlantilla.fecha == fecha
+    ).first()
+    if not exc:
+        raise HTTPException(404, "Excepción no encontrada")
+
+    db.delete(exc)
+    db.flush()
+    # Volver a recorrer el horizonte: los horarios ya existentes se saltan
+    p.generada_hasta = None
+    generados = _expandir_y_confirmar(db, p)
+    return {"ok": True, "viajes_generados": generados}
@@ -0,0 +1,137 @@
+# app/routers/posiciones.py
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from .. import models, schemas, flota, posiciones
+from ..database import SessionLocal
+from ..deps import get_db
+from ..auth_deps import get_current_claims, require_role, require_supervisor_or_admin
+from ..security import verify_token
+
+router = APIRouter(prefix="/posiciones", tags=["posiciones"])
+
+# Cada cuánto el WebSocket vuelve a consultar qué vehículo tiene el conductor
+_REVISAR_VEHICULO_SEGUNDOS = 60
+
+
+def _vehiculo_del_conductor(db: Session, user_id: int):
+    """(id_hotel, id_vehiculo) del conductor según el registro de flota."""
+    conductor = flota.conductor_de_usuario(db, user_id)
+    if not conductor:
+        raise HTTPException(404, "No eres conductor")
+    if conductor.id_vehiculo is None:
+        raise HTTPException(409, "No tienes vehículo asignado")
+    return flota.hotel_de_usuario(user_id), conductor.id_vehiculo
+
+
+def _puntos(entrada: schemas.PosicionesIn):
+    return [
+        (posiciones.epoch(p.registrada_en), p.latitud, p.longitud, p.velocidad_kmh, p.rumbo)
+        for p in entrada.puntos
+    ]
+
+
+@router.post("", dependencies=[Depends(require_role(2))])
+def registrar_posiciones(
+    body: schemas.PosicionesIn,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    El conductor envía un lote de posiciones del vehículo que tiene asignado.
+    Quedan en memoria; se guardan muestreadas en segundo plano.
+    """
+    id_hotel, id_vehiculo = _vehiculo_del_conductor(db, int(claims["sub"]))
+    recibidos = posiciones.registrar(id_hotel, id_vehiculo, _puntos(body))
+    return {"ok": True, "recibidos": recibidos}
+
+
+def _resolver_vehiculo(user_id: int):
+    db = SessionLocal()
+    try:
+        return _vehiculo_del_conductor(db, user_id)
+    finally:
+        db.close()
+
+
+@router.websocket("/ws")
+async def posiciones_ws(websocket: WebSocket, token: str = Query(...)):
+    """
+    Canal continuo para el conductor (token JWT en ?token=).
+    Cada mensaje: {"puntos": [...]} o un solo punto; responde {"recibidos": n}.
+    """
+    try:
+        claims = verify_token(token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    if int(claims.get("role", 0) or 0) != 2:
+        await websocket.close(code=1008)
+        return
+
+    user_id = int(claims["sub"])
+    try:
+        id_hotel, id_vehiculo = await run_in_threadpool(_resolver_vehiculo, user_id)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    revisado = time.monotonic()
+
+    await websocket.accept()
+    try:
+        while True:
+            datos = await websocket.receive_json()
+            try:
+                entrada = schemas.PosicionesIn.model_validate(
+                    datos if isinstance(datos, dict) and "puntos" in datos else {"puntos": [datos]}
+                )
+            except ValidationError as e:
+                await websocket.send_json({"error": e.errors(include_url=False)})
+                continue
+
+            if time.monotonic() - revisado > _REVISAR_VEHICULO_SEGUNDOS:
+                try:
+                    id_hotel, id_vehiculo = await run_in_threadpool(_resolver_vehiculo, user_id)
+                except HTTPException as e:
+                    await websocket.close(code=1008, reason=str(e.detail))
+                    return
+                revisado = time.monotonic()
+
+            recibidos = posiciones.registrar(id_hotel, id_vehiculo, _puntos(entrada))
+            await websocket.send_json({"recibidos": recibidos})
+    except WebSocketDisconnect:
+        pass
+
+
+@router.get("/ultimas", dependencies=[Depends(require_supervisor_or_admin)])
+def ultimas_posiciones(
+    hotel_id: Optional[int] = Query(None, alias="hotelId"),
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Última posición de cada vehículo del hotel (desde memoria, sin consultar posiciones).
+    Admin debe pasar hotelId como query parameter.
+    """
+    role = int(claims.get("role", 0))
+    if role == 4:  # Admin
+        if not hotel_id:
+            raise HTTPException(400, "Admin debe especificar hotelId")
+        selected_hotel = hotel_id
+    else:  # Supervisor
+        me = db.query(models.Usuario).get(int(claims["sub"]))
+        if not me or not me.id_hotel:
+            raise HTTPException(403, "Usuario sin hotel")
+        selected_hotel = me.id_hotel
+
+    vehiculos = flota.obtener(db, selected_hotel).vehiculos
+    resultado = posiciones.ultimas(selected_hotel)
+    for r in resultado:
+        v = vehiculos.get(r["id_vehiculo"])
+        r["patente"] = v.patente if v else None
+    return resultado
@@ -1,9 +1,9 @@
 # app/routers/rutas.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 
-from .. import models, schemas
+from .. import models, schemas, duraciones, versiones, http_cache
 from ..deps import get_db
 from ..auth_deps import get_current_claims, require_any_role, require_role
 
@@ -17,24 +17,40 @@ def _hotel_of_user(db: Session, claims: dict) -> int:
         raise HTTPException(403, "Usuario sin hotel")
     return me.id_hotel
 
+
+def _ruta_out(ruta: models.Ruta) -> schemas.RutaOut:
+    """RutaOut con la duración aprendida (promedio de todas las horas) junto a la estática."""
+    out = schemas.RutaOut.model_validate(ruta)
+    aprendida = duraciones.aprendida(ruta.id_ruta)
+    out.duracion_aprendida = round(aprendida, 1) if aprendida is not None else None
+    return out
+
 @router.get(
     "",
     response_model=List[schemas.RutaOut],
     dependencies=[Depends(require_any_role([1, 2, 3, 4]))],
 )
 def listar_rutas(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     claims: dict = Depends(get_current_claims)
 ):
 
     hotel_id = _hotel_of_user(db, claims)
-    return (
+    # Las rutas llevan la duración aprendida: guardarla sube la versión "rutas"
+    no_modificado = http_cache.validar(request, response, db, hotel_id, ("rutas",))
+    if no_modificado is not None:
+        return no_modificado
+    duraciones.sincronizar(db, hotel_id)
+    rutas = (
         db.query(models.Ruta)
         .filter(models.Ruta.id_hotel == hotel_id)
         .filter(models.Ruta.id_estado_actividad == 1)
         .order_by(models.Ruta.nombre_ruta.asc())
         .all()
     )
+    return [_ruta_out(r) for r in rutas]
 
 
 @router.get("/{id_ruta}", response_model=schemas.RutaOut, dependencies=[Depends(require_role(3))])
@@ -55,7 +71,37 @@ def obtener_ruta(
     if ruta.id_hotel != hotel_id:
         raise HTTPException(403, "Sin acceso a esta ruta")
     
-    return ruta
+    duraciones.sincronizar(db, hotel_id)
+    return _ruta_out(ruta)
+
+
+@router.get("/{id_ruta}/duraciones", dependencies=[Depends(require_role(3))])
+def duraciones_ruta(
+    id_ruta: int,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Duración real aprendida de la ruta por hora local de inicio (EWMA de los
+    viajes finalizados), junto a la duración aproximada cargada a mano.
+    """
+    hotel_id = _hotel_of_user(db, claims)
+    ruta = db.query(models.Ruta).get(id_ruta)
+
+    if not ruta:
+        raise HTTPException(404, "Ruta no encontrada")
+    if ruta.id_hotel != hotel_id:
+        raise HTTPException(403, "Sin acceso a esta ruta")
+
+    duraciones.sincronizar(db, hotel_id)
+    aprendida = duraciones.aprendida(id_ruta)
+    return {
+        "id_ruta": id_ruta,
+        "duracion_aproximada": ruta.duracion_aproximada,
+        "duracion_aprendida": round(aprendida, 1) if aprendida is not None else None,
+        "minimo_muestras": duraciones.MIN_MUESTRAS,
+        "por_hora": duraciones.por_hora(id_ruta),
+    }
 
 
 @router.post("", response_model=schemas.RutaOut, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_role(3))])
@@ -91,6 +137,7 @@ def crear_ruta(
         id_estado_actividad=body.id_estado_actividad,
     )
     db.add(r)
+    versiones.incrementar(db, hotel_id, "rutas")
     db.commit()
     db.refresh(r)
     return r
@@ -132,9 +179,10 @@ def actualizar_ruta(
     for k, v in data.items():
         setattr(ruta, k, v)
     
+    versiones.incrementar(db, hotel_id, "rutas")
     db.commit()
     db.refresh(ruta)
-    return ruta
+    return _ruta_out(ruta)
 
 
 @router.delete("/{id_ruta}", dependencies=[Depends(require_role(3))])
@@ -162,6 +210,7 @@ def eliminar_ruta(
     
     try:
         db.delete(ruta)
+        versiones.incrementar(db, hotel_id, "rutas")
         db.commit()
         return {"ok": True}
     except Exception:
@@ -1,12 +1,12 @@
 # app/routers/usuarios.py - CORRECCIÓN BACKEND
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from typing import Optional
 from datetime import datetime
 
-from .. import models, schemas
+from .. import models, schemas, flota, turnos, reasignacion, catalogos, versiones, http_cache, serializacion
 from ..deps import get_db
 from ..auth_deps import get_current_claims, require_role
 from ..security import get_password_hash  
@@ -80,6 +80,7 @@ def crear_usuario(
 
     db.add(user)
     try:
+        versiones.incrementar(db, hotel_id, "usuarios")
         db.commit()
         db.refresh(user)
     except IntegrityError:
@@ -95,6 +96,8 @@ def crear_usuario(
 @router.get("/mios", response_model=list[schemas.UsuarioListOut])
 @router.get("/de-mi-hotel", response_model=list[schemas.UsuarioListOut])
 def listar_usuarios_mios(
+    request: Request,
+    response: Response,
     hotelId: Optional[int] = Query(None, alias="hotelId"),
     db: Session = Depends(get_db),
     claims: dict = Depends(get_current_claims),
@@ -103,6 +106,7 @@ def listar_usuarios_mios(
     Lista usuarios según el rol:
     - Admin: conductores y supervisores del hotel especificado
     - Supervisor: SOLO huéspedes de su hotel
+    Con ?format=columnar responde {"columns": [...], "rows": [[...], ...]}.
     """
     me = db.query(models.Usuario).get(int(claims.get("sub", 0) or 0))
     role = int(claims.get("role", 0) or 0)
@@ -122,11 +126,20 @@ def listar_usuarios_mios(
     else:
         raise HTTPException(status_code=403, detail="Sin permisos")
 
-    return _build_listado(db, selected, tipo_filter)
+    # Usuarios y turnos (estos suben la versión de flota)
+    no_modificado = http_cache.validar(request, response, db, selected, ("usuarios", "flota"), role)
+    if no_modificado is not None:
+        return no_modificado
+
+    # Dicts ya armados: se serializan directo, sin validarlos contra UsuarioListOut
+    return serializacion.tabla(request, response, _CAMPOS_LISTADO, _build_listado(db, selected, tipo_filter))
+
+
+_CAMPOS_LISTADO = tuple(schemas.UsuarioListOut.model_fields)
 
 
 def _build_listado(db: Session, selected_hotel: int, tipo_filter: list):
-    """Construye el listado de usuarios filtrado por tipo."""
+    """Construye el listado de usuarios filtrado por tipo (campos en el orden de UsuarioListOut)."""
     name_expr = func.trim(
         func.concat(
             models.Usuario.nombre_usuario, ' ',
@@ -144,40 +157,49 @@ def _build_listado(db: Session, selected_hotel: int, tipo_filter: list):
             models.Usuario.correo_usuario,
             models.Usuario.telefono_usuario,
             models.Usuario.id_tipo_usuario,
-            models.TipoUsuario.nombre_tipo_usuario.label("tipo_usuario_nombre"),
             models.Usuario.id_estado_actividad,
             models.Usuario.is_suspended,
             models.Usuario.suspended_at,
             models.Usuario.suspended_reason,
             name_expr,
         )
-        .join(models.TipoUsuario, models.Usuario.id_tipo_usuario == models.TipoUsuario.id_tipo_usuario)
         .filter(models.Usuario.id_hotel == selected_hotel)
         .filter(models.Usuario.id_tipo_usuario.in_(tipo_filter))
         .order_by(name_expr.asc())
         .all()
     )
 
+    # Último turno de cada conductor listado (una consulta)
+    conductores = flota.obtener(db, selected_hotel).por_usuario
+    ids_conductor = [conductores[r.id_usuario].id_conductor for r in rows if r.id_usuario in conductores]
+    ultimos = turnos.ultimos(db, ids_conductor)
+    tipos = catalogos.obtener(db).tipos_usuario
+
+    def _turno(id_usuario):
+        c = conductores.get(id_usuario)
+        return ultimos.get(c.id_conductor, (None, None)) if c else (None, None)
+
     return [
         dict(
             id_usuario=r.id_usuario,
             nombre_usuario=r.nombre_completo,
             correo_usuario=r.correo_usuario,
-            telefono_usuario=r.telefono_usuario,
             id_tipo_usuario=r.id_tipo_usuario,
-            tipo_usuario_nombre=r.tipo_usuario_nombre,
+            tipo_usuario_nombre=tipos.get(r.id_tipo_usuario, ""),
             id_estado_actividad=r.id_estado_actividad,
             disponible=(r.id_estado_actividad == 1) and (not bool(r.is_suspended)),
-            inicio_turno=None,
-            fin_turno=None,
+            inicio_turno=turno[0],
+            fin_turno=turno[1],
             is_suspended=bool(r.is_suspended),
             suspended_at=r.suspended_at,
             suspended_reason=r.suspended_reason,
             # Campos separados para edición
             apellido1_usuario=r.apellido1_usuario,
             apellido2_usuario=r.apellido2_usuario,
+            telefono_usuario=r.telefono_usuario,
         )
         for r in rows
+        for turno in (_turno(r.id_usuario),)
     ]
 
 
@@ -202,7 +224,9 @@ def actualizar_usuario(
         else:
             setattr(user, field, value)
 
+    flota.registrar_cambio(db, user.id_hotel, "usuarios")
     db.commit()
+    flota.invalidar(user.id_hotel)
     db.refresh(user)
 
     # Construir nombre completo para respuesta
@@ -212,14 +236,13 @@ def actualizar_usuario(
         user.apellido2_usuario
     ])).strip()
 
-    tipo = db.query(models.TipoUsuario).get(user.id_tipo_usuario)
     return schemas.UsuarioListOut(
         id_usuario=user.id_usuario,
         nombre_usuario=nombre_completo,
         correo_usuario=user.correo_usuario,
         telefono_usuario=user.telefono_usuario,
         id_tipo_usuario=user.id_tipo_usuario,
-        tipo_usuario_nombre=tipo.nombre_tipo_usuario if tipo else "",
+        tipo_usuario_nombre=catalogos.obtener(db).tipos_usuario.get(user.id_tipo_usuario, ""),
         id_estado_actividad=user.id_estado_actividad,
         disponible=(user.id_estado_actividad == 1) and not bool(getattr(user, "is_suspended", False)),
         inicio_turno=None,
@@ -254,8 +277,19 @@ def suspender_usuario(
     user.suspended_reason = body.motivo
     user.suspended_by = admin.id_usuario if admin else None
 
+    # Sus viajes futuros pasan a otros conductores en la misma transacción
+    conductor = flota.obtener(db, user.id_hotel).por_usuario.get(user.id_usuario) if user.id_hotel else None
+    resultado = reasignacion.reasignar(
+        db, user.id_hotel,
+        conductores=[conductor.id_conductor] if conductor else [],
+        motivo="conductor suspendido",
+    )
+
+    flota.registrar_cambio(db, user.id_hotel, "usuarios")
     db.commit()
-    return {"ok": True}
+    flota.invalidar(user.id_hotel)
+    reasignacion.despues_del_commit(resultado)
+    return {"ok": True, **reasignacion.resumen(resultado)}
 
 
 @router.patch("/{id_usuario}/reactivar", dependencies=[Depends(require_role(4))])
@@ -275,7 +309,9 @@ def reactivar_usuario(
     user.suspended_by = None
     user.id_estado_actividad = 1
 
+    flota.registrar_cambio(db, user.id_hotel, "usuarios")
     db.commit()
+    flota.invalidar(user.id_hotel)
     return {"ok": True}
 
 
@@ -299,7 +335,9 @@ def eliminar_usuario(
 
     try:
         db.delete(user)
+        flota.registrar_cambio(db, user.id_hotel, "usuarios")
         db.commit()
+        flota.invalidar(user.id_hotel)
         return {"ok": True}
     except IntegrityError:
         db.rollback()
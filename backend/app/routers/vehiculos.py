@@ -1,9 +1,10 @@
 # app/routers/vehiculos.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 
-from .. import models, schemas
+from .. import models, schemas, flota, despacho, reasignacion, catalogos, http_cache, serializacion
 from ..deps import get_db
 from ..auth_deps import get_current_claims, require_role
 
@@ -18,8 +19,25 @@ def _hotel_of_user(db: Session, claims: dict) -> int:
     return me.id_hotel
 
 
+def _vehiculo_out(v: models.Vehiculo, cat: catalogos.Catalogos) -> schemas.VehiculoOut:
+    return schemas.VehiculoOut(
+        id_vehiculo=v.id_vehiculo,
+        id_hotel=v.id_hotel,
+        patente=v.patente,
+        id_marca_vehiculo=v.id_marca_vehiculo,
+        modelo=v.modelo,
+        anio=v.anio,
+        capacidad=v.capacidad,
+        id_estado_vehiculo=v.id_estado_vehiculo,
+        marca_nombre=cat.marcas.get(v.id_marca_vehiculo),
+        estado_nombre=cat.estados_vehiculo.get(v.id_estado_vehiculo)
+    )
+
+
 @router.get("", response_model=List[schemas.VehiculoOut], dependencies=[Depends(require_role(3))])
 def listar_vehiculos(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     claims: dict = Depends(get_current_claims)
 ):
@@ -28,35 +46,23 @@ def listar_vehiculos(
     Requiere rol mínimo: Supervisor (3) o Admin (4).
     """
     hotel_id = _hotel_of_user(db, claims)
-    
-    q = (
-        db.query(
-            models.Vehiculo,
-            models.MarcaVehiculo.nombre_marca_vehiculo.label("marca_nombre"),
-            models.EstadoVehiculo.nombre_estado_vehiculo.label("estado_nombre")
-        )
-        .join(models.MarcaVehiculo, models.Vehiculo.id_marca_vehiculo == models.MarcaVehiculo.id_marca_vehiculo)
-        .join(models.EstadoVehiculo, models.Vehiculo.id_estado_vehiculo == models.EstadoVehiculo.id_estado_vehiculo)
-        .filter(models.Vehiculo.id_hotel == hotel_id)
-        .order_by(models.Vehiculo.patente.asc())
-    )
-    rows = q.all()
-
-    out = []
-    for v, marca_nombre, estado_nombre in rows:
-        out.append(schemas.VehiculoOut(
-            id_vehiculo=v.id_vehiculo,
-            id_hotel=v.id_hotel,
-            patente=v.patente,
-            id_marca_vehiculo=v.id_marca_vehiculo,
-            modelo=v.modelo,
-            anio=v.anio,
-            capacidad=v.capacidad,
-            id_estado_vehiculo=v.id_estado_vehiculo,
-            marca_nombre=marca_nombre,
-            estado_nombre=estado_nombre
-        ))
-    return out
+    no_modificado = http_cache.validar(request, response, db, hotel_id, ("vehiculos", "flota"))
+    if no_modificado is not None:
+        return no_modificado
+
+    v = models.Vehiculo
+    filas = serializacion.filas(db.execute(
+        select(*serializacion.columnas(v, schemas.VehiculoOut))
+        .where(v.id_hotel == hotel_id)
+        .order_by(v.patente.asc())
+    ))
+
+    # Nombres de marca y estado desde los catálogos en memoria (sin joins)
+    cat = catalogos.obtener(db)
+    for f in filas:
+        f["marca_nombre"] = cat.marcas.get(f["id_marca_vehiculo"])
+        f["estado_nombre"] = cat.estados_vehiculo.get(f["id_estado_vehiculo"])
+    return serializacion.respuesta(response, filas)
 
 
 @router.post("", response_model=schemas.VehiculoOut, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_role(3))])
@@ -73,9 +79,9 @@ def crear_vehiculo(
     # Validaciones
     if db.query(models.Vehiculo).filter(models.Vehiculo.patente == body.patente).first():
         raise HTTPException(409, "Patente ya registrada")
-    if not db.query(models.MarcaVehiculo).get(body.id_marca_vehiculo):
+    if not catalogos.contiene(db, "marcas", body.id_marca_vehiculo):
         raise HTTPException(400, "Marca inválida")
-    if not db.query(models.EstadoVehiculo).get(body.id_estado_vehiculo):
+    if not catalogos.contiene(db, "estados_vehiculo", body.id_estado_vehiculo):
         raise HTTPException(400, "Estado inválido")
 
     v = models.Vehiculo(
@@ -88,17 +94,13 @@ def crear_vehiculo(
         id_estado_vehiculo=body.id_estado_vehiculo
     )
     db.add(v)
+    flota.registrar_cambio(db, hotel_id, "vehiculos")
     db.commit()
+    flota.invalidar(hotel_id)
     db.refresh(v)
     
     # Devolver con nombres resueltos
-    marca = db.query(models.MarcaVehiculo).get(v.id_marca_vehiculo)
-    est = db.query(models.EstadoVehiculo).get(v.id_estado_vehiculo)
-    return schemas.VehiculoOut(
-        **v.__dict__,
-        marca_nombre=marca.nombre_marca_vehiculo if marca else None,
-        estado_nombre=est.nombre_estado_vehiculo if est else None
-    )
+    return _vehiculo_out(v, catalogos.obtener(db))
 
 
 @router.put("/{id_vehiculo}", response_model=schemas.VehiculoOut, dependencies=[Depends(require_role(3))])
@@ -132,26 +134,30 @@ def actualizar_vehiculo(
             raise HTTPException(409, "Patente duplicada")
 
     if "id_marca_vehiculo" in data and data["id_marca_vehiculo"]:
-        if not db.query(models.MarcaVehiculo).get(data["id_marca_vehiculo"]):
+        if not catalogos.contiene(db, "marcas", data["id_marca_vehiculo"]):
             raise HTTPException(400, "Marca inválida")
 
     if "id_estado_vehiculo" in data and data["id_estado_vehiculo"]:
-        if not db.query(models.EstadoVehiculo).get(data["id_estado_vehiculo"]):
+        if not catalogos.contiene(db, "estados_vehiculo", data["id_estado_vehiculo"]):
             raise HTTPException(400, "Estado inválido")
 
     for k, val in data.items():
         setattr(v, k, val)
     
+    # Vehículo fuera de servicio: sus viajes futuros se reasignan
+    dado_de_baja = data.get("id_estado_vehiculo") not in (None, despacho.VEHICULO_ACTIVO)
+    resultado = reasignacion.reasignar(
+        db, hotel_id,
+        vehiculos=[id_vehiculo] if dado_de_baja else [],
+        motivo="vehículo fuera de servicio",
+    )
+    
+    flota.registrar_cambio(db, hotel_id, "vehiculos")
     db.commit()
+    flota.invalidar(hotel_id)
+    reasignacion.despues_del_commit(resultado)
     db.refresh(v)
-
-    marca = db.query(models.MarcaVehiculo).get(v.id_marca_vehiculo)
-    est = db.query(models.EstadoVehiculo).get(v.id_estado_vehiculo)
-    return schemas.VehiculoOut(
-        **v.__dict__,
-        marca_nombre=marca.nombre_marca_vehiculo if marca else None,
-        estado_nombre=est.nombre_estado_vehiculo if est else None
-    )
+    return _vehiculo_out(v, catalogos.obtener(db))
 
 
 @router.delete("/{id_vehiculo}", dependencies=[Depends(require_role(3))])
@@ -170,7 +176,9 @@ def eliminar_vehiculo(
 
     try:
         db.delete(v)
+        flota.registrar_cambio(db, hotel_id, "vehiculos")
         db.commit()
+        flota.invalidar(hotel_id)
         return {"ok": True}
     except Exception:
         db.rollback()
@@ -182,10 +190,9 @@ def eliminar_vehiculo(
 # ===========================
 
 @router.get("/marcas", response_model=List[schemas.MarcaVehiculoOut])
-def listar_marcas(db: Session = Depends(get_db)):
-    """Lista todas las marcas de vehículos disponibles."""
-    rows = db.query(models.MarcaVehiculo).order_by(models.MarcaVehiculo.nombre_marca_vehiculo.asc()).all()
-    return rows
+def listar_marcas(request: Request, db: Session = Depends(get_db)):
+    """Lista todas las marcas de vehículos disponibles (desde memoria, con ETag)."""
+    return catalogos.respuesta(request, db, "marcas")
 
 
 @router.post("/marcas", response_model=schemas.MarcaVehiculoOut, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_role(3))])
@@ -202,7 +209,9 @@ def crear_marca(
     
     m = models.MarcaVehiculo(nombre_marca_vehiculo=nombre)
     db.add(m)
+    catalogos.registrar_cambio(db)
     db.commit()
+    catalogos.recargar(db)
     db.refresh(m)
     return m
 
@@ -234,7 +243,9 @@ def actualizar_marca(
         if dup:
             raise HTTPException(409, "Ya existe otra marca con ese nombre")
         m.nombre_marca_vehiculo = nuevo
+        catalogos.registrar_cambio(db)
     
     db.commit()
+    catalogos.recargar(db)
     db.refresh(m)
     return m
\ No newline at end of file
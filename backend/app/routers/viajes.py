@@ -1,11 +1,12 @@
 # app/routers/viajes.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, insert, select
 from typing import List, Optional
 from datetime import datetime
+from uuid import uuid4
 
-from .. import models, schemas
+from .. import models, schemas, metricas_conductor, almacen_viajes, demanda, despacho, eta, flota, duraciones, catalogos, versiones, http_cache, serializacion
 from ..deps import get_db
 from ..auth_deps import get_current_claims, require_role
 from random import choice
@@ -56,11 +57,13 @@ def crear_viaje(
         pedida_por_id_usuario=pedida_por,
         hora_pedida=datetime.utcnow(),
         agendada_para=body.agendada_para,
-        id_estado_viaje=1  # 1 = PENDIENTE
+        id_estado_viaje=1,  # 1 = PENDIENTE
+        pasajeros=body.pasajeros
     )
     
     db.add(viaje)
     db.flush()  # Para obtener el id_viaje
+    demanda.registrar_viaje(db, viaje)
     
     # ✅ AUTO-ASIGNACIÓN: Buscar conductor disponible
     try:
@@ -75,82 +78,157 @@ def crear_viaje(
         # Si falla la auto-asignación, el viaje queda PENDIENTE
         print(f"⚠️ Auto-asignación falló: {e}")
     
+    versiones.incrementar(db, hotel_id, "viajes")
     db.commit()
     db.refresh(viaje)
+    almacen_viajes.registrar(viaje)
     return viaje
 
 
 def _auto_asignar_viaje(db: Session, viaje: models.Viaje, hotel_id: int) -> dict | None:
     """Asigna automáticamente un conductor y vehículo disponibles al viaje."""
+    despachador = despacho.Despachador(db, hotel_id, [viaje])
     
-    # ✅ Simplificar la consulta - no exigir disponibilidad por ahora
-    conductores_con_vehiculo = (
-        db.query(
-            models.Conductor.id_conductor,
-            models.Usuario.id_usuario,
-            models.ConductorVehiculo.id_vehiculo,
-            models.Usuario.nombre_usuario,
-            models.Usuario.apellido1_usuario,
-            models.Vehiculo.patente
-        )
-        .join(models.Conductor, models.Usuario.id_usuario == models.Conductor.id_usuario)
-        .join(
-            models.ConductorVehiculo, 
-            models.Conductor.id_conductor == models.ConductorVehiculo.id_conductor
-        )
-        .join(models.Vehiculo, models.ConductorVehiculo.id_vehiculo == models.Vehiculo.id_vehiculo)
-        .filter(
-            models.Usuario.id_hotel == hotel_id,
-            models.Usuario.id_tipo_usuario == 2,
-            models.Usuario.id_estado_actividad == 1,
-            models.Usuario.is_suspended == False,
-            models.ConductorVehiculo.hora_fin_asignacion.is_(None)
-        )
-        .all()
-    )
-    
-    if not conductores_con_vehiculo:
+    if not despachador.candidatos:
         print(f"⚠️ No hay conductores con vehículo asignado")
         return None
     
-    # Verificar conflictos
-    for conductor_id, usuario_id, id_vehiculo, nombre, apellido, patente in conductores_con_vehiculo:
-        conflicto = (
-            db.query(models.AsignacionViajes)
-            .join(models.Viaje, models.AsignacionViajes.id_viaje == models.Viaje.id_viaje)
-            .filter(
-                models.AsignacionViajes.id_conductor == conductor_id,
-                models.Viaje.agendada_para == viaje.agendada_para,
-                models.Viaje.id_estado_viaje.in_([2, 3, 4])
-            )
-            .first()
+    info = despachador.asignar(viaje)
+    if info:
+        print(f"✅ Viaje {viaje.id_viaje} asignado a {info['conductor_nombre']}")
+    else:
+        print(f"⚠️ No hay conductores libres para el horario")
+    return info
+
+
+@router.post("/bulk", status_code=status.HTTP_201_CREATED)
+def crear_viajes_bulk(
+    body: schemas.ViajesBulkIn,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Crea varios viajes de una vez (grupos, tours) con las mismas reglas que
+    POST /viajes: validación en conjunto (una consulta para rutas y otra para
+    solicitantes), un solo INSERT para todos, asignación conjunta (un
+    Despachador para el lote, así no compiten por el mismo conductor) y un
+    único commit.
+    Responde un resultado por fila, en el orden recibido; las filas inválidas
+    no impiden crear las demás.
+    """
+    user_id = int(claims["sub"])
+    role = int(claims.get("role", 0))
+    me = db.query(models.Usuario).get(user_id)
+
+    if not me or not me.id_hotel:
+        raise HTTPException(403, "Usuario sin hotel asignado")
+
+    hotel_id = me.id_hotel
+    filas = body.viajes
+
+    # Quién pide cada viaje (mismas reglas que crear_viaje)
+    if role in (3, 4):
+        solicitantes = [f.pedida_por_id_usuario or user_id for f in filas]
+    else:
+        solicitantes = [user_id] * len(filas)
+
+    rutas_validas = set(db.execute(
+        select(models.Ruta.id_ruta).where(
+            models.Ruta.id_ruta.in_({f.id_ruta for f in filas}),
+            models.Ruta.id_hotel == hotel_id
         )
-        
-        if not conflicto:
-            asignacion = models.AsignacionViajes(
-                id_viaje=viaje.id_viaje,
-                id_conductor=conductor_id,
-                id_vehiculo=id_vehiculo,
-                asignado_a_id_usuario=None,
-                hora_asignacion=datetime.utcnow()
-            )
-            
-            viaje.id_estado_viaje = 2
-            db.add(asignacion)
-            db.flush()
-            
-            print(f"✅ Viaje {viaje.id_viaje} asignado a {nombre} {apellido}")
-
-            return {
-                 'id_conductor': conductor_id,
-                'conductor_usuario_id': usuario_id,
-                'id_vehiculo': id_vehiculo,
-                'conductor_nombre': f"{nombre} {apellido}".strip(),
-                'vehiculo_patente': patente
-            }
-    
-    print(f"⚠️ Todos los conductores tienen conflictos")
-    return None
+    ).scalars())
+    usuarios_validos = set(db.execute(
+        select(models.Usuario.id_usuario).where(
+            models.Usuario.id_usuario.in_(set(solicitantes)),
+            models.Usuario.id_hotel == hotel_id
+        )
+    ).scalars())
+
+    resultados = [{"indice": i, "ok": False} for i in range(len(filas))]
+    validas = []
+    for i, (f, pedida_por) in enumerate(zip(filas, solicitantes)):
+        if f.id_ruta not in rutas_validas:
+            resultados[i]["error"] = "Ruta no válida para este hotel"
+        elif pedida_por not in usuarios_validos:
+            resultados[i]["error"] = "Usuario solicitante no válido"
+        else:
+            validas.append((i, f, pedida_por))
+
+    if not validas:
+        return {"lote": None, "creados": 0, "asignados": 0, "resultados": resultados}
+
+    lote = str(uuid4())
+    ahora = datetime.utcnow()
+    db.execute(insert(models.Viaje), [
+        {
+            "id_hotel": hotel_id,
+            "id_ruta": f.id_ruta,
+            "pedida_por_id_usuario": pedida_por,
+            "hora_pedida": ahora,
+            "agendada_para": f.agendada_para,
+            "id_estado_viaje": 1,  # PENDIENTE
+            "pasajeros": f.pasajeros,
+            "lote": lote,
+        }
+        for _, f, pedida_por in validas
+    ])
+    # Un mismo INSERT asigna ids crecientes en el orden de las filas
+    viajes = (
+        db.query(models.Viaje)
+        .filter(models.Viaje.lote == lote)
+        .order_by(models.Viaje.id_viaje)
+        .all()
+    )
+    demanda.registrar_viajes(db, viajes)
+
+    # Asignación conjunta en orden de horario
+    despachador = despacho.Despachador(db, hotel_id, viajes)
+    asignaciones = {}
+    mensajes = []
+    if despachador.candidatos:
+        for viaje in sorted(viajes, key=lambda v: v.agendada_para):
+            info = despachador.asignar(viaje)
+            if info:
+                asignaciones[viaje.id_viaje] = info
+                mensajes.append((
+                    info["conductor_usuario_id"],
+                    f"Nuevo viaje asignado: {despachador.nombre_ruta(viaje)} "
+                    f"para {viaje.agendada_para.strftime('%d/%m/%Y %H:%M')}"
+                ))
+    from .notificaciones import agregar_notificaciones
+    agregar_notificaciones(db, mensajes)
+
+    # El grupo compartido final se conoce recién al terminar el lote
+    a = models.AsignacionViajes
+    recorridos = dict(db.execute(
+        select(a.id_viaje, a.id_recorrido).where(a.id_viaje.in_(list(asignaciones)))
+    ).all()) if asignaciones else {}
+    for (i, _, _), viaje in zip(validas, viajes):
+        info = asignaciones.get(viaje.id_viaje)
+        resultados[i].update({
+            "ok": True,
+            "id_viaje": viaje.id_viaje,
+            "id_estado_viaje": viaje.id_estado_viaje,
+            "id_conductor": info["id_conductor"] if info else None,
+            "id_vehiculo": info["id_vehiculo"] if info else None,
+            "id_recorrido": recorridos.get(viaje.id_viaje),
+        })
+
+    versiones.incrementar(db, hotel_id, "viajes")
+    db.commit()
+    for viaje in viajes:
+        almacen_viajes.registrar(viaje)
+
+    print(f"✅ Lote {lote}: {len(viajes)} viajes, {len(asignaciones)} asignados")
+    return {
+        "lote": lote,
+        "creados": len(viajes),
+        "asignados": len(asignaciones),
+        "resultados": resultados,
+    }
+
+
 @router.post("/{id_viaje}/asignar", dependencies=[Depends(require_role(3))])
 def asignar_viaje_manual(
     id_viaje: int,
@@ -215,18 +293,22 @@ def asignar_viaje_manual(
     
     id_vehiculo = conductor_vehiculo.id_vehiculo
     
-    # Validar conflictos de horario
-    conflicto = (
+    # Con viajes compartidos, el viaje se suma a un grupo del conductor si cabe
+    despachador = despacho.Despachador(db, hotel_id, [viaje])
+    grupo = despachador.unir(viaje, conductor_id, id_vehiculo)
+    
+    # Validar conflictos de horario (los viajes del mismo grupo no cuentan)
+    conflictos = (
         db.query(models.AsignacionViajes)
         .join(models.Viaje, models.AsignacionViajes.id_viaje == models.Viaje.id_viaje)
         .filter(
             models.Viaje.agendada_para == viaje.agendada_para,
             models.AsignacionViajes.id_conductor == conductor_id
         )
-        .first()
+        .all()
     )
     
-    if conflicto:
+    if any(grupo is None or c not in grupo.asignaciones for c in conflictos):
         raise HTTPException(409, "El conductor ya tiene un viaje asignado en ese horario")
     
     # Crear asignación
@@ -242,23 +324,186 @@ def asignar_viaje_manual(
     viaje.id_estado_viaje = 2  # ASIGNADO
     
     db.add(asignacion)
+    despachador.agrupar(viaje, asignacion)
+    metricas_conductor.registrar_asignacion(db, viaje, conductor_id)
+    versiones.incrementar(db, hotel_id, "viajes")
     db.commit()
     db.refresh(asignacion)
+    almacen_viajes.registrar(viaje, asignacion)
     
     # Notificar al conductor
     from .notificaciones import notificar_viaje_asignado
     notificar_viaje_asignado(db, id_viaje, conductor_usuario.id_usuario)
-    return {"ok": True, "message": "Viaje asignado correctamente"}
+    return {"ok": True, "message": "Viaje asignado correctamente", "id_recorrido": asignacion.id_recorrido}
+
+
+# ========================================
+#  Ciclo de vida (acciones del conductor)
+# ========================================
+
+def _viaje_del_conductor(db: Session, id_viaje: int, user_id: int):
+    """Devuelve (viaje, asignación) si el viaje está asignado al conductor del token."""
+    conductor = db.query(models.Conductor).filter(
+        models.Conductor.id_usuario == user_id
+    ).first()
+    if not conductor:
+        raise HTTPException(403, "No eres conductor")
+
+    viaje = db.query(models.Viaje).get(id_viaje)
+    if not viaje:
+        raise HTTPException(404, "Viaje no encontrado")
+
+    asig = db.query(models.AsignacionViajes).filter(
+        models.AsignacionViajes.id_viaje == id_viaje,
+        models.AsignacionViajes.id_conductor == conductor.id_conductor
+    ).first()
+    if not asig:
+        raise HTTPException(403, "Viaje no asignado a ti")
+
+    return viaje, asig
+
+
+@router.patch("/{id_viaje}/aceptar", dependencies=[Depends(require_role(2))])
+def aceptar_viaje(
+    id_viaje: int,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """El conductor acepta un viaje ASIGNADO (pasa a ACEPTADO)."""
+    viaje, asig = _viaje_del_conductor(db, id_viaje, int(claims["sub"]))
+
+    if viaje.id_estado_viaje != 2:
+        raise HTTPException(400, "El viaje no está pendiente de aceptación")
+
+    asig.hora_aceptacion = datetime.utcnow()
+    viaje.id_estado_viaje = 3  # ACEPTADO
+    metricas_conductor.registrar_aceptacion(db, viaje, asig)
+    versiones.incrementar(db, viaje.id_hotel, "viajes")
+    db.commit()
+    almacen_viajes.registrar(viaje, asig)
+
+    from .notificaciones import notificar_viaje_aceptado
+    notificar_viaje_aceptado(db, viaje.id_viaje, viaje.pedida_por_id_usuario)
+    return {"ok": True, "message": "Viaje aceptado"}
+
+
+@router.patch("/{id_viaje}/rechazar", dependencies=[Depends(require_role(2))])
+def rechazar_viaje(
+    id_viaje: int,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """El conductor rechaza el viaje: se elimina su asignación y vuelve a PENDIENTE."""
+    viaje, asig = _viaje_del_conductor(db, id_viaje, int(claims["sub"]))
+
+    if viaje.id_estado_viaje not in (2, 3):
+        raise HTTPException(400, "No se puede rechazar un viaje en curso o finalizado")
+
+    metricas_conductor.registrar_desasignacion(db, viaje, asig)
+    viaje.id_estado_viaje = 1  # PENDIENTE
+    despacho.soltar_de_recorridos(db, [asig])
+    db.delete(asig)
+    versiones.incrementar(db, viaje.id_hotel, "viajes")
+    db.commit()
+    almacen_viajes.registrar(viaje)
+    return {"ok": True, "message": "Viaje rechazado, vuelve a PENDIENTE"}
+
+
+@router.patch("/{id_viaje}/iniciar", dependencies=[Depends(require_role(2))])
+def iniciar_viaje(
+    id_viaje: int,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """El conductor inicia un viaje ACEPTADO (pasa a EN_CURSO)."""
+    viaje, asig = _viaje_del_conductor(db, id_viaje, int(claims["sub"]))
+
+    if viaje.id_estado_viaje != 3:
+        raise HTTPException(400, "Solo se puede iniciar un viaje aceptado")
+
+    asig.inicio_viaje = datetime.utcnow()
+    viaje.id_estado_viaje = 4  # EN_CURSO
+    versiones.incrementar(db, viaje.id_hotel, "viajes")
+    db.commit()
+    almacen_viajes.registrar(viaje, asig)
+    return {"ok": True, "message": "Viaje iniciado"}
+
+
+@router.patch("/{id_viaje}/finalizar", dependencies=[Depends(require_role(2))])
+def finalizar_viaje(
+    id_viaje: int,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """El conductor finaliza un viaje EN_CURSO (pasa a COMPLETADO)."""
+    viaje, asig = _viaje_del_conductor(db, id_viaje, int(claims["sub"]))
+
+    if viaje.id_estado_viaje != 4:
+        raise HTTPException(400, "Solo se puede finalizar un viaje en curso")
+
+    asig.fin_viaje = datetime.utcnow()
+    viaje.id_estado_viaje = 5  # COMPLETADO
+    metricas_conductor.registrar_finalizacion(db, viaje, asig)
+    versiones.incrementar(db, viaje.id_hotel, "viajes")
+    db.commit()
+    almacen_viajes.registrar(viaje, asig)
+    duraciones.registrar(db, viaje, asig)
+    return {"ok": True, "message": "Viaje completado"}
+
+
+@router.delete("/{id_viaje}")
+def cancelar_viaje(
+    id_viaje: int,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Cancela un viaje que aún no ha comenzado (pasa a CANCELADO).
+    - Usuarios (1): solo sus propios viajes
+    - Supervisores (3) y Admins (4): viajes de su hotel
+    La asignación se conserva como historial (cuenta como asignada en los KPIs).
+    """
+    user_id = int(claims["sub"])
+    role = int(claims.get("role", 0))
+
+    viaje = db.query(models.Viaje).get(id_viaje)
+    if not viaje:
+        raise HTTPException(404, "Viaje no encontrado")
+
+    if role in (3, 4):
+        me = db.query(models.Usuario).get(user_id)
+        if not me or viaje.id_hotel != me.id_hotel:
+            raise HTTPException(403, "Sin acceso a este viaje")
+    elif viaje.pedida_por_id_usuario != user_id:
+        raise HTTPException(403, "No es tu viaje")
+
+    if viaje.id_estado_viaje not in (1, 2, 3):
+        raise HTTPException(400, "No se puede cancelar un viaje en curso o finalizado")
+
+    viaje.id_estado_viaje = 6  # CANCELADO
+    if viaje.asignacion is not None:
+        # Sale del recorrido compartido; si queda un solo viaje, se deshace
+        despacho.soltar_de_recorridos(db, [viaje.asignacion])
+    versiones.incrementar(db, viaje.id_hotel, "viajes")
+    db.commit()
+    almacen_viajes.registrar(viaje)
+    return {"ok": True, "message": "Viaje cancelado"}
 
 @router.get("")
 def listar_viajes(
+    request: Request,
+    response: Response,
     estado: Optional[int] = Query(None, description="Filtrar por estado"),
     fecha_desde: Optional[datetime] = None,
     fecha_hasta: Optional[datetime] = None,
     db: Session = Depends(get_db),
     claims: dict = Depends(get_current_claims)
 ):
-    """Lista viajes según el rol del usuario"""
+    """
+    Lista viajes según el rol del usuario.
+    Responde 304 si If-None-Match trae el ETag vigente (mismos viajes y solicitantes).
+    Con ?format=columnar responde {"columns": [...], "rows": [[...], ...]}.
+    """
     user_id = int(claims["sub"])
     role = int(claims.get("role", 0))
     me = db.query(models.Usuario).get(user_id)
@@ -266,14 +511,25 @@ def listar_viajes(
     if not me:
         raise HTTPException(404, "Usuario no encontrado")
     
-    # Query base SIN JOINs primero
-    q = db.query(models.Viaje)
+    no_modificado = http_cache.validar(
+        request, response, db, me.id_hotel, ("viajes", "usuarios", "flota"), user_id, role
+    )
+    if no_modificado is not None:
+        return no_modificado
+    
+    # Columnas del viaje y del solicitante en una sola consulta (sin una por fila)
+    v, u = models.Viaje, models.Usuario
+    q = select(
+        v.id_viaje, v.id_hotel, v.id_ruta, v.pedida_por_id_usuario, v.hora_pedida,
+        v.agendada_para, v.id_estado_viaje, v.pasajeros,
+        u.nombre_usuario, u.apellido1_usuario, u.telefono_usuario,
+    ).outerjoin(u, u.id_usuario == v.pedida_por_id_usuario)
     
     # Filtrar según rol
     if role in (3, 4):  # Supervisor/Admin
         if not me.id_hotel:
             raise HTTPException(403, "Sin hotel asignado")
-        q = q.filter(models.Viaje.id_hotel == me.id_hotel)
+        q = q.where(v.id_hotel == me.id_hotel)
     elif role == 2:  # Conductor
         # Solo viajes asignados a este conductor
         conductor = db.query(models.Conductor).filter(
@@ -281,50 +537,77 @@ def listar_viajes(
         ).first()
 
         if not conductor:
-            return []
+            return serializacion.tabla(request, response, _CAMPOS_LISTADO, [])
         q = q.join(
             models.AsignacionViajes,
-            models.Viaje.id_viaje == models.AsignacionViajes.id_viaje
-        ).filter(
+            v.id_viaje == models.AsignacionViajes.id_viaje
+        ).where(
             models.AsignacionViajes.id_conductor == conductor.id_conductor)
     else:  # Usuario
-        q = q.filter(models.Viaje.pedida_por_id_usuario == user_id)
+        q = q.where(v.pedida_por_id_usuario == user_id)
     
     # Filtros opcionales
     if estado:
-        q = q.filter(models.Viaje.id_estado_viaje == estado)
+        q = q.where(v.id_estado_viaje == estado)
     if fecha_desde:
-        q = q.filter(models.Viaje.agendada_para >= fecha_desde)
+        q = q.where(v.agendada_para >= fecha_desde)
     if fecha_hasta:
-        q = q.filter(models.Viaje.agendada_para <= fecha_hasta)
-    
-    viajes = q.order_by(models.Viaje.agendada_para.desc()).all()
-    
-    # Construir respuesta con info adicional
-    resultado = []
-    for viaje in viajes:
-        # Obtener info del solicitante
-        solicitante = db.query(models.Usuario).get(viaje.pedida_por_id_usuario)
-        
-        viaje_dict = {
-            "id_viaje": viaje.id_viaje,
-            "id_hotel": viaje.id_hotel,
-            "id_ruta": viaje.id_ruta,
-            "pedida_por_id_usuario": viaje.pedida_por_id_usuario,
-            "hora_pedida": viaje.hora_pedida.isoformat() if viaje.hora_pedida else None,
-            "agendada_para": viaje.agendada_para.isoformat() if viaje.agendada_para else None,
-            "id_estado_viaje": viaje.id_estado_viaje,
-            "solicitante_nombre": "",
-            "solicitante_telefono": None,
-        }
-        
-        if solicitante:
-            nombre_completo = f"{solicitante.nombre_usuario} {solicitante.apellido1_usuario or ''}".strip()
-            viaje_dict["solicitante_nombre"] = nombre_completo
-            viaje_dict["solicitante_telefono"] = solicitante.telefono_usuario
-        
-        resultado.append(viaje_dict)
-    
+        q = q.where(v.agendada_para <= fecha_hasta)
+    
+    # Construir respuesta con info adicional (tuplas en el orden de _CAMPOS_LISTADO, sin ORM)
+    resultado = [
+        (
+            id_viaje, id_hotel, id_ruta, pedida_por,
+            hora_pedida.isoformat() if hora_pedida else None,
+            agendada_para.isoformat() if agendada_para else None,
+            id_estado_viaje, pasajeros,
+            f"{nombre} {apellido or ''}".strip() if nombre is not None else "",
+            telefono,
+        )
+        for (id_viaje, id_hotel, id_ruta, pedida_por, hora_pedida, agendada_para,
+             id_estado_viaje, pasajeros, nombre, apellido, telefono)
+        in db.execute(q.order_by(v.agendada_para.desc()))
+    ]
+    return serializacion.tabla(request, response, _CAMPOS_LISTADO, resultado)
+
+
+_CAMPOS_LISTADO = (
+    "id_viaje", "id_hotel", "id_ruta", "pedida_por_id_usuario", "hora_pedida", "agendada_para",
+    "id_estado_viaje", "pasajeros", "solicitante_nombre", "solicitante_telefono",
+)
+
+
+@router.get("/{id_viaje}/eta")
+def eta_viaje(
+    id_viaje: int,
+    db: Session = Depends(get_db),
+    claims: dict = Depends(get_current_claims)
+):
+    """
+    Hora estimada de recogida y lugar en la cola del viaje, calculados desde
+    memoria (cola del conductor, duración de las rutas y última posición GPS).
+    El resultado se reutiliza unos segundos: consultarlo seguido no toca la BD.
+    """
+    user_id = int(claims["sub"])
+    role = int(claims.get("role", 0))
+
+    estimacion = eta.estimar(db, id_viaje)
+    if estimacion is None:
+        raise HTTPException(404, "Viaje no encontrado")
+    pedida_por, id_hotel, resultado = estimacion
+
+    # Validar acceso
+    if role in (3, 4):  # Supervisor/Admin
+        me = db.query(models.Usuario).get(user_id)
+        if not me or me.id_hotel != id_hotel:
+            raise HTTPException(403, "Sin acceso a este viaje")
+    elif role == 2:  # Conductor
+        conductor = flota.conductor_de_usuario(db, user_id)
+        if not conductor or conductor.id_conductor != resultado["id_conductor"]:
+            raise HTTPException(403, "Viaje no asignado a ti")
+    elif pedida_por != user_id:
+        raise HTTPException(403, "No es tu viaje")
+
     return resultado
 
 
@@ -396,20 +679,20 @@ def obtener_viaje(
                 models.Usuario.apellido1_usuario.label("conductor_apellido1"),
                 models.Usuario.telefono_usuario.label("conductor_telefono"),
                 models.Vehiculo.patente.label("vehiculo_patente"),
-                models.MarcaVehiculo.nombre_marca_vehiculo.label("marca"),
+                models.Vehiculo.id_marca_vehiculo,
                 models.Vehiculo.modelo.label("modelo"),
                 models.Vehiculo.capacidad.label("capacidad")
             )
             .join(models.Conductor, models.AsignacionViajes.id_conductor == models.Conductor.id_conductor)
             .join(models.Usuario, models.Conductor.id_usuario == models.Usuario.id_usuario)
             .outerjoin(models.Vehiculo, models.AsignacionViajes.id_vehiculo == models.Vehiculo.id_vehiculo)
-            .outerjoin(models.MarcaVehiculo, models.Vehiculo.id_marca_vehiculo == models.MarcaVehiculo.id_marca_vehiculo)
             .filter(models.AsignacionViajes.id_viaje == id_viaje)
             .first()
         )
         
         if asignacion:
-            asig, cond_nom, cond_ap1, cond_tel, patente, marca, modelo, cap = asignacion
+            asig, cond_nom, cond_ap1, cond_tel, patente, id_marca, modelo, cap = asignacion
+            marca = catalogos.obtener(db).marcas.get(id_marca)
             conductor_info = {
                 "nombre": f"{cond_nom} {cond_ap1 or ''}".strip(),
                 "telefono": cond_tel
@@ -431,6 +714,7 @@ def obtener_viaje(
         "hora_pedida": viaje.hora_pedida,
         "agendada_para": viaje.agendada_para,
         "id_estado_viaje": viaje.id_estado_viaje,
+        "pasajeros": viaje.pasajeros,
         # Info del solicitante
         "solicitante_nombre": f"{sol_nombre} {sol_ap1 or ''}".strip(),
         "solicitante_telefono": sol_tel,
@@ -82,6 +82,7 @@ class HotelCreate(BaseModel):
     direccion_hotel: Optional[str] = None
     email_hotel: Optional[EmailStr] = None
     contacto_telefonico_hotel: Optional[str] = None
+    zona_horaria: Optional[str] = None
     id_ciudad: int
     id_estado_actividad: int
 
@@ -90,6 +91,7 @@ class HotelUpdate(BaseModel):
     direccion_hotel: Optional[str] = None
     email_hotel: Optional[EmailStr] = None
     contacto_telefonico_hotel: Optional[str] = None
+    zona_horaria: Optional[str] = None
     id_ciudad: Optional[int] = None
     id_estado_actividad: Optional[int] = None
 
@@ -266,6 +268,7 @@ class RutaOut(BaseModel):
     destino_ruta: str
     precio_ruta: Optional[float]
     duracion_aproximada: Optional[int]
+    duracion_aprendida: Optional[float] = None  # minutos, desde viajes finalizados
     id_estado_actividad: int
     class Config: 
         from_attributes = True
@@ -289,6 +292,28 @@ class DisponibilidadOut(BaseModel):
     class Config: 
         from_attributes = True
 
+# =========================
+#   Calendario de conductor
+# =========================
+
+class FranjaHoraria(BaseModel):
+    desde: time
+    hasta: time  # 00:00 = hasta el fin del día; si es <= desde sigue el día siguiente (hora local del hotel)
+
+class CalendarioIn(BaseModel):
+    dias: List[List[FranjaHoraria]]  # 7 listas, 0 = lunes
+
+    @field_validator("dias")
+    @classmethod
+    def valida_dias(cls, v):
+        if len(v) != 7:
+            raise ValueError("dias debe tener 7 elementos (lunes a domingo)")
+        return v
+
+class ExcepcionCalendarioIn(BaseModel):
+    fecha: date
+    franjas: List[FranjaHoraria] = []  # vacía = día libre
+
 # =========================
 #   Conductor—Vehículo
 # =========================
@@ -316,6 +341,26 @@ class ViajeCreateIn(BaseModel):
     id_ruta: int
     pedida_por_id_usuario: Optional[int] = None  # puede venir del token
     agendada_para: datetime
+    pasajeros: int = 1
+
+    @field_validator("pasajeros")
+    @classmethod
+    def valida_pasajeros(cls, v):
+        if v < 1:
+            raise ValueError("pasajeros debe ser al menos 1")
+        return v
+
+class ViajesBulkIn(BaseModel):
+    viajes: List[ViajeCreateIn]
+
+    @field_validator("viajes")
+    @classmethod
+    def valida_viajes(cls, v):
+        if not v:
+            raise ValueError("se requiere al menos un viaje")
+        if len(v) > 500:
+            raise ValueError("máximo 500 viajes por solicitud")
+        return v
 
 class ViajeOut(BaseModel):
     id_viaje: int
@@ -325,6 +370,7 @@ class ViajeOut(BaseModel):
     hora_pedida: datetime
     agendada_para: datetime
     id_estado_viaje: int
+    pasajeros: int = 1
     
     # ✅ Información adicional del solicitante
     solicitante_nombre: Optional[str] = None
@@ -344,6 +390,67 @@ class ViajeOut(BaseModel):
     class Config: 
         from_attributes = True
 
+# =========================
+#   Plantillas de viaje
+# =========================
+
+def _valida_dias_semana(v):
+    if v is not None:
+        if not v or any(d < 0 or d > 6 for d in v):
+            raise ValueError("dias_semana: lista no vacía de 0 (lunes) a 6 (domingo)")
+    return v
+
+def _valida_cada_minutos(v):
+    if v is not None and v < 5:
+        raise ValueError("cada_minutos debe ser al menos 5")
+    return v
+
+class PlantillaIn(BaseModel):
+    id_ruta: int
+    pedida_por_id_usuario: Optional[int] = None  # por defecto, quien la crea
+    pasajeros: int = 1
+    dias_semana: List[int]         # 0 = lunes
+    hora_inicio: time              # hora local del hotel
+    hora_fin: Optional[time] = None
+    cada_minutos: Optional[int] = None
+    vigente_desde: Optional[date] = None  # por defecto, hoy
+    vigente_hasta: Optional[date] = None
+
+    @field_validator("dias_semana")
+    @classmethod
+    def valida_dias_semana(cls, v):
+        return _valida_dias_semana(v)
+
+    @field_validator("cada_minutos")
+    @classmethod
+    def valida_cada_minutos(cls, v):
+        return _valida_cada_minutos(v)
+
+class PlantillaUpdate(BaseModel):
+    id_ruta: Optional[int] = None
+    pedida_por_id_usuario: Optional[int] = None
+    pasajeros: Optional[int] = None
+    dias_semana: Optional[List[int]] = None
+    hora_inicio: Optional[time] = None
+    hora_fin: Optional[time] = None
+    cada_minutos: Optional[int] = None
+    vigente_desde: Optional[date] = None
+    vigente_hasta: Optional[date] = None
+
+    @field_validator("dias_semana")
+    @classmethod
+    def valida_dias_semana(cls, v):
+        return _valida_dias_semana(v)
+
+    @field_validator("cada_minutos")
+    @classmethod
+    def valida_cada_minutos(cls, v):
+        return _valida_cada_minutos(v)
+
+class ExcepcionPlantillaIn(BaseModel):
+    fecha: date
+    motivo: Optional[str] = None
+
 # =========================
 #   Asignaciones de Viaje
 # =========================
@@ -398,4 +505,39 @@ class NotificacionOut(BaseModel):
 
 class ConductorVehiculoAssignIn(BaseModel):
     id_conductor: int
-    id_vehiculo: int
\ No newline at end of file
+    id_vehiculo: int
+
+# =========================
+#      Posiciones GPS
+# =========================
+
+class PosicionIn(BaseModel):
+    latitud: float
+    longitud: float
+    registrada_en: Optional[datetime] = None  # UTC; por defecto, hora de recepción
+    velocidad_kmh: Optional[int] = None
+    rumbo: Optional[int] = None
+
+    @field_validator("latitud")
+    @classmethod
+    def valida_latitud(cls, v):
+        if not -90 <= v <= 90:
+            raise ValueError("latitud fuera de rango")
+        return v
+
+    @field_validator("longitud")
+    @classmethod
+    def valida_longitud(cls, v):
+        if not -180 <= v <= 180:
+            raise ValueError("longitud fuera de rango")
+        return v
+
+class PosicionesIn(BaseModel):
+    puntos: List[PosicionIn]
+
+    @field_validator("puntos")
+    @classmethod
+    def valida_puntos(cls, v):
+        if len(v) > 500:
+            raise ValueError("máximo 500 puntos por envío")
+        return v
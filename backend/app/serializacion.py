@@ -0,0 +1,137 @@
+# app/serializacion.py
+"""
+Respuestas JSON de listados grandes sin pasar por los modelos de pydantic.
+
+Con `response_model`, FastAPI valida cada fila contra el modelo antes de
+serializarla; si el handler ya armó modelos (o devuelve objetos ORM con
+from_attributes), cada fila se valida dos veces. En listados de miles de
+filas eso es casi todo el tiempo del request.
+
+Acá las filas se leen como tuplas de columnas (con `label` = nombre del campo
+de salida), se arman dicts y se serializan de una vez con pydantic-core (mismo
+formato de fechas que la respuesta normal). El `response_model` del endpoint
+queda para el esquema OpenAPI: al devolver un Response FastAPI no lo valida.
+
+    resultado = db.execute(select(m.id_x.label("id_x"), ...))
+    return serializacion.respuesta(response, serializacion.filas(resultado))
+
+Formato columnar (opcional, `?format=columnar` o `Accept: application/vnd.columnar+json`):
+en vez de repetir las claves en cada objeto se responde
+
+    {"columns": ["id_x", ...], "rows": [[1, ...], [2, ...]]}
+
+que pesa cerca de la mitad. Se arma con `tabla(...)`, que recibe las columnas
+y las filas (tuplas, o dicts con esas claves) y responde en uno u otro
+formato; el columnar se codifica y se envía por lotes a medida que se genera.
+
+Para exportaciones, `a_ndjson`, `a_csv` y `a_columnar` codifican lotes de
+tuplas (p. ej. `Result.partitions()` de un cursor del servidor) trozo a trozo.
+"""
+import csv
+import io
+from datetime import date, datetime, time
+from typing import Any, Iterable, Iterator, List, Sequence, Type
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+from sqlalchemy.engine import Result
+
+
+def columnas(tabla, esquema: Type[BaseModel]) -> list:
+    """Columnas del modelo ORM `tabla` que llevan el nombre de un campo de `esquema` (en su orden)."""
+    return [getattr(tabla, campo) for campo in esquema.model_fields if hasattr(tabla, campo)]
+
+
+def filas(resultado: Result, claves: Sequence[str] = None) -> List[dict]:
+    """Tuplas de un SELECT como dicts (claves = nombres de las columnas)."""
+    claves = tuple(claves or resultado.keys())
+    return [dict(zip(claves, fila)) for fila in resultado]
+
+
+def respuesta(response: Response, contenido: Any, headers: dict = None) -> Response:
+    """
+    JSON ya serializado, con los encabezados que el handler dejó en `response`
+    (ETag, Last-Modified, etc.; FastAPI no los copia si se devuelve un Response).
+    """
+    return Response(
+        content=to_json(contenido), media_type="application/json", headers={**response.headers, **(headers or {})}
+    )
+
+
+# =========================
+#   Formato columnar
+# =========================
+
+FORMATO_COLUMNAR = "columnar"
+MEDIA_COLUMNAR = "application/vnd.columnar+json"
+_LOTE_COLUMNAR = 1000  # filas por trozo enviado
+
+
+def es_columnar(request: Request) -> bool:
+    """¿El cliente pidió el formato columnar (query string o Accept)?"""
+    return (
+        request.query_params.get("format") == FORMATO_COLUMNAR
+        or MEDIA_COLUMNAR in request.headers.get("accept", "")
+    )
+
+
+def a_columnar(claves: Sequence[str], lotes: Iterable[Sequence]) -> Iterator[bytes]:
+    """{"columns": [...], "rows": [...]} en trozos, uno por lote."""
+    yield b'{"columns":' + to_json(list(claves)) + b',"rows":['
+    primero = True
+    for lote in lotes:
+        if not lote:
+            continue
+        filas = [[f[c] for c in claves] if isinstance(f, dict) else tuple(f) for f in lote]
+        # Sin los corchetes de la lista: los trozos se unen con comas
+        yield (b"" if primero else b",") + to_json(filas)[1:-1]
+        primero = False
+    yield b"]}"
+
+
+def a_ndjson(claves: Sequence[str], lotes: Iterable[Sequence]) -> Iterator[bytes]:
+    """Un objeto JSON por línea; un trozo por lote."""
+    for lote in lotes:
+        if lote:
+            yield b"".join(to_json(dict(zip(claves, f))) + b"\n" for f in lote)
+
+
+def _celda(valor):
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    return valor
+
+
+def a_csv(claves: Sequence[str], lotes: Iterable[Sequence]) -> Iterator[bytes]:
+    """CSV (UTF-8, encabezado con `claves`, fechas ISO 8601); un trozo por lote."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(claves)
+    yield buffer.getvalue().encode()
+    for lote in lotes:
+        if not lote:
+            continue
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows([_celda(v) for v in f] for f in lote)
+        yield buffer.getvalue().encode()
+
+
+def tabla(request: Request, response: Response, claves: Sequence[str], filas: Sequence) -> Response:
+    """
+    Lista de objetos (por defecto) o formato columnar según lo pedido.
+    `filas` son tuplas en el orden de `claves` (o dicts con esas claves).
+    """
+    headers = {"Vary": "Accept"}
+    if not es_columnar(request):
+        if filas and not isinstance(filas[0], dict):
+            filas = [dict(zip(claves, f)) for f in filas]
+        return respuesta(response, filas, headers)
+    lotes = (filas[i:i + _LOTE_COLUMNAR] for i in range(0, len(filas), _LOTE_COLUMNAR))
+    return StreamingResponse(
+        a_columnar(claves, lotes),
+        media_type=MEDIA_COLUMNAR if MEDIA_COLUMNAR in request.headers.get("accept", "") else "application/json",
+        headers={**response.headers, **headers},
+    )
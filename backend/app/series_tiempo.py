@@ -0,0 +1,128 @@
+# app/series_tiempo.py
+"""
+Series de tiempo densas (con ceros) en cubetas de hora, día o semana,
+alineadas a la hora local del hotel.
+
+Los límites de cada cubeta se calculan en hora local y se convierten a UTC,
+así la consulta es un rango simple sobre `agendada_para` (usa el índice). La
+BD agrupa por tramo UTC (`tramo_utc`: una hora, o 15 minutos si la zona tiene
+un desfase fraccionario) y los conteos, ya ordenados, se reparten en las
+cubetas locales en una sola pasada (`sumar`).
+"""
+from datetime import datetime, timedelta, tzinfo
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import Integer, literal_column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+from .zona_horaria import a_local, a_utc
+
+GRANULARIDADES = ("hora", "dia", "semana")
+
+_PASO = {
+    "hora": timedelta(hours=1),
+    "dia": timedelta(days=1),
+    "semana": timedelta(weeks=1),
+}
+
+
+def truncar(local: datetime, granularidad: str) -> datetime:
+    """Inicio (hora local) de la cubeta que contiene `local`."""
+    if granularidad == "hora":
+        return local.replace(minute=0, second=0, microsecond=0)
+    dia = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularidad == "semana":
+        return dia - timedelta(days=dia.weekday())  # semanas desde el lunes
+    return dia
+
+
+def etiqueta(local: datetime, granularidad: str) -> str:
+    if granularidad == "hora":
+        return local.strftime("%Y-%m-%dT%H:00")
+    return local.strftime("%Y-%m-%d")
+
+
+def cubetas(
+    desde_local: datetime, hasta_local: datetime, granularidad: str, tz: tzinfo
+) -> Tuple[List[str], List[datetime]]:
+    """
+    Etiquetas de las cubetas que cubren [desde_local, hasta_local) y sus límites
+    en UTC (len(limites) == len(etiquetas) + 1). Las horas locales que no existen
+    por cambio de horario se omiten; la que se repite queda en una cubeta de dos
+    horas. Un día cuya medianoche no existe empieza en su primera hora válida.
+    """
+    paso = _PASO[granularidad]
+    etiquetas: List[str] = []
+    limites: List[datetime] = []
+    inicio = truncar(desde_local, granularidad)
+    while inicio < hasta_local:
+        inicio_utc = a_utc(inicio, tz)
+        if granularidad == "hora" and a_local(inicio_utc, tz) != inicio:
+            inicio += paso
+            continue
+        etiquetas.append(etiqueta(inicio, granularidad))
+        limites.append(inicio_utc)
+        inicio += paso
+    limites.append(a_utc(inicio, tz))
+    return etiquetas, limites
+
+
+def contar(fechas_ordenadas: Iterable[datetime], limites: List[datetime]) -> List[int]:
+    """Cuenta fechas UTC (ordenadas ascendente) por cubeta, en una pasada."""
+    return sumar(((fecha, 1) for fecha in fechas_ordenadas), limites)
+
+
+def sumar(conteos_ordenados: Iterable[Tuple[datetime, int]], limites: List[datetime]) -> List[int]:
+    """Suma conteos (fecha UTC, n), ordenados por fecha, por cubeta, en una pasada."""
+    totales = [0] * (len(limites) - 1)
+    i = 0
+    ultimo = len(totales) - 1
+    for fecha, n in conteos_ordenados:
+        if fecha < limites[0]:
+            continue
+        while i <= ultimo and fecha >= limites[i + 1]:
+            i += 1
+        if i > ultimo:
+            break
+        totales[i] += n
+    return totales
+
+
+# =========================
+#   Agregación en la BD
+# =========================
+
+_EPOCA = datetime(1970, 1, 1)
+
+
+class _MinutosUtc(FunctionElement):
+    """Minutos desde 1970-01-01 de un DATETIME naive en UTC."""
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(_MinutosUtc)
+def _minutos_mysql(elemento, compilador, **kw):
+    # TIMESTAMPDIFF no depende de la zona de la sesión (UNIX_TIMESTAMP sí)
+    return "TIMESTAMPDIFF(MINUTE, '1970-01-01', %s)" % compilador.process(elemento.clauses, **kw)
+
+
+@compiles(_MinutosUtc, "sqlite")
+def _minutos_sqlite(elemento, compilador, **kw):
+    return "(CAST(strftime('%%s', %s) AS INTEGER) / 60)" % compilador.process(elemento.clauses, **kw)
+
+
+def minutos_por_tramo(limites: List[datetime]) -> int:
+    """Una hora si los límites caen en horas UTC exactas; si no, 15 minutos."""
+    return 60 if all(l.minute == 0 for l in limites) else 15
+
+
+def tramo_utc(columna, minutos: int):
+    """Expresión SQL: número de tramo de `minutos` (desde 1970) de la fecha UTC."""
+    # Literal y no parámetro: el GROUP BY repite la misma expresión que el SELECT
+    return _MinutosUtc(columna) // literal_column(str(int(minutos)), Integer())
+
+
+def inicio_de_tramo(tramo: int, minutos: int) -> datetime:
+    return _EPOCA + timedelta(minutes=tramo * minutos)
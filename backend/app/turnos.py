@@ -0,0 +1,160 @@
+# app/turnos.py
+"""
+Registro de turnos de conductores (tabla turnos_conductor).
+
+Cada iniciar-turno agrega una fila (inicio, fin NULL) y finalizar-turno la
+cierra; nunca se sobrescribe, así que el historial queda completo y los
+turnos que cruzan la medianoche no son ambiguos.
+
+Índices:
+- (id_conductor, fin):    "¿tiene turno abierto?" (fin IS NULL).
+- (id_conductor, inicio): último turno y solapes con un rango.
+
+Los turnos vigentes antes de esta tabla (disponibilidad_conductores con
+dias_disponibles_semanales > 0 y sin fin_turno) se migran con:
+
+    python -m app.turnos --migrar
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def abierto(db: Session, id_conductor: int) -> Optional[models.TurnoConductor]:
+    t = models.TurnoConductor
+    return db.execute(
+        select(t).where(t.id_conductor == id_conductor, t.fin.is_(None)).limit(1)
+    ).scalar()
+
+
+def abrir(db: Session, id_conductor: int, ahora: Optional[datetime] = None) -> models.TurnoConductor:
+    """Abre un turno (si ya hay uno abierto, lo devuelve). Sin commit."""
+    turno = abierto(db, id_conductor)
+    if turno is None:
+        turno = models.TurnoConductor(id_conductor=id_conductor, inicio=ahora or datetime.utcnow())
+        db.add(turno)
+        db.flush()
+    return turno
+
+
+def cerrar(db: Session, id_conductor: int, ahora: Optional[datetime] = None) -> int:
+    """Cierra los turnos abiertos del conductor. Devuelve cuántos. Sin commit."""
+    t = models.TurnoConductor
+    turnos = db.execute(
+        select(t).where(t.id_conductor == id_conductor, t.fin.is_(None))
+    ).scalars().all()
+    ahora = ahora or datetime.utcnow()
+    for turno in turnos:
+        turno.fin = ahora
+    return len(turnos)
+
+
+def ultimo(db: Session, id_conductor: int) -> Optional[models.TurnoConductor]:
+    t = models.TurnoConductor
+    return db.execute(
+        select(t).where(t.id_conductor == id_conductor).order_by(t.inicio.desc()).limit(1)
+    ).scalar()
+
+
+def en_turno(db: Session, ids_conductor: Iterable[int]) -> Set[int]:
+    """De los conductores dados, cuáles tienen un turno abierto (una consulta)."""
+    ids = list(ids_conductor)
+    if not ids:
+        return set()
+    t = models.TurnoConductor
+    return set(db.execute(
+        select(t.id_conductor).where(t.id_conductor.in_(ids), t.fin.is_(None))
+    ).scalars())
+
+
+def ultimos(db: Session, ids_conductor: Iterable[int]) -> Dict[int, Tuple[datetime, Optional[datetime]]]:
+    """(inicio, fin) del último turno de cada conductor dado (una consulta)."""
+    ids = list(ids_conductor)
+    if not ids:
+        return {}
+    t = models.TurnoConductor
+    maximos = (
+        select(t.id_conductor, func.max(t.inicio).label("inicio_max"))
+        .where(t.id_conductor.in_(ids))
+        .group_by(t.id_conductor)
+        .subquery()
+    )
+    filas = db.execute(
+        select(t.id_conductor, t.inicio, t.fin)
+        .join(maximos, (maximos.c.id_conductor == t.id_conductor) & (maximos.c.inicio_max == t.inicio))
+    )
+    return {id_conductor: (inicio, fin) for id_conductor, inicio, fin in filas}
+
+
+def en_rango(
+    db: Session, ids_conductor: Iterable[int], desde: datetime, hasta: datetime
+) -> List[Tuple[int, datetime, Optional[datetime]]]:
+    """Turnos que se solapan con [desde, hasta), ordenados por inicio."""
+    ids = list(ids_conductor)
+    if not ids:
+        return []
+    t = models.TurnoConductor
+    return [
+        tuple(fila) for fila in db.execute(
+            select(t.id_conductor, t.inicio, t.fin)
+            .where(
+                t.id_conductor.in_(ids),
+                t.inicio < hasta,
+                or_(t.fin.is_(None), t.fin > desde),
+            )
+            .order_by(t.inicio)
+        )
+    ]
+
+
+def migrar_disponibilidad(db: Session, ahora: Optional[datetime] = None) -> int:
+    """
+    Abre un turno por cada disponibilidad vigente sin turno abierto. El inicio
+    es la hora guardada en el día de hoy (o de ayer si aún no llega). Sin commit.
+    """
+    ahora = ahora or datetime.utcnow()
+    d = models.DisponibilidadConductores
+    t = models.TurnoConductor
+    con_turno = select(t.id_conductor).where(t.fin.is_(None))
+    filas = db.execute(
+        select(d.id_conductor, func.min(d.inicio_turno))
+        .where(
+            d.dias_disponibles_semanales > 0,
+            d.inicio_turno.is_not(None),
+            d.fin_turno.is_(None),
+            d.id_conductor.not_in(con_turno),
+        )
+        .group_by(d.id_conductor)
+    ).all()
+    for id_conductor, hora in filas:
+        inicio = datetime.combine(ahora.date(), hora)
+        if inicio > ahora:
+            inicio -= timedelta(days=1)
+        db.add(models.TurnoConductor(id_conductor=id_conductor, inicio=inicio))
+    return len(filas)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Utilidades del registro de turnos.")
+    parser.add_argument("--migrar", action="store_true",
+                        help="Abre turnos para las disponibilidades vigentes")
+    args = parser.parse_args()
+
+    if args.migrar:
+        db = SessionLocal()
+        try:
+            n = migrar_disponibilidad(db)
+            db.commit()
+            print(f"✅ {n} turnos abiertos")
+        finally:
+            db.close()
+    else:
+        parser.print_help()
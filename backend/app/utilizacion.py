@@ -0,0 +1,120 @@
+# app/utilizacion.py
+"""
+Utilización de conductores y vehículos por barrido (sweep-line).
+
+Entrada: intervalos (inicio, fin, tipo, id_conductor, id_vehiculo) ORDENADOS por
+inicio, de dos tipos:
+- VIAJE:    el conductor/vehículo está ocupado con un viaje.
+- TENENCIA: el conductor tiene asignado el vehículo (conductor_vehiculo), es
+            decir, tiempo de turno disponible.
+
+Un único recorrido con un heap de fines pendientes (O(n log n), memoria
+proporcional a los intervalos abiertos) acumula por conductor y por vehículo:
+tiempo de turno, tiempo ocupado dentro del turno (unión de viajes, no suma),
+tiempo ocupado fuera de turno, y a nivel de flota la máxima concurrencia.
+"""
+import heapq
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+VIAJE = 0
+TENENCIA = 1
+
+Intervalo = Tuple[datetime, datetime, int, int, Optional[int]]
+
+
+class _Acumulador:
+    """Estado del barrido para un conductor o un vehículo."""
+    __slots__ = ("viajes", "tenencias", "ultimo", "turno", "ocupado", "ocupado_fuera")
+
+    def __init__(self, t: datetime):
+        self.viajes = 0
+        self.tenencias = 0
+        self.ultimo = t
+        self.turno = 0.0
+        self.ocupado = 0.0
+        self.ocupado_fuera = 0.0
+
+    def avanzar(self, t: datetime) -> None:
+        dt = (t - self.ultimo).total_seconds()
+        if dt > 0:
+            if self.tenencias > 0:
+                self.turno += dt
+                if self.viajes > 0:
+                    self.ocupado += dt
+            elif self.viajes > 0:
+                self.ocupado_fuera += dt
+        self.ultimo = t
+
+    def resumen(self) -> dict:
+        return {
+            "minutos_turno": round(self.turno / 60, 1),
+            "minutos_ocupado": round(self.ocupado / 60, 1),
+            "minutos_ocioso": round((self.turno - self.ocupado) / 60, 1),
+            "minutos_ocupado_fuera_turno": round(self.ocupado_fuera / 60, 1),
+            "utilizacion_pct": round(self.ocupado / self.turno * 100, 2) if self.turno else 0,
+        }
+
+
+def barrer(intervalos: Iterable[Intervalo]) -> dict:
+    """
+    Recorre los intervalos (ordenados por inicio) y devuelve:
+    {"conductores": {id: resumen}, "vehiculos": {id: resumen},
+     "max_viajes_simultaneos": n, "momento_max": datetime|None,
+     "max_vehiculos_en_turno": m}
+    """
+    conductores: Dict[int, _Acumulador] = {}
+    vehiculos: Dict[int, _Acumulador] = {}
+    pendientes: list = []  # heap de (fin, secuencia, tipo, id_conductor, id_vehiculo)
+    secuencia = 0
+
+    viajes_activos = 0
+    max_viajes = 0
+    momento_max: Optional[datetime] = None
+    tenencias_activas = 0
+    max_tenencias = 0
+
+    def aplicar(t: datetime, tipo: int, id_conductor: int, id_vehiculo: Optional[int], delta: int) -> None:
+        nonlocal viajes_activos, max_viajes, momento_max, tenencias_activas, max_tenencias
+        for tabla, clave in ((conductores, id_conductor), (vehiculos, id_vehiculo)):
+            if clave is None:
+                continue
+            acc = tabla.get(clave)
+            if acc is None:
+                acc = tabla[clave] = _Acumulador(t)
+            acc.avanzar(t)
+            if tipo == VIAJE:
+                acc.viajes += delta
+            else:
+                acc.tenencias += delta
+
+        if tipo == VIAJE:
+            viajes_activos += delta
+            if viajes_activos > max_viajes:
+                max_viajes, momento_max = viajes_activos, t
+        else:
+            tenencias_activas += delta
+            max_tenencias = max(max_tenencias, tenencias_activas)
+
+    for inicio, fin, tipo, id_conductor, id_vehiculo in intervalos:
+        if fin <= inicio:
+            continue
+        # Cerrar todo lo que terminó antes (o justo cuando) empieza este intervalo
+        while pendientes and pendientes[0][0] <= inicio:
+            t, _, tipo_f, c_f, v_f = heapq.heappop(pendientes)
+            aplicar(t, tipo_f, c_f, v_f, -1)
+        aplicar(inicio, tipo, id_conductor, id_vehiculo, +1)
+        secuencia += 1
+        heapq.heappush(pendientes, (fin, secuencia, tipo, id_conductor, id_vehiculo))
+
+    while pendientes:
+        t, _, tipo_f, c_f, v_f = heapq.heappop(pendientes)
+        aplicar(t, tipo_f, c_f, v_f, -1)
+
+    return {
+        "conductores": {k: acc.resumen() for k, acc in conductores.items()},
+        "vehiculos": {k: acc.resumen() for k, acc in vehiculos.items()},
+        "max_viajes_simultaneos": max_viajes,
+        "momento_max": momento_max,
+        "max_vehiculos_en_turno": max_tenencias,
+    }
@@ -0,0 +1,133 @@
+# app/versiones.py
+"""
+Versiones por hotel (tabla versiones_hotel) para invalidar cachés en memoria
+entre workers y validar respuestas HTTP (ETag) sin recalcularlas.
+
+Cada columna es un dominio: flota, viajes (incluye asignaciones), rutas,
+vehiculos, usuarios, calendarios, hotel (datos del propio hotel, p. ej. su
+zona horaria) y catalogos (este último en la fila id_hotel = 0). Quien escribe llama `incrementar(db, id_hotel, "viajes")`
+antes de su commit, así la versión sube en la misma transacción que el
+cambio; actualizado_en queda con la hora de la última escritura.
+
+Quien lee usa `actual(db, id_hotel, dominio)`: cada worker guarda una copia
+de toda la tabla (una fila por hotel) y la relee completa, en una sola
+consulta, como máximo cada VERSIONES_REFRESCO_MS. Tras un commit que subió
+versiones, la copia de ese worker se relee en la siguiente lectura, así
+quien escribe ve su propio cambio de inmediato.
+
+La copia sirve para decidir rápido ("¿cambió algo?"). Lo que se guarda junto
+a datos recién leídos (la versión de una foto, el ETag de una respuesta) se
+lee con `leer`/`leer_filas` en la misma transacción que esos datos.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+
+DOMINIOS = ("flota", "viajes", "rutas", "vehiculos", "usuarios", "calendarios", "catalogos", "hotel")
+ID_GLOBAL = 0  # fila para datos que no son de un hotel (catálogos)
+
+
+def incrementar(db: Session, id_hotel: int, *dominios: str) -> None:
+    """Sube en 1 las columnas `dominios` del hotel (crea la fila si falta). Sin commit."""
+    vh = models.VersionHotel
+    ahora = datetime.utcnow()
+    stmt = mysql_insert(vh).values(id_hotel=id_hotel, actualizado_en=ahora, **{d: 1 for d in dominios})
+    db.execute(stmt.on_duplicate_key_update(
+        actualizado_en=ahora, **{d: getattr(vh, d) + 1 for d in dominios}
+    ))
+    db.info["versiones_modificadas"] = True
+
+
+def leer(db: Session, id_hotel: int, dominio: str) -> int:
+    """Versión actual de `dominio` para el hotel (0 si nunca se escribió), desde la BD."""
+    vh = models.VersionHotel
+    valor = db.execute(
+        select(getattr(vh, dominio)).where(vh.id_hotel == id_hotel)
+    ).scalar()
+    return int(valor or 0)
+
+
+# =========================
+#   Copia local
+# =========================
+
+class VersionesHotel:
+    """Versiones de un hotel (de la copia local o leídas de la BD); solo lectura."""
+    __slots__ = DOMINIOS + ("actualizado_en",)
+
+    def __init__(self, fila=None):
+        for d in DOMINIOS:
+            setattr(self, d, int(getattr(fila, d, 0) or 0))
+        self.actualizado_en: Optional[datetime] = getattr(fila, "actualizado_en", None)
+
+
+_SIN_VERSION = VersionesHotel()
+
+
+def _columnas():
+    vh = models.VersionHotel
+    return (vh.id_hotel, vh.actualizado_en, *(getattr(vh, d) for d in DOMINIOS))
+
+
+def leer_filas(db: Session, ids_hotel: Sequence[int]) -> Dict[int, VersionesHotel]:
+    """Versiones de varios hoteles en una consulta, en la transacción de `db` (no de la copia)."""
+    vh = models.VersionHotel
+    filas = db.execute(select(*_columnas()).where(vh.id_hotel.in_(list(ids_hotel)))).all()
+    encontradas = {f.id_hotel: VersionesHotel(f) for f in filas}
+    return {i: encontradas.get(i, _SIN_VERSION) for i in ids_hotel}
+
+
+_copia: Dict[int, VersionesHotel] = {}
+_leida_en = float("-inf")
+_invalidaciones = 0
+_lock = threading.Lock()
+
+
+def _refrescar(db: Session) -> None:
+    global _copia, _leida_en
+    marca, invalidaciones = time.monotonic(), _invalidaciones
+    # Conexión aparte: solo valores confirmados, nunca un incremento aún sin commit de `db`
+    with db.get_bind().connect() as conn:
+        filas = conn.execute(select(*_columnas())).all()
+    _copia = {f.id_hotel: VersionesHotel(f) for f in filas}
+    if invalidaciones == _invalidaciones:  # si hubo un commit mientras se leía, releer la próxima vez
+        _leida_en = marca
+
+
+def de_hotel(db: Session, id_hotel: int) -> VersionesHotel:
+    """Versiones del hotel según la copia local (relee toda la tabla si venció)."""
+    if (time.monotonic() - _leida_en) * 1000 >= settings.VERSIONES_REFRESCO_MS:
+        with _lock:
+            if (time.monotonic() - _leida_en) * 1000 >= settings.VERSIONES_REFRESCO_MS:
+                _refrescar(db)
+    return _copia.get(id_hotel, _SIN_VERSION)
+
+
+def actual(db: Session, id_hotel: int, dominio: str) -> int:
+    return getattr(de_hotel(db, id_hotel), dominio)
+
+
+def invalidar() -> None:
+    """Fuerza a releer la copia local en la próxima lectura."""
+    global _leida_en, _invalidaciones
+    _invalidaciones += 1
+    _leida_en = float("-inf")
+
+
+@event.listens_for(Session, "after_commit")
+def _despues_del_commit(session: Session) -> None:
+    if session.info.pop("versiones_modificadas", False):
+        invalidar()
+
+
+@event.listens_for(Session, "after_rollback")
+def _despues_del_rollback(session: Session) -> None:
+    session.info.pop("versiones_modificadas", None)
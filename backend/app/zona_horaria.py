@@ -0,0 +1,68 @@
+# app/zona_horaria.py
+"""
+Zona horaria de cada hotel y conversiones UTC <-> hora local.
+
+Las fechas se guardan en la BD como datetime naive en UTC (datetime.utcnow());
+los cortes por día/semana y los horarios de los conductores se expresan en la
+hora local del hotel (`Hotel.zona_horaria`, o ZONA_HORARIA_DEFAULT).
+"""
+from datetime import datetime, timezone, tzinfo
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy.orm import Session
+
+from . import models, versiones
+from .config import settings
+
+_cache: Dict[int, Tuple[int, tzinfo]] = {}  # id_hotel -> (versión "hotel", zona)
+
+
+def zona(nombre: Optional[str]) -> tzinfo:
+    """ZoneInfo por nombre IANA; UTC si viene vacío o no existe en el sistema."""
+    nombre = (nombre or settings.ZONA_HORARIA_DEFAULT or "UTC").strip()
+    if nombre.upper() == "UTC":
+        return timezone.utc
+    try:
+        return ZoneInfo(nombre)
+    except (ZoneInfoNotFoundError, ValueError):
+        print(f"⚠️ Zona horaria desconocida '{nombre}', se usa UTC")
+        return timezone.utc
+
+
+def es_valida(nombre: str) -> bool:
+    try:
+        ZoneInfo(nombre)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return nombre.strip().upper() == "UTC"
+
+
+def zona_de_hotel(db: Session, id_hotel: int) -> tzinfo:
+    """
+    Zona del hotel, en caché por proceso mientras no cambie la versión
+    "hotel" (quien edita el hotel la sube; ver versiones.py), así todos los
+    workers ven la zona nueva tras VERSIONES_REFRESCO_MS como máximo.
+    """
+    version = versiones.actual(db, id_hotel, "hotel")
+    en_cache = _cache.get(id_hotel)
+    if en_cache is not None and en_cache[0] == version:
+        return en_cache[1]
+    nombre = (
+        db.query(models.Hotel.zona_horaria)
+        .filter(models.Hotel.id_hotel == id_hotel)
+        .scalar()
+    )
+    tz = zona(nombre)
+    _cache[id_hotel] = (version, tz)
+    return tz
+
+
+def a_local(fecha_utc: datetime, tz: tzinfo) -> datetime:
+    """UTC naive -> hora local naive."""
+    return fecha_utc.replace(tzinfo=timezone.utc).astimezone(tz).replace(tzinfo=None)
+
+
+def a_utc(fecha_local: datetime, tz: tzinfo) -> datetime:
+    """Hora local naive -> UTC naive (en cambios de horario usa fold=0)."""
+    return fecha_local.replace(tzinfo=tz).astimezone(timezone.utc).replace(tzinfo=None)
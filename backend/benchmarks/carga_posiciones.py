@@ -0,0 +1,149 @@
+# benchmarks/carga_posiciones.py
+"""
+Carga sobre los buffers de posiciones y el guardado en lotes (posiciones.py).
+
+Simula --vehiculos vehículos que durante --minutos envían un ping cada
+--intervalo segundos, en lotes de --lote puntos (como la app al reconectar),
+repartidos en --hilos hilos. Las horas de los puntos terminan en ahora, así
+que el buffer circular da la vuelta si hay más de POSICIONES_BUFFER pings.
+
+Muestra pings/s aceptados y comprueba:
+- cada buffer tiene min(pings, POSICIONES_BUFFER) puntos y el último es el más nuevo;
+- el muestreo deja uno cada POSICIONES_MUESTREO_SEGUNDOS;
+- un lote con el reloj adelantado una hora se acepta corrido a la hora del servidor.
+
+Cada POSICIONES_FLUSH_SEGUNDOS simulados se vacía como lo hace la tarea de
+fondo. Sin --guardar no toca la BD (vehículos ficticios; se muestrea y se
+cuenta lo que se guardaría). Con --guardar usa los vehículos del hotel,
+vacía con posiciones.vaciar (un executemany) y borra al final lo insertado.
+Usar una base de pruebas:
+
+    python -m benchmarks.carga_posiciones --vehiculos 500 --minutos 120
+    DATABASE_URL=mysql+pymysql://... python -m benchmarks.carga_posiciones --hotel 1 --guardar
+"""
+import argparse
+import random
+import threading
+import time
+
+from sqlalchemy import delete, select
+
+from app import models, posiciones
+from app.config import settings
+from app.database import SessionLocal
+
+_ID_FICTICIO = 1_000_000
+
+
+def _enviar(ids, id_hotel, desde, hasta, intervalo, lote, aceptados, azar):
+    """Pings de los vehículos `ids` en [desde, hasta), de a `lote` por llamada."""
+    total = 0
+    ts = desde
+    while ts < hasta:
+        for id_vehiculo in ids:
+            puntos = [
+                (ts + k * intervalo, -33.45 + azar.random() / 100, -70.66 + azar.random() / 100,
+                 azar.randrange(80), azar.randrange(360))
+                for k in range(lote)
+                if ts + k * intervalo < hasta
+            ]
+            total += posiciones.registrar(id_hotel, id_vehiculo, puntos)
+        ts += lote * intervalo
+    aceptados.append(total)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hotel", type=int, default=1)
+    parser.add_argument("--vehiculos", type=int, default=200)
+    parser.add_argument("--minutos", type=int, default=60)
+    parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre pings")
+    parser.add_argument("--lote", type=int, default=5, help="Puntos por envío")
+    parser.add_argument("--hilos", type=int, default=4)
+    parser.add_argument("--guardar", action="store_true", help="Vaciar a posiciones_vehiculo")
+    args = parser.parse_args()
+
+    db = SessionLocal() if args.guardar else None
+    if db is not None:
+        ids = db.scalars(
+            select(models.Vehiculo.id_vehiculo)
+            .where(models.Vehiculo.id_hotel == args.hotel)
+            .limit(args.vehiculos)
+        ).all()
+        if not ids:
+            raise SystemExit("El hotel no tiene vehículos")
+    else:
+        ids = list(range(_ID_FICTICIO, _ID_FICTICIO + args.vehiculos))
+
+    fin = time.time()
+    inicio = fin - args.minutos * 60
+    pings = int(args.minutos * 60 / args.intervalo)
+    print(f"{len(ids)} vehículos × {pings} pings (lotes de {args.lote}), {args.hilos} hilos")
+
+    # Envío por tramos de POSICIONES_FLUSH_SEGUNDOS simulados, vaciando entre tramos
+    tramo = settings.POSICIONES_FLUSH_SEGUNDOS
+    aceptados: list = []
+    guardadas = 0
+    t_envio = t_vaciado = 0.0
+    desde = inicio
+    while desde < fin:
+        hasta = min(desde + tramo, fin)
+        hilos = [
+            threading.Thread(
+                target=_enviar,
+                args=(ids[k::args.hilos], args.hotel, desde, hasta, args.intervalo, args.lote,
+                      aceptados, random.Random(k)),
+            )
+            for k in range(args.hilos)
+        ]
+        t0 = time.perf_counter()
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        t_envio += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        if db is not None:
+            guardadas += posiciones.vaciar(db)
+        else:
+            for id_vehiculo in ids:
+                rec = posiciones._recorridos[id_vehiculo]
+                guardadas += len(rec.muestrear(settings.POSICIONES_MUESTREO_SEGUNDOS))
+        t_vaciado += time.perf_counter() - t0
+        desde = hasta
+
+    total = sum(aceptados)
+    print(f"aceptados: {total} pings en {t_envio:.2f} s ({total / t_envio:,.0f} pings/s)")
+    print(f"guardadas: {guardadas} filas en {t_vaciado * 1000:.0f} ms")
+
+    # Comprobaciones
+    esperado_n = min(pings, settings.POSICIONES_BUFFER)
+    for id_vehiculo in ids:
+        rec = posiciones._recorridos[id_vehiculo]
+        assert rec.n == esperado_n, (id_vehiculo, rec.n, esperado_n)
+        assert rec.ultimo()[0] >= fin - args.intervalo, id_vehiculo
+    por_vehiculo = args.minutos * 60 / max(args.intervalo, settings.POSICIONES_MUESTREO_SEGUNDOS)
+    assert abs(guardadas / len(ids) - por_vehiculo) <= 2, (guardadas / len(ids), por_vehiculo)
+    print(f"✅ buffers con {esperado_n} puntos, ~{por_vehiculo:.0f} filas por vehículo")
+
+    adelantado = time.time() + 3600
+    recibidos = posiciones.registrar(args.hotel, ids[0], [
+        (adelantado - 1, -33.4, -70.6, 10, 0), (adelantado, -33.4, -70.6, 10, 0),
+    ])
+    ultimo = posiciones._recorridos[ids[0]].ultimo()[0]
+    assert recibidos == 2 and ultimo <= time.time() + settings.POSICIONES_TOLERANCIA_FUTURO_SEGUNDOS
+    print("✅ lote con reloj adelantado: aceptado y corrido a la hora del servidor")
+
+    if db is not None:
+        try:
+            posiciones.vaciar(db)
+        finally:
+            p = models.PosicionVehiculo
+            db.execute(delete(p).where(p.id_vehiculo.in_(ids), p.registrada_en >= posiciones._fecha(inicio)))
+            db.commit()
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/columnar.py
+"""
+Bytes en la red y tiempo de codificación: lista de objetos vs formato columnar.
+
+Con las mismas filas sintéticas de benchmarks/serializacion.py (--filas,
+10 000 por defecto) compara la respuesta por defecto (serializacion.respuesta)
+con {"columns": [...], "rows": [...]} armado como lo envía
+serializacion.tabla (a_columnar en lotes de 1000). Muestra bytes sin
+comprimir y con gzip (nivel 6, como un proxy típico) y el tiempo de
+codificar, y comprueba que ambos formatos traen los mismos datos.
+
+    python -m benchmarks.columnar --filas 10000
+"""
+import argparse
+import gzip
+import json
+from typing import Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from app import schemas, serializacion
+from benchmarks.serializacion import mejor, filas_de
+
+
+def objetos(claves, tuplas) -> bytes:
+    return serializacion.respuesta(Response(), [dict(zip(claves, f)) for f in tuplas]).body
+
+
+def columnar(claves, tuplas) -> bytes:
+    lote = serializacion._LOTE_COLUMNAR
+    lotes = (tuplas[i:i + lote] for i in range(0, len(tuplas), lote))
+    return b"".join(serializacion.a_columnar(claves, lotes))
+
+
+def comparar(nombre: str, esquema: Type[BaseModel], n: int) -> None:
+    claves, tuplas = filas_de(esquema, n)
+    a, b = objetos(claves, tuplas), columnar(claves, tuplas)
+    decodificado = json.loads(b)
+    assert json.loads(a) == [dict(zip(decodificado["columns"], f)) for f in decodificado["rows"]], nombre
+
+    t_a = mejor(lambda: objetos(claves, tuplas))
+    t_b = mejor(lambda: columnar(claves, tuplas))
+    gz_a, gz_b = len(gzip.compress(a, 6)), len(gzip.compress(b, 6))
+    print(f"{nombre}:")
+    print(f"  objetos   {len(a):10,d} B   gzip {gz_a:9,d} B   {t_a * 1000:7.1f} ms")
+    print(
+        f"  columnar  {len(b):10,d} B   gzip {gz_b:9,d} B   {t_b * 1000:7.1f} ms   "
+        f"({len(b) / len(a):.0%} / gzip {gz_b / gz_a:.0%} de objetos)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{args.filas} filas, codificación: mejor de 5")
+    comparar("GET /vehiculos", schemas.VehiculoOut, args.filas)
+    comparar("GET /asignaciones", schemas.AsignacionOut, args.filas)
+
+
+if __name__ == "__main__":
+    main()
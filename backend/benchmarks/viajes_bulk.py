@@ -0,0 +1,109 @@
+# benchmarks/viajes_bulk.py
+"""
+POST /viajes/bulk contra --filas llamadas a POST /viajes.
+
+En un hotel existente (con rutas, un supervisor y conductores con vehículo y
+turno) crea --filas viajes para mañana, repartidos entre las rutas cada
+--cada minutos, de dos formas y llamando a los endpoints en el proceso:
+
+- secuencial: un crear_viaje por fila (un Despachador, un commit por viaje)
+- bulk: un crear_viajes_bulk con todas (un INSERT, un Despachador, un commit)
+
+Tras cada corrida borra los viajes creados, sus asignaciones y recorridos,
+así ambas parten con los conductores libres. Muestra el mejor tiempo de
+--repeticiones y cuántos quedaron asignados. Las notificaciones, la demanda y
+las métricas de conductores sí quedan sumadas: usar una base de pruebas.
+
+    DATABASE_URL=mysql+pymysql://... python -m benchmarks.viajes_bulk --hotel 1 --filas 40
+"""
+import argparse
+import contextlib
+import io
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from app import models, schemas
+from app.database import SessionLocal
+from app.routers import viajes
+
+
+def _filas(rutas, n: int, cada: int) -> list:
+    manana = (datetime.utcnow() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+    return [
+        schemas.ViajeCreateIn(id_ruta=rutas[k % len(rutas)], agendada_para=manana + timedelta(minutes=k * cada))
+        for k in range(n)
+    ]
+
+
+def secuencial(db, claims, filas) -> list:
+    return [viajes.crear_viaje(body=f, db=db, claims=claims).id_viaje for f in filas]
+
+
+def bulk(db, claims, filas) -> list:
+    r = viajes.crear_viajes_bulk(body=schemas.ViajesBulkIn(viajes=filas), db=db, claims=claims)
+    return [f["id_viaje"] for f in r["resultados"] if f.get("id_viaje")]
+
+
+def _borrar(db, ids) -> int:
+    """Borra los viajes y lo que el despacho creó para ellos. Devuelve cuántos estaban asignados."""
+    a, v, rc = models.AsignacionViajes, models.Viaje, models.RecorridoCompartido
+    asignados = db.execute(select(a.id_viaje, a.id_recorrido).where(a.id_viaje.in_(ids))).all()
+    db.execute(delete(a).where(a.id_viaje.in_(ids)))
+    recorridos = {r for _, r in asignados if r is not None}
+    if recorridos:
+        db.execute(delete(rc).where(rc.id_recorrido.in_(recorridos)))
+    db.execute(delete(v).where(v.id_viaje.in_(ids)))
+    db.commit()
+    return len(asignados)
+
+
+def medir(nombre, fn, db, claims, filas, repeticiones: int) -> float:
+    tiempos = []
+    asignados = 0
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ids = fn(db, claims, filas)
+        tiempos.append(time.perf_counter() - t0)
+        assert len(ids) == len(filas), (nombre, len(ids))
+        asignados = _borrar(db, ids)
+    mejor = min(tiempos)
+    print(f"{nombre:10} {mejor * 1000:8.1f} ms   ({len(filas) / mejor:6,.0f} viajes/s, {asignados} asignados)")
+    return mejor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hotel", type=int, required=True)
+    parser.add_argument("--filas", type=int, default=40)
+    parser.add_argument("--cada", type=int, default=15, help="Minutos entre viajes")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rutas = db.scalars(
+            select(models.Ruta.id_ruta).where(models.Ruta.id_hotel == args.hotel).order_by(models.Ruta.id_ruta)
+        ).all()
+        supervisor = db.scalar(
+            select(models.Usuario.id_usuario)
+            .where(models.Usuario.id_hotel == args.hotel, models.Usuario.id_tipo_usuario.in_((3, 4)))
+            .limit(1)
+        )
+        if not rutas or supervisor is None:
+            raise SystemExit("El hotel necesita al menos una ruta y un supervisor")
+        claims = {"sub": str(supervisor), "role": 3}
+        filas = _filas(rutas, args.filas, args.cada)
+
+        print(f"{args.filas} viajes, {len(rutas)} rutas, mejor de {args.repeticiones}")
+        t_sec = medir("secuencial", secuencial, db, claims, filas, args.repeticiones)
+        t_bulk = medir("bulk", bulk, db, claims, filas, args.repeticiones)
+        print(f"✅ bulk ×{t_sec / t_bulk:.1f} más rápido")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
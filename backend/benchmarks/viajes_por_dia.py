@@ -0,0 +1,122 @@
+# benchmarks/viajes_por_dia.py
+"""
+/kpis/viajes-por-dia con un año de viajes.
+
+Inserta --viajes viajes repartidos en los últimos 365 días en un hotel
+existente (con un `lote` propio; se borran al terminar) y compara:
+
+- antes: GROUP BY DATE(agendada_para) en UTC, sin días vacíos
+- ahora: rango sobre agendada_para agrupado por hora UTC en la BD y sumado
+  por cubeta local (series_tiempo.sumar, serie densa), llamando al endpoint
+
+Muestra el plan de cada consulta (EXPLAIN en MySQL, EXPLAIN QUERY PLAN en
+SQLite: con el índice debe aparecer idx_via_hotel_fecha y no un recorrido
+completo) y el tiempo por granularidad. Usar una base de pruebas:
+
+    DATABASE_URL=mysql+pymysql://... python -m benchmarks.viajes_por_dia --hotel 1
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from app import models, series_tiempo
+from app.database import SessionLocal
+from app.routers import kpis
+
+
+def _plan(db, consulta) -> list:
+    conexion = db.connection()
+    dialecto = conexion.dialect
+    compilada = consulta.compile(dialect=dialecto, compile_kwargs={"render_postcompile": True})
+    prefijo = "EXPLAIN QUERY PLAN " if dialecto.name == "sqlite" else "EXPLAIN "
+    params = compilada.params
+    if compilada.positional:
+        params = tuple(params[k] for k in compilada.positiontup)
+    return conexion.exec_driver_sql(prefijo + compilada.string, params).mappings().all()
+
+
+def _mejor(fn, repeticiones: int = 3) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    return min(tiempos)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hotel", type=int, required=True)
+    parser.add_argument("--viajes", type=int, default=200_000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    v = models.Viaje
+    id_ruta = db.scalar(select(models.Ruta.id_ruta).where(models.Ruta.id_hotel == args.hotel).limit(1))
+    id_usuario = db.scalar(select(models.Usuario.id_usuario).where(models.Usuario.id_hotel == args.hotel).limit(1))
+    if id_ruta is None or id_usuario is None:
+        raise SystemExit("El hotel necesita al menos una ruta y un usuario")
+
+    lote = str(uuid.uuid4())
+    ahora = datetime.utcnow()
+    azar = random.Random(1)
+    t0 = time.perf_counter()
+    for inicio in range(0, args.viajes, 10_000):
+        filas = []
+        for _ in range(min(10_000, args.viajes - inicio)):
+            fecha = ahora - timedelta(seconds=azar.randrange(365 * 86400))
+            filas.append({
+                "id_hotel": args.hotel, "id_ruta": id_ruta, "pedida_por_id_usuario": id_usuario,
+                "hora_pedida": fecha, "agendada_para": fecha, "id_estado_viaje": 5,
+                "pasajeros": 1, "lote": lote,
+            })
+        db.execute(insert(v), filas)
+        db.commit()
+    print(f"{args.viajes} viajes insertados en {time.perf_counter() - t0:.1f} s")
+
+    try:
+        desde = ahora - timedelta(days=365)
+        antes = (
+            select(func.date(v.agendada_para), func.count(v.id_viaje))
+            .where(v.id_hotel == args.hotel, func.date(v.agendada_para) >= desde.date())
+            .group_by(func.date(v.agendada_para))
+        )
+        tramo = series_tiempo.tramo_utc(v.agendada_para, 60).label("tramo")
+        ahora_q = (
+            select(tramo, func.count())
+            .where(v.id_hotel == args.hotel, v.agendada_para >= desde, v.agendada_para < ahora)
+            .group_by(tramo)
+            .order_by(tramo)
+        )
+        for nombre, consulta in (("antes (DATE())", antes), ("ahora (rango por hora UTC)", ahora_q)):
+            print(f"\nPlan {nombre}:")
+            for fila in _plan(db, consulta):
+                print("  ", dict(fila))
+        db.rollback()
+
+        claims = {"sub": "0", "role": 4}
+        t = _mejor(lambda: db.execute(antes).all())
+        print(f"\nantes, día UTC sin ceros: {t * 1000:8.1f} ms")
+        for granularidad in ("hora", "dia", "semana"):
+            r = kpis.get_viajes_por_dia(
+                dias=365, granularidad=granularidad, hotel_id=args.hotel,
+                incluir_archivados=False, db=db, claims=claims,
+            )
+            t = _mejor(lambda: kpis.get_viajes_por_dia(
+                dias=365, granularidad=granularidad, hotel_id=args.hotel,
+                incluir_archivados=False, db=db, claims=claims,
+            ))
+            print(f"ahora, {granularidad:6} ({len(r['datos']):5d} cubetas): {t * 1000:8.1f} ms")
+    finally:
+        db.rollback()
+        db.execute(delete(v).where(v.lote == lote))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+# tests/test_planes.py
+"""
+EXPLAIN de cada consulta caliente (migraciones.CONSULTAS_CALIENTES) sobre la
+base de pruebas con datos: falla si la tabla no tiene un índice utilizable
+o si el optimizador la recorre completa.
+"""
+import pytest
+
+from conftest import ES_MYSQL
+
+if not ES_MYSQL:
+    pytest.skip("Requiere TEST_DATABASE_URL de MySQL", allow_module_level=True)
+
+from app import migraciones  # noqa: E402
+
+
+@pytest.mark.parametrize("consulta", migraciones.CONSULTAS_CALIENTES, ids=lambda c: c.nombre)
+def test_consulta_caliente_usa_indice(bd_mysql, consulta):
+    problema = migraciones.revisar_plan(bd_mysql.connection(), consulta, estricto=True)
+    assert problema is None, problema
+
+
+def test_verificar_planes_sin_problemas(bd_mysql):
+    assert migraciones.verificar_planes(bd_mysql, estricto=True) == []
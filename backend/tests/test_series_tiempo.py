@@ -0,0 +1,37 @@
+# tests/test_series_tiempo.py
+"""
+Cubetas por hora en los días de cambio de horario (America/New_York, 2025):
+el 9 de marzo no existe las 02:00 y el 2 de noviembre la 01:00 se repite.
+"""
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from app.series_tiempo import contar, cubetas
+
+NY = ZoneInfo("America/New_York")
+
+
+def test_horas_al_adelantar_el_reloj():
+    etiquetas, limites = cubetas(datetime(2025, 3, 9, 0), datetime(2025, 3, 9, 5), "hora", NY)
+
+    assert [e[-5:] for e in etiquetas] == ["00:00", "01:00", "03:00", "04:00"]
+    # 00:00 y 01:00 en EST (UTC-5); 03:00 en adelante en EDT (UTC-4)
+    assert limites == [datetime(2025, 3, 9, h) for h in (5, 6, 7, 8, 9)]
+
+
+def test_horas_al_atrasar_el_reloj():
+    etiquetas, limites = cubetas(datetime(2025, 11, 2, 0), datetime(2025, 11, 2, 4), "hora", NY)
+
+    assert [e[-5:] for e in etiquetas] == ["00:00", "01:00", "02:00", "03:00"]
+    # La 01:00 repetida queda en una sola cubeta de dos horas
+    assert limites == [datetime(2025, 11, 2, h) for h in (4, 5, 7, 8, 9)]
+    fechas = [datetime(2025, 11, 2, 5, 30), datetime(2025, 11, 2, 6, 30), datetime(2025, 11, 2, 7, 30)]
+    assert contar(fechas, limites) == [0, 2, 1, 0]
+
+
+def test_dias_del_cambio_de_horario():
+    etiquetas, limites = cubetas(datetime(2025, 3, 8), datetime(2025, 3, 11), "dia", NY)
+
+    assert etiquetas == ["2025-03-08", "2025-03-09", "2025-03-10"]
+    horas = [(b - a).total_seconds() / 3600 for a, b in zip(limites, limites[1:])]
+    assert horas == [24, 23, 24]